@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, Query
 
 from db.schemas.auth_schema import TokenResponse
 from core.dependencies import user_services, require_user_attrs
+from core.slow_log import TimedRoute
 from db.schemas.user_schema import UserRegisterSchema
 from services.auth_service import AuthServ
 from services.user_versice import UserServices
@@ -13,7 +14,7 @@ from utils.context import get_current_user
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/healthcheck", status_code=200)
@@ -64,13 +65,14 @@ async def login(
 
 @router.post("/refresh_token", response_model=TokenResponse, dependencies=[Depends(require_user_attrs())])
 async def refresh_token(
+        raw_token: Annotated[str, Depends(AuthServ.get_bearer_token)],
         user_serv: Annotated[UserServices, Depends(user_services)],
 ):
     """
     In case you become aware of a token leak, this will help you change it
     """
     logger.info("Try get user service")
-    return await user_serv.refresh_token()
+    return await user_serv.refresh_token(raw_token)
 
 
 from fastapi import APIRouter, Request, HTTPException
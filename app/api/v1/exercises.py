@@ -4,7 +4,8 @@ from typing import Annotated
 from fastapi import APIRouter, Depends, File, UploadFile
 from starlette import status
 
-from core.dependencies import exercise_services, require_user_attrs
+from core.dependencies import exercise_read_services, exercise_services, require_user_attrs
+from core.slow_log import TimedRoute
 from db.schemas.exercise_schema import CreateExerciseSchema, ExercisePage, UpdateExerciseSchema, \
     parse_create_exercise_form
 from db.schemas.paginate_schema import PaginationGet
@@ -14,13 +15,13 @@ from utils.context import get_current_user
 
 logger = logging.getLogger(__name__)
 # /api/v1/exercise
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/", response_model=ExercisePage, status_code=status.HTTP_200_OK,
             dependencies=[Depends(require_user_attrs())])
 async def get_exercises(
-        exercise_serv: Annotated[ExerciseServices, Depends(exercise_services)],
+        exercise_serv: Annotated[ExerciseServices, Depends(exercise_read_services)],
         pagination: PaginationGet = Depends(PaginationGet),
         user_id: int | None = None,
 ):
@@ -28,14 +29,14 @@ async def get_exercises(
     get list exercises from DB by pagination
     """
     logger.info("Try get exercise services")
-    return await exercise_serv.get_exercises(pagination.limit, pagination.start, user_id)
+    return await exercise_serv.get_exercises(pagination.limit, pagination.start, user_id, pagination.cursor)
 
 
 @router.get("/{exercise_id}", response_model=ExerciseFullSchema, status_code=status.HTTP_200_OK,
             dependencies=[Depends(require_user_attrs())])
 async def get_exercise_id(
         exercise_id: int,
-        exercise_serv: Annotated[ExerciseServices, Depends(exercise_services)],
+        exercise_serv: Annotated[ExerciseServices, Depends(exercise_read_services)],
 ):
     """
     get exercise from DB by id
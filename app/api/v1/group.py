@@ -4,13 +4,14 @@ from typing import Annotated, List
 from fastapi import APIRouter, Depends
 from starlette import status
 
-from core.dependencies import require_user_attrs, group_services
+from core.dependencies import require_user_attrs, group_read_services, group_services
+from core.slow_log import TimedRoute
 from db.schemas.group_schema import GroupCreateSchema, GroupFullSchema, GroupMembersCreateSchema, \
     GroupPage, GroupGetSchema, GroupMembersAddSchema, GroupGetOneSchema
 from db.schemas.paginate_schema import PaginationGet
 from services.group_service import GroupServices
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +19,7 @@ logger = logging.getLogger(__name__)
 @router.get("/", response_model=GroupPage, status_code=status.HTTP_200_OK,
             dependencies=[Depends(require_user_attrs())])
 async def get_groups(
-        group_serv: Annotated[GroupServices, Depends(group_services)],
+        group_serv: Annotated[GroupServices, Depends(group_read_services)],
         pagination: PaginationGet = Depends(PaginationGet),
         user_id: int | None = None,
 ):
@@ -26,14 +27,14 @@ async def get_groups(
     Get all the groups that belong to you or that you are a member of
     """
     logger.info("Try get group service")
-    return await group_serv.get_groups_user(pagination.limit, pagination.start, user_id)
+    return await group_serv.get_groups_user(pagination.limit, pagination.start, user_id, pagination.cursor)
 
 
 @router.get("/{group_id}", response_model=GroupGetSchema, status_code=status.HTTP_200_OK,
             dependencies=[Depends(require_user_attrs())])
 async def get_group_id(
         group_id: int,
-        group_serv: Annotated[GroupServices, Depends(group_services)],
+        group_serv: Annotated[GroupServices, Depends(group_read_services)],
 ):
     """
     Get the group by group ID that belongs to you.
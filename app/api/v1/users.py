@@ -4,7 +4,8 @@ from typing import Annotated
 from fastapi import APIRouter, Depends
 from starlette import status
 
-from core.dependencies import user_services, require_user_attrs
+from core.dependencies import user_read_services, user_services, require_user_attrs
+from core.slow_log import TimedRoute
 from db.schemas.user_schema import UserGetModelSchema, UserPostModelUpdateSchema, UserAdminPutModelSchema, \
     UserAdminGetModelSchema
 from services.user_versice import UserServices
@@ -14,7 +15,7 @@ from utils.create_data_db import create_db_data
 logger = logging.getLogger(__name__)
 
 # /api/v1/users/profile
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/create_db_data")
@@ -26,12 +27,17 @@ async def me():
             response_model=UserGetModelSchema,
             status_code=status.HTTP_200_OK,
             dependencies=[Depends(require_user_attrs(is_admin=False))])
-async def me_get():
+async def me_get(
+        user_serv: Annotated[UserServices, Depends(user_read_services)],
+):
     """
     authorized user profile information
     """
     current_user = get_current_user()
-    return current_user
+    if isinstance(current_user, UserAdminGetModelSchema):
+        return current_user
+    # a stateless token carries only what authorization needs, the profile is read on demand
+    return await user_serv.find_user(current_user.id)
 
 
 @router.get("/{user_id}",
@@ -40,7 +46,7 @@ async def me_get():
             dependencies=[Depends(require_user_attrs(is_admin=True))])
 async def get_user_id_for_admin(
         user_id: int,
-        user_serv: Annotated[UserServices, Depends(user_services)],
+        user_serv: Annotated[UserServices, Depends(user_read_services)],
 ):
     """
     For admin
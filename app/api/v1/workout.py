@@ -4,19 +4,20 @@ from typing import Annotated, List
 from fastapi import APIRouter, Depends
 from starlette import status
 
-from core.dependencies import require_user_attrs, workout_services
+from core.dependencies import require_user_attrs, workout_read_services, workout_services
+from core.slow_log import TimedRoute
 from db.schemas.paginate_schema import PaginationGet
-from db.schemas.workout_schema import WorkoutExerciseCreateSchema, WorkoutFullSchema, WorkoutPage
+from db.schemas.workout_schema import WorkoutExerciseCreateSchema, WorkoutFullSchema, WorkoutPage, WorkoutPatchSchema
 from services.workout_service import WorkoutServices
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 logger = logging.getLogger(__name__)
 
 
 @router.get("/", response_model=WorkoutPage, status_code=status.HTTP_200_OK,
             dependencies=[Depends(require_user_attrs(is_admin=True))])
 async def get_workouts(
-        workout_serv: Annotated[WorkoutServices, Depends(workout_services)],
+        workout_serv: Annotated[WorkoutServices, Depends(workout_read_services)],
         pagination: PaginationGet = Depends(PaginationGet),
         user_id: int | None = None,
 ):
@@ -25,14 +26,14 @@ async def get_workouts(
     Including those that will be available in groups where you were invited
     """
     logger.info("Try get workout service")
-    return await workout_serv.get_workouts(pagination.limit, pagination.start, user_id)
+    return await workout_serv.get_workouts(pagination.limit, pagination.start, user_id, pagination.cursor)
 
 
 @router.get("/{workout_id}", response_model=WorkoutFullSchema, status_code=status.HTTP_200_OK,
             dependencies=[Depends(require_user_attrs())])
 async def get_workout(
         workout_id: int,
-        workout_serv: Annotated[WorkoutServices, Depends(workout_services)],
+        workout_serv: Annotated[WorkoutServices, Depends(workout_read_services)],
 ):
     """
     Displays workout by ID
@@ -70,6 +71,21 @@ async def update_workout(
     return await workout_serv.update_workout(workout_id, workout_schema)
 
 
+@router.patch("/{workout_id}", response_model=WorkoutFullSchema, status_code=status.HTTP_200_OK,
+              dependencies=[Depends(require_user_attrs())])
+async def patch_workout(
+        workout_id: int,
+        workout_serv: Annotated[WorkoutServices, Depends(workout_services)],
+        patch_schema: WorkoutPatchSchema,
+):
+    """
+    Edits the exercise list of a workout in place: insert, move, remove and update_notes operations
+    applied in order and all at once. Fails with 409 when the version is not the current one.
+    """
+    logger.info("Try get workout service")
+    return await workout_serv.patch_workout(workout_id, patch_schema)
+
+
 @router.delete("/{workout_id}", status_code=status.HTTP_200_OK,
                dependencies=[Depends(require_user_attrs())])
 async def remove_workout(
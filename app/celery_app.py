@@ -11,6 +11,7 @@ celery_app = Celery(
     backend=settings.CELERY_RESULT_DB_URL,
     include=[
         "tasks.email_tasks",
+        "tasks.maintenance_tasks",
     ],
 )
 
@@ -31,4 +32,14 @@ celery_app.conf.update(
     broker_heartbeat=30,
     broker_pool_limit=10,
     result_expires=86400,
+    beat_schedule={
+        "purge-expired-tokens": {
+            "task": "tasks.maintenance_tasks.purge_expired_tokens_task",
+            "schedule": 3600.0,
+        },
+        "reconcile-user-counters": {
+            "task": "tasks.maintenance_tasks.reconcile_user_counters_task",
+            "schedule": 24 * 3600.0,
+        },
+    },
 )
@@ -41,6 +41,18 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str
     POSTGRES_URL: Optional[str] = None
     CELERY_RESULT_DB_URL: Optional[str] = None  # sync для celery/flower (SQL backend)
+    # per uvicorn worker: every worker holds up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SEC: float = 30
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE_SEC: int = 1800
+    DB_POOL_WARMUP_CONNECTIONS: int = 2
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements, 0 behind pgbouncer in transaction mode
+    DB_STATEMENT_TIMEOUT_MS: Optional[int] = None
+    POSTGRES_REPLICA_URLS: Optional[str] = None  # comma separated, GET routes read from these
+    DB_REPLICA_SELECTION: str = "round_robin"  # or least_connections
+    DB_READ_YOUR_WRITES_SEC: float = 5
 
     RABBITMQ_DEFAULT_USER: str
     RABBITMQ_DEFAULT_PASS: str
@@ -50,6 +62,33 @@ class Settings(BaseSettings):
     TIMEZONE: str
     SERVER: str
 
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SEC: int = 30
+    REDIS_SESSION_ENABLED: bool = False
+    REDIS_SESSION_RETRY_SEC: int = 5
+    REDIS_SESSION_TIMEOUT_SEC: float = 0.5
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    AUTH_STATELESS_TOKENS: bool = False
+    TOKEN_GENERATION_REFRESH_SEC: float = 5
+    MAX_SESSIONS_PER_USER: int = 5
+    TOKEN_PURGE_CHUNK_SIZE: int = 5000
+    COUNTER_RECONCILE_CHUNK_SIZE: int = 1000
+    WORKOUT_ACCESS_REBUILD_CHUNK_SIZE: int = 1000
+    # list totals stop counting past this many rows ("10000+"); None counts every row
+    PAGE_TOTAL_CAP: Optional[int] = 10000
+    JWT_VERIFY_CACHE_MAX_SIZE: int = 10000
+    JWT_VERIFY_CACHE_TTL_SEC: int = 3600
+    JWT_VERIFY_NEGATIVE_MAX_SIZE: int = 1000
+    JWT_VERIFY_NEGATIVE_TTL_SEC: int = 5
+    MAX_REQUEST_BODY_SIZE: Optional[int] = None
+    BODY_LOG_SAMPLE_RATE: float = 0.1
+    BODY_LOG_SLOW_MS: float = 1000
+    DEBUG_QUERY_HEADERS: bool = False
+    N_PLUS_ONE_THRESHOLD: int = 3
+    SLOW_REQUEST_MS: Optional[float] = 1000
+    SLOW_EXPLAIN_SAMPLE_RATE: float = 0.1
+
     class Config:
         env_file = "../sandy.env"
         env_file_encoding = "utf-8"
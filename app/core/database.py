@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (AsyncConnection, AsyncEngine, AsyncSession, async_sessionmaker,
+                                    create_async_engine)
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from core.config import settings
+from core.metrics import instrument_engine
+from core.query_stats import instrument_query_stats
+from core.slow_log import explain_sampler
+from utils.context import get_current_user_or_none
+
+logger = logging.getLogger(__name__)
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """
+    create_async_engine keyword arguments from the DB_* settings. Pool sizes are per process,
+    so a host runs up to workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        # SQLite picks its own pool (StaticPool for :memory:), which takes none of the sizing arguments
+        return {}
+    options: Dict[str, Any] = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SEC,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SEC,
+    }
+    if parsed.get_driver_name() == "asyncpg":
+        connect_args: Dict[str, Any] = {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+        if not settings.DB_STATEMENT_CACHE_SIZE:
+            # behind pgbouncer asyncpg's own statement cache has to go too
+            connect_args["statement_cache_size"] = 0
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+        options["connect_args"] = connect_args
+    return options
+
+
+def create_engine(url: str, pool_metrics: bool = True) -> AsyncEngine:
+    new_engine = create_async_engine(url, echo=False, **engine_options(url))
+    if pool_metrics:
+        instrument_engine(new_engine)
+    instrument_query_stats(new_engine)
+    explain_sampler.attach(new_engine)
+    return new_engine
+
+
+async def _open(engine: AsyncEngine) -> AsyncConnection:
+    conn = await engine.connect()
+    try:
+        await conn.execute(text("select 1"))
+    except Exception:
+        await conn.close()
+        raise
+    return conn
+
+
+async def warm_up(engine: AsyncEngine, connections: int) -> int:
+    """
+    Open up to `connections` pool connections at once and hand them back idle, so the first
+    requests of a worker do not pay for the handshake. A failure is logged, not raised: the pool
+    still connects on demand. Returns the number of connections opened.
+    """
+    pool = engine.sync_engine.pool
+    if hasattr(pool, "size"):
+        # anything above pool_size would be overflow and closed again on checkin
+        connections = min(connections, pool.size())
+    if connections <= 0:
+        return 0
+    results = await asyncio.gather(*(_open(engine) for _ in range(connections)), return_exceptions=True)
+    opened = [result for result in results if isinstance(result, AsyncConnection)]
+    for conn in opened:
+        await conn.close()
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        logger.warning("Pool warm-up opened %s of %s connections: %s", len(opened), connections, errors[0])
+    return len(opened)
+
+
+def pool_status(engine: AsyncEngine) -> Dict[str, int]:
+    """Current pool occupancy of this process, empty for pools that do not track it."""
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(0, pool.overflow()),
+    }
+
+
+class ReplicaRouter:
+    """
+    Picks where a read-only request runs: one of the replicas, round-robin or the one with the fewest
+    sessions open in this worker, or the primary when there are no replicas or the current user wrote
+    within the last sticky_sec (read your writes). Pins are kept per worker, so a read
+    that another uvicorn worker serves can still see a lagging replica.
+    """
+
+    STRATEGIES = ("round_robin", "least_connections")
+
+    def __init__(
+            self,
+            replicas: Sequence[AsyncEngine] = (),
+            *,
+            strategy: str = "round_robin",
+            sticky_sec: float = 5,
+            max_pinned: int = 10000,
+    ) -> None:
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown replica selection {strategy!r}, expected one of {self.STRATEGIES}")
+        self.engines: List[AsyncEngine] = list(replicas)
+        self.sessionmakers = [async_sessionmaker(bind=replica, expire_on_commit=False) for replica in self.engines]
+        self.strategy = strategy
+        self.sticky_sec = sticky_sec
+        self.max_pinned = max_pinned
+        self._next = 0
+        self._open = [0] * len(self.engines)
+        self._pinned: Dict[int, float] = {}
+
+    def pin(self, user_id: int) -> None:
+        if not self.engines or self.sticky_sec <= 0:
+            return
+        now = time.monotonic()
+        if len(self._pinned) >= self.max_pinned:
+            self._pinned = {key: until for key, until in self._pinned.items() if until > now}
+        self._pinned[user_id] = now + self.sticky_sec
+
+    def reads_primary(self, user_id: Optional[int]) -> bool:
+        return not self.engines or self.is_pinned(user_id)
+
+    def is_pinned(self, user_id: Optional[int]) -> bool:
+        until = self._pinned.get(user_id) if user_id is not None else None
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            del self._pinned[user_id]
+            return False
+        return True
+
+    def _choose(self) -> int:
+        start, self._next = self._next, (self._next + 1) % len(self.engines)
+        if self.strategy == "round_robin":
+            return start
+        # ties go round-robin too, otherwise an idle worker sends everything to the first replica
+        order = [(start + offset) % len(self.engines) for offset in range(len(self.engines))]
+        return min(order, key=lambda index: self._open[index])
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Session on the next replica; callers check reads_primary first."""
+        index = self._choose()
+        self._open[index] += 1
+        try:
+            async with self.sessionmakers[index]() as session:
+                yield session
+        finally:
+            self._open[index] -= 1
+
+
+def replica_urls(value: Optional[str]) -> List[str]:
+    return [url.strip() for url in (value or "").split(",") if url.strip()]
+
+
+class PrimarySession(Session):
+    """Session class of SessionLocal: a committed write pins the current user to the primary."""
+
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _note_statement_write(orm_execute_state: ORMExecuteState) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_flush")
+def _note_flush_write(session: Session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_rollback")
+def _forget_write(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _pin_writer(session: Session) -> None:
+    if session.info.pop("wrote", False):
+        user = get_current_user_or_none()
+        if user is not None:
+            read_router.pin(user.id)
+
+
+engine = create_engine(settings.POSTGRES_URL)
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    expire_on_commit=False,
+    sync_session_class=PrimarySession,
+)
+read_router = ReplicaRouter(
+    [create_engine(url, pool_metrics=False) for url in replica_urls(settings.POSTGRES_REPLICA_URLS)],
+    strategy=settings.DB_REPLICA_SELECTION,
+    sticky_sec=settings.DB_READ_YOUR_WRITES_SEC,
+)
@@ -1,47 +1,76 @@
 from typing import Annotated, Optional
 
 from fastapi import Depends
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, timezone
 from core.config import settings
+from core.database import SessionLocal, read_router
+from core.principal_cache import principal_cache
 from core.s3_cloud_connector import S3CloudConnector
+from core.session_store import session_store
+from core.slow_log import timed_dependency
 from db.models import UserModel
 from db.schemas.user_schema import UserAdminGetModelSchema
+from repositories.unit_of_work import UnitOfWork
 from services.auth_service import AuthServ
 from services.exercise_service import ExerciseServices
 from services.group_service import GroupServices
 from services.user_versice import UserServices
 from services.workout_service import WorkoutServices
-from utils.context import set_current_user
+from utils.context import get_current_user_or_none, set_current_user
 from utils.raises import _forbidden, _unauthorized
 
-SessionLocal = async_sessionmaker(
-    bind=create_async_engine(settings.POSTGRES_URL, echo=False, ),
-    expire_on_commit=False,
-)
+async def get_db():
+    """Session of the request, its writes committed once when the request succeeds."""
+    async with SessionLocal() as session, UnitOfWork(session):
+        yield session
 
 
-async def get_db():
-    async with SessionLocal() as session:
+async def get_read_db(session: AsyncSession = Depends(get_db)):
+    """
+    Session for read-only routes: a replica when configured, unless the user has just written.
+    Otherwise the request's primary session, which connects only if it is used.
+    """
+    user = get_current_user_or_none()
+    if read_router.reads_primary(user.id if user is not None else None):
         yield session
+        return
+    async with read_router.session() as replica_session:
+        yield replica_session
 
 
 def user_services(session: AsyncSession = Depends(get_db)) -> UserServices:
     return UserServices(session)
 
 
+def user_read_services(session: AsyncSession = Depends(get_read_db)) -> UserServices:
+    return UserServices(session)
+
+
 def exercise_services(session: AsyncSession = Depends(get_db)) -> ExerciseServices:
     return ExerciseServices(session)
 
 
+def exercise_read_services(session: AsyncSession = Depends(get_read_db)) -> ExerciseServices:
+    return ExerciseServices(session)
+
+
 def workout_services(session: AsyncSession = Depends(get_db)) -> WorkoutServices:
     return WorkoutServices(session)
 
 
+def workout_read_services(session: AsyncSession = Depends(get_read_db)) -> WorkoutServices:
+    return WorkoutServices(session)
+
+
 def group_services(session: AsyncSession = Depends(get_db)) -> GroupServices:
     return GroupServices(session)
 
 
+def group_read_services(session: AsyncSession = Depends(get_read_db)) -> GroupServices:
+    return GroupServices(session)
+
+
 def get_s3_connector() -> S3CloudConnector:
     return S3CloudConnector()
 
@@ -62,23 +91,51 @@ def require_user_attrs(
     return dep
 
 
+@timed_dependency("auth")
 async def get_current_user_from_token(
         raw_token: str = Depends(AuthServ.get_bearer_token),
         user_serv=Depends(user_services),
 ) -> UserAdminGetModelSchema:
+    stateless_payload = AuthServ.verify_stateless_token(raw_token) if settings.AUTH_STATELESS_TOKENS else None
+    cached_user = principal_cache.get(raw_token)
+    if cached_user is not None:
+        set_current_user(cached_user)
+        return cached_user
+    if stateless_payload is not None:
+        user_model = AuthServ.stateless_principal(stateless_payload)
+        if user_model is None:
+            # a token without the claim, or the user changed since it was issued
+            user = await user_serv.repo.get_one_obj_model(stateless_payload.user_id)
+            if user is None:
+                raise _unauthorized("User not found")
+            user_model = UserAdminGetModelSchema.model_validate(user)
+        if not await AuthServ.check_active_and_confirmed_user(user_model):
+            raise _unauthorized("User is inactive or not confirmed")
+        principal_cache.put(raw_token, user_model, stateless_payload.token_limit_verify)
+        set_current_user(user_model)
+        return user_model
     payload = AuthServ.verify_token(raw_token)
-    user = await user_serv.repo.find_user_id(payload.user_id, True)
+    shared_user = await session_store.get(raw_token, payload.user_id)
+    if shared_user is not None:
+        principal_cache.put(raw_token, shared_user, payload.token_limit_verify)
+        set_current_user(shared_user)
+        return shared_user
+    user = await user_serv.repo.find_user_id(payload.user_id, raw_token)
     if not user:
         raise _unauthorized("User not found")
-    if user.token is None:
-        raise _unauthorized("Token is not valid")
-    if raw_token != user.token.token:
+    if not user.tokens:
         raise _unauthorized("Token is not valid")
     if payload.token_limit_verify - datetime.now(timezone.utc).timestamp() < 0:
-        await user_serv.repo.remove_token_user(payload.user_id)
+        await user_serv.repo.remove_token_user(payload.user_id, raw_token)
+        unit_of_work = UnitOfWork.of(user_serv.repo.session)
+        if unit_of_work is not None:
+            # the 401 rolls the request back, the cleanup is committed before it
+            await unit_of_work.commit()
         raise _unauthorized("Token timed out")
     if not await AuthServ.check_active_and_confirmed_user(user):
         raise _unauthorized("User is inactive or not confirmed")
     user_model = UserAdminGetModelSchema.model_validate(user)
+    principal_cache.put(raw_token, user_model, payload.token_limit_verify)
+    await session_store.put(raw_token, user_model, payload.token_limit_verify)
     set_current_user(user_model)
     return user_model
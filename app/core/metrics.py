@@ -0,0 +1,149 @@
+import functools
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator
+
+from fastapi import Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, \
+    generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# with PROMETHEUS_MULTIPROC_DIR set (it must be set before the workers start) every uvicorn worker
+# writes its samples to mmap files in that directory and /metrics aggregates them
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status", ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being served", multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections checked out of the SQLAlchemy pool", multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Checked out connections above the SQLAlchemy pool size", multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_IN = Gauge(
+    "db_pool_checked_in", "Idle connections held by the SQLAlchemy pool", multiprocess_mode="livesum",
+)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size", "Configured SQLAlchemy pool size", multiprocess_mode="livesum",
+)
+# livemax over workers: the most connections any single worker has needed at once
+DB_POOL_CHECKED_OUT_PEAK = Gauge(
+    "db_pool_checked_out_peak", "Most connections checked out at once by one worker", multiprocess_mode="livemax",
+)
+EXTERNAL_LATENCY = Histogram(
+    "external_call_duration_seconds", "Latency of calls to S3 and RabbitMQ", ["service", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+EXTERNAL_ERRORS = Counter(
+    "external_call_errors_total", "Failed calls to S3 and RabbitMQ", ["service", "operation"],
+)
+# core.password_hasher: the bcrypt thread pool
+PASSWORD_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds", "Time a password hash or check waited for a worker",
+    buckets=LATENCY_BUCKETS,
+)
+PASSWORD_HASH_TIME = Histogram(
+    "password_hash_duration_seconds", "bcrypt time of a password hash or check", buckets=LATENCY_BUCKETS,
+)
+PASSWORD_PENDING = Gauge(
+    "password_hash_pending", "Password operations queued or running", multiprocess_mode="livesum",
+)
+PASSWORD_REJECTED = Counter(
+    "password_hash_rejected_total", "Password operations refused with 503, the executor was saturated",
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+# labelled children per (method, route, status); routes are templates, so the set stays small
+_request_children: dict[tuple, tuple] = {}
+
+
+def observe_request(method: str, route: str, status: int, duration_sec: float) -> None:
+    key = (method, route, status)
+    children = _request_children.get(key)
+    if children is None:
+        children = (HTTP_REQUESTS.labels(method, route, str(status)), HTTP_LATENCY.labels(method, route))
+        _request_children[key] = children
+    children[0].inc()
+    children[1].observe(duration_sec)
+
+
+@contextmanager
+def track_external(service: str, operation: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_ERRORS.labels(service, operation).inc()
+        raise
+    finally:
+        EXTERNAL_LATENCY.labels(service, operation).observe(time.perf_counter() - started)
+
+
+def external_failed(service: str, operation: str) -> None:
+    """Count a failure the call handled itself, which track_external does not see."""
+    EXTERNAL_ERRORS.labels(service, operation).inc()
+
+
+def timed_external(service: str, operation: str):
+    """Decorator form of track_external for coroutine methods."""
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with track_external(service, operation):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Keep the pool gauges current on every checkout and checkin of the engine's pool."""
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, "checkedout"):
+        return
+
+    peak = 0
+
+    def update(checked_out: int, checked_in: int) -> None:
+        nonlocal peak
+        peak = max(peak, checked_out)
+        DB_POOL_CHECKED_OUT.set(checked_out)
+        DB_POOL_CHECKED_IN.set(checked_in)
+        DB_POOL_OVERFLOW.set(max(0, checked_out - pool.size()))
+        DB_POOL_CHECKED_OUT_PEAK.set(peak)
+
+    DB_POOL_SIZE.set(pool.size())
+    event.listen(engine.sync_engine, "checkout", lambda *_: update(pool.checkedout(), pool.checkedin()))
+    # checkin fires before the connection is back in the pool; overflow connections are closed instead
+    event.listen(engine.sync_engine, "checkin",
+                 lambda *_: update(max(0, pool.checkedout() - 1), min(pool.size(), pool.checkedin() + 1)))
+
+
+def mark_process_dead() -> None:
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
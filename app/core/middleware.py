@@ -1,12 +1,20 @@
 import json
 import logging
+import random
 import time
 import uuid
-from typing import Callable, Awaitable, Optional, Dict, Any
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Awaitable, Optional, Dict, Any, Tuple
 from urllib.parse import parse_qs
 
+from fastapi import HTTPException
 from starlette.types import Scope, Receive, Send, Message
-from logging_conf import request_id_var, setup_logging
+from core import metrics
+from core.query_stats import QueryStats
+from core.slow_log import RequestTimings, log_slow_request
+from logging_conf import request_id_var, request_queries_var, request_timings_var, setup_logging
+from utils.raises import _payload_too_large
 
 setup_logging()
 _base_logger = logging.getLogger(__name__)
@@ -61,7 +69,93 @@ def _render_route_with_params(
     return base
 
 
+def _content_length(headers: Dict[bytes, bytes]) -> Optional[int]:
+    try:
+        return int(headers[b"content-length"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _render_body(body: bytes, headers: Dict[bytes, bytes], limit: int, parse: bool = False) -> Any:
+    """Truncated raw text of a textual body; json/form bodies are decoded only when parse is set."""
+    if not body or not _is_textual(headers):
+        return None
+    ct = _content_type(headers)
+    if parse and ct == b"application/json":
+        try:
+            return json.loads(_safe_decode(body, headers))
+        except Exception:
+            pass
+    elif parse and ct == b"application/x-www-form-urlencoded":
+        try:
+            qs = parse_qs(_safe_decode(body, headers), keep_blank_values=True)
+            return {k: (v[0] if isinstance(v, list) and v else v) for k, v in qs.items()}
+        except Exception:
+            pass
+    return _safe_decode(body[:limit], headers)
+
+
+class BodyLogMode(str, Enum):
+    off = "off"
+    headers = "headers"
+    sampled = "sampled"
+    errors = "errors"
+    always = "always"
+
+
+@dataclass(frozen=True)
+class BodyLogPolicy:
+    """
+    What the middleware logs for a route:
+    off - nothing, headers - request/response lines without bodies, sampled - bodies for sample_rate
+    of requests, errors - bodies only when flagged, always - bodies every time.
+    With on_error a 4xx/5xx response or one slower than slow_ms is flagged and logged with bodies in any mode.
+    """
+    mode: BodyLogMode = BodyLogMode.always
+    sample_rate: float = 1.0
+    slow_ms: Optional[float] = None
+    on_error: bool = True
+    parse: bool = False
+
+    def flagged(self, status_code: Optional[int], duration_ms: float) -> bool:
+        if not self.on_error:
+            return False
+        if status_code is None or status_code >= 400:
+            return True
+        return self.slow_ms is not None and duration_ms >= self.slow_ms
+
+    def wants_bodies(self, flagged: bool) -> bool:
+        if flagged or self.mode == BodyLogMode.always:
+            return True
+        return self.mode == BodyLogMode.sampled and random.random() < self.sample_rate
+
+
+async def _send_payload_too_large(send: Send, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
 class CorrelationIdASGIMiddleware:
+    """
+    Correlation id, request and response logging.
+    With stream_request_body the request is forwarded chunk by chunk as it arrives and only its first
+    request_body_limit bytes are kept for the log, so memory per request does not grow with the upload.
+    max_body_size rejects larger bodies with 413, by Content-Length up front or as soon as the stream exceeds it.
+    body_log_policies map a route template or a path prefix to a BodyLogPolicy; a key of the form
+    "GET /route/template" matches only that method and exact template. A method-qualified template wins,
+    then an exact template, then the longest matching prefix, then default_body_log_policy.
+    With record_metrics every request is counted and timed by route template and status (core.metrics).
+    SQL run for the request is collected in request_queries_var and added to the response log line;
+    query_stats_headers also returns it as X-DB-* headers (debug only).
+    Requests slower than slow_request_ms get a record with phase timings and their SQL in the slow log
+    (core.slow_log).
+    """
+
     def __init__(
             self,
             app: Callable[[Scope, Receive, Send], Awaitable[None]],
@@ -69,11 +163,62 @@ class CorrelationIdASGIMiddleware:
             request_body_limit: int = 8 * 1024,
             response_body_limit: int = 8 * 1024,
             log_headers: bool = False,
+            stream_request_body: bool = False,
+            max_body_size: Optional[int] = None,
+            body_log_policies: Optional[Dict[str, BodyLogPolicy]] = None,
+            default_body_log_policy: BodyLogPolicy = BodyLogPolicy(),
+            record_metrics: bool = True,
+            query_stats_headers: bool = False,
+            n_plus_one_threshold: int = 3,
+            slow_request_ms: Optional[float] = None,
     ) -> None:
         self.app = app
         self.request_body_limit = request_body_limit
         self.response_body_limit = response_body_limit
         self.log_headers = log_headers
+        self.stream_request_body = stream_request_body
+        self.max_body_size = max_body_size
+        self.body_log_policies = {}
+        self._method_policies: Dict[Tuple[str, str], BodyLogPolicy] = {}
+        for key, policy in (body_log_policies or {}).items():
+            method_name, _, template = key.partition(" ")
+            if template:
+                self._method_policies[(method_name.upper(), template)] = policy
+            else:
+                self.body_log_policies[key] = policy
+        self.default_body_log_policy = default_body_log_policy
+        self.record_metrics = record_metrics
+        self.query_stats_headers = query_stats_headers
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_request_ms = slow_request_ms
+        self._policy_prefixes = sorted(self.body_log_policies, key=len, reverse=True)
+        self._policy_by_template: Dict[Tuple[str, str], BodyLogPolicy] = {}
+
+    def resolve_policy(self, route_template: Optional[str], path: str, method: str = "") -> BodyLogPolicy:
+        if route_template is not None:
+            key = (method.upper(), route_template)
+            policy = self._policy_by_template.get(key)
+            if policy is not None:
+                return policy
+            policy = self._method_policies.get(key) or self.body_log_policies.get(route_template)
+            if policy is None:
+                policy = self._match_prefix(route_template)
+            self._policy_by_template[key] = policy
+            return policy
+        return self._match_prefix(path)
+
+    def _match_prefix(self, path: str) -> BodyLogPolicy:
+        for prefix in self._policy_prefixes:
+            if path.startswith(prefix):
+                return self.body_log_policies[prefix]
+        return self.default_body_log_policy
+
+    async def _reject_too_large(self, send: Send, detail: str, method: Optional[str], received: float) -> None:
+        """413 before the app ran: no route was matched, the request is counted as unmatched."""
+        await _send_payload_too_large(send, detail)
+        if self.record_metrics:
+            metrics.observe_request((method or "").upper(), metrics.UNMATCHED_ROUTE, 413,
+                                    time.perf_counter() - received)
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope["type"] != "http":
@@ -89,12 +234,45 @@ class CorrelationIdASGIMiddleware:
         path = scope.get("path")
         query_string = scope.get("query_string", b"").decode("utf-8")
 
+        too_large_detail = f"Request body exceeds {self.max_body_size} bytes"
+        received = time.perf_counter()
+        early_route = _render_route_with_params(None, None, path, query_string)
+        logger_early = logging.LoggerAdapter(
+            _base_logger, {"route": early_route, "method": (method or "").upper()}
+        )
+
+        declared_length = _content_length(headers_raw)
+        if self.max_body_size is not None and declared_length is not None and declared_length > self.max_body_size:
+            logger_early.warning("HTTP request rejected, content-length %s", declared_length)
+            await self._reject_too_large(send, too_large_detail, method, received)
+            request_id_var.reset(token)
+            return
+
+        req_head = bytearray()
+        req_total = 0
+
+        def _tee(message: Message) -> None:
+            nonlocal req_total
+            body = message.get("body", b"") or b""
+            req_total += len(body)
+            if self.max_body_size is not None and req_total > self.max_body_size:
+                raise _payload_too_large(too_large_detail)
+            if body and len(req_head) < self.request_body_limit:
+                req_head.extend(body[: self.request_body_limit - len(req_head)])
+
+        async def streaming_receive() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                _tee(message)
+            return message
+
         async def _read_full_body() -> bytes:
             chunks = []
             while True:
                 message = await receive()
                 if message["type"] != "http.request":
                     continue
+                _tee(message)
                 body = message.get("body", b"") or b""
                 if body:
                     chunks.append(body)
@@ -102,52 +280,43 @@ class CorrelationIdASGIMiddleware:
                     break
             return b"".join(chunks)
 
-        full_req_body = await _read_full_body()
-
-        req_ct = _content_type(headers_raw)
-        req_payload_body: Any = None
-        if req_ct == b"application/json" and full_req_body:
+        app_receive: Receive = streaming_receive
+        if not self.stream_request_body:
             try:
-                req_payload_body = json.loads(_safe_decode(full_req_body, headers_raw))
-            except Exception:
-                req_payload_body = _safe_decode(full_req_body, headers_raw)[: self.request_body_limit]
-        elif req_ct == b"application/x-www-form-urlencoded" and full_req_body:
-            try:
-                qs = parse_qs(_safe_decode(full_req_body, headers_raw), keep_blank_values=True)
-                req_payload_body = {k: (v[0] if isinstance(v, list) and v else v) for k, v in qs.items()}
-            except Exception:
-                req_payload_body = _safe_decode(full_req_body, headers_raw)[: self.request_body_limit]
-        elif _is_textual(headers_raw) and full_req_body:
-            req_payload_body = _safe_decode(full_req_body, headers_raw)[: self.request_body_limit]
+                full_req_body = await _read_full_body()
+            except HTTPException as ex:
+                logger_early.warning("HTTP request rejected, body over %s bytes", self.max_body_size)
+                await self._reject_too_large(send, ex.detail, method, received)
+                request_id_var.reset(token)
+                return
 
-        early_route = _render_route_with_params(None, None, path, query_string)
-        logger_early = logging.LoggerAdapter(
-            _base_logger, {"route": early_route, "method": (method or "").upper()}
-        )
-
-        if req_payload_body is not None:
-            logger_early.info("HTTP request %s", {"body": req_payload_body})
-        else:
-            logger_early.info("HTTP request {}")
+            replayed = False
 
-        replayed = False
+            async def replay_receive() -> Message:
+                nonlocal replayed
+                if not replayed:
+                    replayed = True
+                    return {"type": "http.request", "body": full_req_body, "more_body": False}
+                return {"type": "http.request", "body": b"", "more_body": False}
 
-        async def replay_receive() -> Message:
-            nonlocal replayed
-            if not replayed:
-                replayed = True
-                return {"type": "http.request", "body": full_req_body, "more_body": False}
-            return {"type": "http.request", "body": b"", "more_body": False}
+            app_receive = replay_receive
 
         status_code: Optional[int] = None
         resp_headers_raw: Dict[bytes, bytes] = {}
         resp_body_chunks: list[bytes] = []
         resp_total = 0
 
+        query_stats = QueryStats(self.n_plus_one_threshold)
+        queries_token = request_queries_var.set(query_stats)
+        timings = RequestTimings() if self.slow_request_ms is not None else None
+        timings_token = request_timings_var.set(timings)
+
         async def send_wrapper(message: Message) -> None:
             nonlocal status_code, resp_total, resp_headers_raw
             if message["type"] == "http.response.start":
                 status_code = message["status"]
+                if self.query_stats_headers:
+                    message = {**message, "headers": [*(message.get("headers") or []), *query_stats.headers()]}
                 for k, v in (message.get("headers") or []):
                     resp_headers_raw[k.lower()] = v
             elif message["type"] == "http.response.body":
@@ -158,9 +327,16 @@ class CorrelationIdASGIMiddleware:
                 resp_total += len(body)
             await send(message)
 
+        if self.record_metrics:
+            metrics.HTTP_IN_FLIGHT.inc()
         started = time.perf_counter()
         try:
-            await self.app(scope, replay_receive, send_wrapper)
+            await self.app(scope, app_receive, send_wrapper)
+        except HTTPException as ex:
+            # raised by the streaming receive when the app is not FastAPI and lets it through
+            if ex.status_code != 413 or status_code is not None:
+                raise
+            await _send_payload_too_large(send_wrapper, ex.detail)
         finally:
             route_template = None
             path_params = None
@@ -177,20 +353,38 @@ class CorrelationIdASGIMiddleware:
                 _base_logger, {"route": final_route, "method": (method or "").upper()}
             )
 
-            resp_body_b = b"".join(resp_body_chunks)
-            resp_ct = _content_type(resp_headers_raw)
-            resp_payload_body: Any = None
-            if resp_ct == b"application/json" and resp_body_b:
-                try:
-                    resp_payload_body = json.loads(_safe_decode(resp_body_b, resp_headers_raw))
-                except Exception:
-                    resp_payload_body = _safe_decode(resp_body_b, resp_headers_raw)[: self.response_body_limit]
-            elif _is_textual(resp_headers_raw) and resp_body_b:
-                resp_payload_body = _safe_decode(resp_body_b, resp_headers_raw)[: self.response_body_limit]
-
-            if resp_payload_body is not None:
-                logger.info("HTTP response %s %s", status_code, {"body": resp_payload_body})
-            else:
-                logger.info("HTTP response %s {}", status_code)
+            duration_ms = (time.perf_counter() - started) * 1000
+            if self.record_metrics:
+                metrics.HTTP_IN_FLIGHT.dec()
+                metrics.observe_request((method or "").upper(), route_template or metrics.UNMATCHED_ROUTE,
+                                        status_code or 500, duration_ms / 1000)
+            query_log = query_stats.as_log() if query_stats.count else None
+            policy = self.resolve_policy(route_template, path, method or "")
+            flagged = policy.flagged(status_code, duration_ms)
+            if policy.mode != BodyLogMode.off or flagged:
+                request_line: Dict[str, Any] = {"size": req_total}
+                response_line: Dict[str, Any] = {"size": resp_total, "duration_ms": round(duration_ms, 2)}
+                if policy.wants_bodies(flagged):
+                    req_payload_body = _render_body(bytes(req_head), headers_raw, self.request_body_limit,
+                                                    policy.parse)
+                    if req_payload_body is not None:
+                        request_line["body"] = req_payload_body
+                    resp_payload_body = _render_body(b"".join(resp_body_chunks), resp_headers_raw,
+                                                     self.response_body_limit, policy.parse)
+                    if resp_payload_body is not None:
+                        response_line["body"] = resp_payload_body
+                if query_log is not None:
+                    response_line["queries"] = query_log
+                logger.info("HTTP request %s", request_line)
+                logger.info("HTTP response %s %s", status_code, response_line)
+            if query_log is not None and "n_plus_one" in query_log:
+                logger.warning("Suspected N+1 queries %s", query_log["n_plus_one"])
+            if timings is not None and duration_ms >= self.slow_request_ms:
+                log_slow_request(request_id=process_id, method=(method or "").upper(), route=route_template,
+                                 path=path, status_code=status_code, duration_ms=duration_ms,
+                                 timings=timings, stats=query_stats)
+
+            request_timings_var.reset(timings_token)
+            request_queries_var.reset(queries_token)
 
             request_id_var.reset(token)
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import bcrypt
+
+from core import metrics
+from core.config import settings
+from utils.raises import _service_unavailable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TimingStats:
+    count: int = 0
+    total_sec: float = 0.0
+    max_sec: float = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total_sec += seconds
+        self.max_sec = max(self.max_sec, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_sec / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max_sec * 1000, 3),
+        }
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt off the event loop in a dedicated thread pool (bcrypt releases the GIL).
+    At most max_pending operations may be queued or running; the next one fails fast with 503
+    instead of piling up behind a login storm. An operation counts until its job leaves the pool:
+    when the caller is cancelled (client disconnect) a queued job is dropped, a running one still
+    occupies its worker until bcrypt returns.
+    Queue wait, bcrypt time, pending operations and rejections are exported to core.metrics too.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, rounds: int = 12) -> None:
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password")
+        self._pending = 0
+        self.rejected = 0
+        self.queue_wait = TimingStats()
+        self.hash_time = TimingStats()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def hash(self, plain: str) -> str:
+        hashed = await self._run(bcrypt.hashpw, plain.encode(), bcrypt.gensalt(rounds=self.rounds))
+        return hashed.decode()
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._run(bcrypt.checkpw, plain.encode(), hashed.encode())
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "queue_wait": self.queue_wait.as_dict(),
+            "hash_time": self.hash_time.as_dict(),
+        }
+
+    def _release(self) -> None:
+        self._pending -= 1
+        metrics.PASSWORD_PENDING.set(self._pending)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            metrics.PASSWORD_REJECTED.inc()
+            logger.warning("Password executor saturated, pending %s", self._pending)
+            raise _service_unavailable("Too many authentication requests, try again later")
+        loop = asyncio.get_running_loop()
+        enqueued = time.perf_counter()
+
+        def job() -> tuple[Any, float, float]:
+            started = time.perf_counter()
+            result = func(*args)
+            return result, started - enqueued, time.perf_counter() - started
+
+        def release(_) -> None:
+            # from the worker thread, or right away when the job was cancelled before it started
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                pass  # loop already closed
+
+        future = self._executor.submit(job)
+        self._pending += 1
+        metrics.PASSWORD_PENDING.set(self._pending)
+        future.add_done_callback(release)
+        result, waited, took = await asyncio.wrap_future(future)
+        self.queue_wait.observe(waited)
+        self.hash_time.observe(took)
+        metrics.PASSWORD_QUEUE_WAIT.observe(waited)
+        metrics.PASSWORD_HASH_TIME.observe(took)
+        return result
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
@@ -0,0 +1,67 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+from core.config import settings
+from core.security import token_digest
+from db.schemas.user_schema import UserAdminGetModelSchema
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class PrincipalCache:
+    """
+    Per-worker cache of authenticated users keyed by the digest of their bearer token.
+    Entries live for ttl_sec at most and never outlive the token itself.
+    """
+
+    def __init__(self, max_size: int, ttl_sec: float) -> None:
+        self._entries = TTLCache(max_size, ttl_sec, on_evict=self._forget_key)
+        self._keys_by_user: Dict[int, Set[str]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._entries.enabled
+
+    def configure(self, max_size: int, ttl_sec: float) -> None:
+        self.clear()
+        self._entries.max_size = max_size
+        self._entries.ttl_sec = ttl_sec
+
+    def get(self, raw_token: str) -> Optional[UserAdminGetModelSchema]:
+        if not self.enabled:
+            return None
+        return self._entries.get(token_digest(raw_token))
+
+    def put(self, raw_token: str, user: UserAdminGetModelSchema, token_limit_verify: int) -> None:
+        if not self.enabled:
+            return
+        key = token_digest(raw_token)
+        if self._entries.set(key, user, token_limit_verify - datetime.now(timezone.utc).timestamp()):
+            self._keys_by_user.setdefault(user.id, set()).add(key)
+
+    def invalidate_user(self, user_id: int) -> None:
+        keys = self._keys_by_user.pop(user_id, None)
+        if not keys:
+            return
+        logger.info("Invalidate principal cache for user %s", user_id)
+        for key in keys:
+            self._entries.pop(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+    def _forget_key(self, key: str, user: UserAdminGetModelSchema) -> None:
+        keys = self._keys_by_user.get(user.id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user.id]
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_MAX_SIZE, settings.PRINCIPAL_CACHE_TTL_SEC)
@@ -0,0 +1,77 @@
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from logging_conf import repository_call_var, request_queries_var
+
+STATEMENT_LOG_LIMIT = 500
+# statements kept in order for the slow log; counting and timing go on past it
+MAX_RECORDED_STATEMENTS = 100
+
+
+@dataclass
+class QueryStats:
+    """SQL executed while serving one request: count, total time, the slowest statement and repeats."""
+    n_plus_one_threshold: int = 3
+    count: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_statement: Optional[str] = None
+    slowest_parameters: Any = None
+    statements: Counter = field(default_factory=Counter)
+    executed: list[tuple[str, float, Optional[str]]] = field(default_factory=list)
+
+    def observe(self, statement: str, elapsed_ms: float, parameters: Any = None,
+                repository: Optional[str] = None) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] += 1
+        if len(self.executed) < MAX_RECORDED_STATEMENTS:
+            self.executed.append((statement, elapsed_ms, repository))
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+            self.slowest_parameters = parameters
+
+    def suspected_n_plus_one(self) -> list[tuple[str, int]]:
+        """Identical statements run at least n_plus_one_threshold times in the request."""
+        return [(statement, times) for statement, times in self.statements.most_common()
+                if times >= self.n_plus_one_threshold]
+
+    def as_log(self) -> dict:
+        record = {"count": self.count, "db_ms": round(self.total_ms, 2)}
+        if self.slowest_statement is not None:
+            record["slowest_ms"] = round(self.slowest_ms, 2)
+            record["slowest"] = self.slowest_statement[:STATEMENT_LOG_LIMIT]
+        repeated = self.suspected_n_plus_one()
+        if repeated:
+            record["n_plus_one"] = [{"statement": statement[:STATEMENT_LOG_LIMIT], "times": times}
+                                    for statement, times in repeated]
+        return record
+
+    def headers(self) -> list[tuple[bytes, bytes]]:
+        return [
+            (b"x-db-query-count", str(self.count).encode()),
+            (b"x-db-time-ms", f"{self.total_ms:.2f}".encode()),
+            (b"x-db-n-plus-one", str(len(self.suspected_n_plus_one())).encode()),
+        ]
+
+
+def instrument_query_stats(engine: AsyncEngine) -> None:
+    """Count and time every cursor execution into the QueryStats of the current request, if any."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and request_queries_var.get() is not None:
+            context.query_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "query_started", None)
+        stats = request_queries_var.get()
+        if started is not None and stats is not None:
+            stats.observe(statement, (time.perf_counter() - started) * 1000, parameters, repository_call_var.get())
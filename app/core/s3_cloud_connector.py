@@ -2,6 +2,7 @@ import aioboto3
 from botocore.exceptions import ClientError
 from fastapi import UploadFile
 from core.config import settings
+from core.metrics import external_failed, timed_external
 
 
 class S3CloudConnector:
@@ -14,6 +15,7 @@ class S3CloudConnector:
             region_name=settings.CLOUD_REGION,
         )
 
+    @timed_external("s3", "list_objects")
     async def get_list_objects_on_bucket(self, bucket):
         async with self.session.client("s3", endpoint_url=self.endpoint) as s3:
             try:
@@ -22,18 +24,22 @@ class S3CloudConnector:
                     return [obj["Key"] for obj in response["Contents"]]
                 return []
             except ClientError as e:
+                external_failed("s3", "list_objects")
                 print(f"Error: {e}")
                 return []
 
+    @timed_external("s3", "download")
     async def download_file(self, bucket, key, object_name, local_path):
         async with self.session.client("s3", endpoint_url=self.endpoint) as s3:
             try:
                 await s3.download_file(bucket, f"{key}/{object_name}", local_path)
                 return True
             except ClientError as e:
+                external_failed("s3", "download")
                 print(f"Download error: {e}")
                 return False
 
+    @timed_external("s3", "upload")
     async def upload_upload_file(self, bucket, key: str, file: UploadFile, public) -> str | None:
         async with self.session.client("s3", endpoint_url=self.endpoint) as client:
             try:
@@ -43,9 +49,11 @@ class S3CloudConnector:
                 await client.upload_fileobj(file, bucket, key, ExtraArgs=extra_args)
                 return f"https://storage.yandexcloud.net/{bucket}/{key}"
             except ClientError as e:
+                external_failed("s3", "upload")
                 print(f"Upload error: {e}")
                 return None
 
+    @timed_external("s3", "presign")
     async def get_file_url(self, bucket, object_name, expires=3600):
         async with self.session.client("s3", endpoint_url=self.endpoint) as s3:
             try:
@@ -56,15 +64,18 @@ class S3CloudConnector:
                 )
                 return url
             except ClientError as e:
+                external_failed("s3", "presign")
                 print(f"Error: {e}")
                 return None
 
+    @timed_external("s3", "delete")
     async def remove_file_url(self, bucket, key):
         async with self.session.client("s3", endpoint_url=self.endpoint) as s3:
             if key is not None:
                 try:
                     return await s3.delete_object(Bucket=bucket, Key=key)
                 except ClientError as e:
+                    external_failed("s3", "delete")
                     print(f"Error: {e}")
                     return None
             return None
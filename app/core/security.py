@@ -1 +1,6 @@
+import hashlib
 
+
+def token_digest(raw_token: str) -> str:
+    """SHA-256 hex digest of a raw bearer token, used as a fixed-width lookup key."""
+    return hashlib.sha256(raw_token.encode()).hexdigest()
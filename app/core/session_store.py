@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional, Set
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.principal_cache import principal_cache
+from core.security import token_digest
+from db.schemas.user_schema import UserAdminGetModelSchema
+
+logger = logging.getLogger(__name__)
+
+
+class RedisSessionStore:
+    """
+    Optional shared auth cache: token digest -> user snapshot, expiring together with the token.
+    Postgres stays the source of truth. Every Redis failure is logged and treated as a miss,
+    after which Redis is skipped for retry_sec so a dead Redis does not slow down requests.
+    Invalidations are broadcast over pub/sub so every worker drops its local principal cache.
+
+    Each snapshot records the user's generation at the time it was written, and invalidating a
+    user increments it, so a snapshot that the delete missed is never trusted again. An
+    invalidation Redis rejected is kept and retried every retry_sec, and until it goes through
+    this worker does not read or write snapshots of that user.
+    """
+
+    def __init__(
+            self,
+            client: Optional[Any],
+            *,
+            prefix: str = "session",
+            channel: str = "auth:invalidate",
+            retry_sec: float = 5,
+            generation_ttl_sec: int = settings.VERIFY_TOKEN_TTL_MIN * 60,
+    ) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.channel = channel
+        self.retry_sec = retry_sec
+        self.generation_ttl_sec = generation_ttl_sec
+        self._skip_until = 0.0
+        self._listener: Optional[asyncio.Task] = None
+        self._pending: Set[int] = set()
+        self._retry: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None
+
+    @property
+    def available(self) -> bool:
+        return self.enabled and time.monotonic() >= self._skip_until
+
+    def _session_key(self, raw_token: str) -> str:
+        return f"{self.prefix}:{token_digest(raw_token)}"
+
+    def _user_key(self, user_id: int) -> str:
+        return f"{self.prefix}_user:{user_id}"
+
+    def _generation_key(self, user_id: int) -> str:
+        return f"{self.prefix}_generation:{user_id}"
+
+    def _failed(self, action: str, ex: Exception) -> None:
+        logger.warning("Redis session store %s failed, fallback to database: %s", action, ex)
+        self._skip_until = time.monotonic() + self.retry_sec
+
+    async def get(self, raw_token: str, user_id: int) -> Optional[UserAdminGetModelSchema]:
+        if not self.available or not await self._flush_pending(user_id):
+            return None
+        try:
+            snapshot, generation = await self.client.mget(self._session_key(raw_token),
+                                                          self._generation_key(user_id))
+        except (RedisError, OSError) as ex:
+            self._failed("get", ex)
+            return None
+        if snapshot is None:
+            return None
+        written, _, data = snapshot.partition(":")
+        if written != str(generation or 0):
+            # written before the user was invalidated
+            return None
+        user = UserAdminGetModelSchema.model_validate_json(data)
+        return user if user.id == user_id else None
+
+    async def put(self, raw_token: str, user: UserAdminGetModelSchema, token_limit_verify: int) -> None:
+        if not self.available or not await self._flush_pending(user.id):
+            return
+        ttl = int(token_limit_verify - datetime.now(timezone.utc).timestamp())
+        if ttl <= 0:
+            return
+        session_key = self._session_key(raw_token)
+        user_key = self._user_key(user.id)
+        try:
+            # an invalidation between this read and the set bumps the generation past the snapshot's
+            generation = await self.client.get(self._generation_key(user.id))
+            await self.client.set(session_key, f"{generation or 0}:{user.model_dump_json()}", ex=ttl)
+            await self.client.sadd(user_key, session_key)
+            # the per-user index must outlive the longest of its sessions
+            await self.client.expire(user_key, ttl, nx=True)
+            await self.client.expire(user_key, ttl, gt=True)
+        except (RedisError, OSError) as ex:
+            self._failed("put", ex)
+
+    async def invalidate_user(self, user_id: int) -> None:
+        """Never skipped: when Redis fails the invalidation is retried until it goes through."""
+        if not self.enabled:
+            return
+        self._pending.add(user_id)
+        if not await self._flush_pending(user_id) and self._retry is None:
+            self._retry = asyncio.create_task(self._retry_pending())
+
+    async def _invalidate(self, user_id: int) -> None:
+        generation_key = self._generation_key(user_id)
+        await self.client.incr(generation_key)
+        # outlives every snapshot written before the increment, a snapshot written after it may
+        # outlive the key and then only misses
+        await self.client.expire(generation_key, self.generation_ttl_sec)
+        user_key = self._user_key(user_id)
+        session_keys = await self.client.smembers(user_key)
+        if session_keys:
+            await self.client.delete(*session_keys)
+        await self.client.delete(user_key)
+        await self.client.publish(self.channel, str(user_id))
+
+    async def _flush_pending(self, user_id: Optional[int] = None) -> bool:
+        """Send the queued invalidations; False while user_id (any user without one) is still queued."""
+        for pending in list(self._pending):
+            try:
+                await self._invalidate(pending)
+            except (RedisError, OSError) as ex:
+                self._failed("invalidate", ex)
+                break
+            self._pending.discard(pending)
+        if user_id is None:
+            return not self._pending
+        return user_id not in self._pending
+
+    async def _retry_pending(self) -> None:
+        try:
+            while self._pending:
+                await asyncio.sleep(self.retry_sec)
+                await self._flush_pending()
+        finally:
+            self._retry = None
+
+    async def start(self) -> None:
+        if self.enabled and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        for task in (self._listener, self._retry):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._listener = self._retry = None
+        if self.enabled:
+            await self.client.aclose()
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                logger.info("Subscribed to %s", self.channel)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        user_id = int(message["data"])
+                    except (TypeError, ValueError):
+                        logger.warning("Ignoring invalidation message %r", message.get("data"))
+                        continue
+                    principal_cache.invalidate_user(user_id)
+            except (RedisError, OSError) as ex:
+                logger.warning("Redis invalidation listener lost connection: %s", ex)
+                await asyncio.sleep(self.retry_sec)
+            except Exception:
+                # anything else would end the listener for the life of the worker
+                logger.exception("Redis invalidation listener failed, resubscribing")
+                await asyncio.sleep(self.retry_sec)
+            finally:
+                await pubsub.aclose()
+
+
+def _make_client() -> Optional[Redis]:
+    if not settings.REDIS_SESSION_ENABLED:
+        return None
+    return Redis.from_url(
+        settings.REDIS_URL,
+        password=settings.REDIS_PASSWORD or None,
+        decode_responses=True,
+        socket_timeout=settings.REDIS_SESSION_TIMEOUT_SEC,
+        socket_connect_timeout=settings.REDIS_SESSION_TIMEOUT_SEC,
+    )
+
+
+session_store = RedisSessionStore(_make_client(), retry_sec=settings.REDIS_SESSION_RETRY_SEC)
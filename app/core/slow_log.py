@@ -0,0 +1,239 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import random
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.config import settings
+from core.query_stats import STATEMENT_LOG_LIMIT, QueryStats
+from logging_conf import repository_call_var, request_queries_var, request_timings_var
+
+logger = logging.getLogger(__name__)
+# written to its own rotating file (slow.log), see logging_conf
+slow_logger = logging.getLogger("slow_requests")
+
+
+@dataclass
+class RequestTimings:
+    """Milliseconds spent per phase of one request, filled by timed_phase, TimedRoute and BaseRepo."""
+    phases: dict[str, float] = field(default_factory=dict)
+    endpoint_started: Optional[float] = None
+    endpoint_finished: Optional[float] = None
+
+    def add(self, phase: str, elapsed_ms: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed_ms
+
+    def as_log(self) -> dict:
+        return {phase: round(elapsed_ms, 2) for phase, elapsed_ms in self.phases.items()}
+
+
+@contextmanager
+def timed_phase(phase: str) -> Iterator[None]:
+    timings = request_timings_var.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, (time.perf_counter() - started) * 1000)
+
+
+def timed_dependency(phase: str):
+    """Decorator timing a coroutine dependency as a phase; the signature is kept for FastAPI."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with timed_phase(phase):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def timed_repository_method(name: str, func: Callable) -> Callable:
+    """
+    Time a repository coroutine as the "repository" phase and tag the SQL it runs with its name.
+    Only the outermost repository call of a chain is counted.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if request_timings_var.get() is None or repository_call_var.get() is not None:
+            return await func(*args, **kwargs)
+        call_token = repository_call_var.set(name)
+        try:
+            with timed_phase("repository"):
+                return await func(*args, **kwargs)
+        finally:
+            repository_call_var.reset(call_token)
+
+    return wrapper
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            timings = request_timings_var.get()
+            if timings is not None:
+                timings.endpoint_started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings.endpoint_finished = time.perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            timings = request_timings_var.get()
+            if timings is not None:
+                timings.endpoint_started = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings.endpoint_finished = time.perf_counter()
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute splitting the handler time into dependencies (auth included), service (the endpoint body)
+    and serialization (response model validation and rendering, dependency teardown).
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timings = request_timings_var.get()
+            if timings is None:
+                return await handler(request)
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                finished = time.perf_counter()
+                endpoint_started, endpoint_finished = timings.endpoint_started, timings.endpoint_finished
+                if endpoint_started is None:
+                    timings.add("dependencies", (finished - started) * 1000)
+                else:
+                    timings.add("dependencies", (endpoint_started - started) * 1000)
+                    timings.add("service", ((endpoint_finished or finished) - endpoint_started) * 1000)
+                    if endpoint_finished is not None:
+                        timings.add("serialization", (finished - endpoint_finished) * 1000)
+
+        return timed_handler
+
+
+# FOR UPDATE / NO KEY UPDATE / SHARE / KEY SHARE
+LOCKING_CLAUSE = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|SHARE|KEY\s+SHARE)\b", re.IGNORECASE)
+
+
+def explain_statement(statement: str) -> str:
+    """EXPLAIN (ANALYZE, BUFFERS) runs the statement; a locking SELECT only gets its plan, it must not lock again."""
+    if LOCKING_CLAUSE.search(statement):
+        return f"EXPLAIN {statement}"
+    return f"EXPLAIN (ANALYZE, BUFFERS) {statement}"
+
+
+class ExplainSampler:
+    """
+    EXPLAIN (ANALYZE, BUFFERS) of the slowest SELECT of a slow request, on PostgreSQL only.
+    Runs as a background task after the response, in a transaction that is rolled back, for sample_rate
+    of the slow requests and never more than one at a time, so a slow database is not loaded further.
+    A SELECT ... FOR UPDATE/SHARE gets a plain EXPLAIN, see explain_statement.
+    """
+
+    def __init__(self, sample_rate: float, timeout_ms: int = 10000) -> None:
+        self.sample_rate = sample_rate
+        self.timeout_ms = timeout_ms
+        self.engine: Optional[AsyncEngine] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def attach(self, engine: AsyncEngine) -> None:
+        if engine.dialect.name == "postgresql":
+            self.engine = engine
+
+    def maybe_explain(self, request_id: str, route: Optional[str], stats: QueryStats) -> bool:
+        statement = stats.slowest_statement
+        if self.engine is None or statement is None or not statement.lstrip().upper().startswith("SELECT"):
+            return False
+        if self._task is not None and not self._task.done():
+            return False
+        if random.random() >= self.sample_rate:
+            return False
+        self._task = asyncio.create_task(self._explain(request_id, route, statement, stats.slowest_parameters))
+        return True
+
+    async def _explain(self, request_id: str, route: Optional[str], statement: str, parameters: Any) -> None:
+        # the task inherits the request context; its own queries do not belong to the request
+        request_queries_var.set(None)
+        request_timings_var.set(None)
+        try:
+            async with self.engine.connect() as conn:
+                transaction = await conn.begin()
+                try:
+                    await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(self.timeout_ms)}")
+                    result = await conn.exec_driver_sql(explain_statement(statement), parameters)
+                    plan = [row[0] for row in result]
+                finally:
+                    await transaction.rollback()
+        except Exception as ex:
+            logger.warning("EXPLAIN of slow statement failed: %s", ex)
+            return
+        slow_logger.info(json.dumps({
+            "request_id": request_id,
+            "route": route,
+            "statement": statement[:STATEMENT_LOG_LIMIT],
+            "explain": plan,
+        }))
+
+
+explain_sampler = ExplainSampler(settings.SLOW_EXPLAIN_SAMPLE_RATE)
+
+
+def log_slow_request(
+        *,
+        request_id: str,
+        method: str,
+        route: Optional[str],
+        path: str,
+        status_code: Optional[int],
+        duration_ms: float,
+        timings: RequestTimings,
+        stats: QueryStats,
+) -> None:
+    record: dict[str, Any] = {
+        "request_id": request_id,
+        "method": method,
+        "route": route,
+        "path": path,
+        "status": status_code,
+        "duration_ms": round(duration_ms, 2),
+        "phases": {**timings.as_log(), "db": round(stats.total_ms, 2)},
+        "queries": stats.as_log(),
+        "statements": [
+            {"sql": statement[:STATEMENT_LOG_LIMIT], "ms": round(elapsed_ms, 2), "repository": repository}
+            for statement, elapsed_ms, repository in stats.executed
+        ],
+    }
+    if explain_sampler.maybe_explain(request_id, route, stats):
+        record["explain"] = "sampled"
+    slow_logger.info(json.dumps(record, default=str))
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.config import settings
+from repositories.user_repository import UserRepository
+
+logger = logging.getLogger(__name__)
+
+# users.updated_at is the transaction start time, a bump committed late may carry an older
+# timestamp than the watermark; rows inside the overlap are re-read, set() keeps the max anyway
+WATERMARK_OVERLAP = timedelta(seconds=30)
+
+
+def _utc(moment: datetime) -> datetime:
+    # SQLite hands back naive timestamps, PostgreSQL aware ones
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+class TokenGenerationMap:
+    """
+    Per-worker user_id -> token_generation map used to verify stateless access tokens.
+    Only users whose generation was ever bumped are kept; everybody else is at generation 0.
+    Next to it the map keeps users.updated_at of the users changed within a token lifetime, so a
+    principal claim older than its user's row is not trusted.
+    The map is loaded once and then refreshed incrementally by users.updated_at. A deleted row leaves
+    no trace there: users whose claims were trusted within a token lifetime are probed by id on every
+    refresh, and the ones gone are revoked like a user deleted on this worker.
+    """
+
+    def __init__(self, refresh_sec: float,
+                 token_ttl: timedelta = timedelta(minutes=settings.VERIFY_TOKEN_TTL_MIN)) -> None:
+        self.refresh_sec = refresh_sec
+        self.token_ttl = token_ttl
+        self._generations: Dict[int, int] = {}
+        self._changed: Dict[int, datetime] = {}
+        # user_id -> time.monotonic() of the last trusted claim / of the revocation
+        self._trusted: Dict[int, float] = {}
+        self._revoked: Dict[int, float] = {}
+        self._watermark: Optional[datetime] = None
+        self._loaded = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self, user_id: int) -> Optional[int]:
+        """Current generation of the user, None while the map has not been loaded yet."""
+        if not self._loaded:
+            return None
+        return self._generations.get(user_id, 0)
+
+    def set(self, user_id: int, generation: int) -> None:
+        if generation > self._generations.get(user_id, 0):
+            self._generations[user_id] = generation
+
+    def touch(self, user_id: int, updated_at: datetime) -> None:
+        updated_at = _utc(updated_at)
+        current = self._changed.get(user_id)
+        if current is None or updated_at > current:
+            self._changed[user_id] = updated_at
+
+    def trust(self, user_id: int) -> None:
+        self._trusted[user_id] = time.monotonic()
+
+    def revoke(self, user_id: int) -> None:
+        """Refuse every token of a deleted user."""
+        self._revoked[user_id] = time.monotonic()
+        self._trusted.pop(user_id, None)
+
+    def revoked(self, user_id: int) -> bool:
+        return user_id in self._revoked
+
+    def changed_since(self, user_id: int, updated_at: datetime) -> bool:
+        """Whether the user's row changed after updated_at, as far as the map knows."""
+        changed = self._changed.get(user_id)
+        return changed is not None and changed > _utc(updated_at)
+
+    async def refresh(self, repo: UserRepository) -> None:
+        if self._loaded:
+            await self._revoke_deleted(repo)
+        if self._loaded and self._watermark is not None:
+            rows = await repo.get_token_generations(self._watermark - WATERMARK_OVERLAP)
+        else:
+            self._watermark = await repo.get_last_updated_at()
+            # a live token was issued within token_ttl, only changes after that can make its claim stale
+            since = self._watermark - self.token_ttl if self._watermark is not None else None
+            rows = await repo.get_token_generations(since, bumped=True)
+        for user_id, generation, updated_at in rows:
+            self.set(user_id, generation)
+            if updated_at is not None:
+                self.touch(user_id, updated_at)
+                if self._watermark is None or updated_at > self._watermark:
+                    self._watermark = updated_at
+        if self._watermark is not None:
+            expired = _utc(self._watermark) - self.token_ttl
+            self._changed = {user_id: changed for user_id, changed in self._changed.items() if changed > expired}
+        self._loaded = True
+
+    async def _revoke_deleted(self, repo: UserRepository) -> None:
+        expired = time.monotonic() - self.token_ttl.total_seconds()
+        self._trusted = {user_id: at for user_id, at in self._trusted.items() if at > expired}
+        self._revoked = {user_id: at for user_id, at in self._revoked.items() if at > expired}
+        trusted = set(self._trusted)
+        if not trusted:
+            return
+        for user_id in trusted - await repo.get_existing_user_ids(trusted):
+            self.revoke(user_id)
+
+    async def start(self, session_maker: async_sessionmaker) -> None:
+        if not settings.AUTH_STATELESS_TOKENS or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._refresh_loop(session_maker))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _refresh_loop(self, session_maker: async_sessionmaker) -> None:
+        while True:
+            try:
+                async with session_maker() as session:
+                    await self.refresh(UserRepository(session))
+            except Exception as ex:
+                logger.warning("Token generation refresh failed: %s", ex)
+            await asyncio.sleep(self.refresh_sec)
+
+
+token_generations = TokenGenerationMap(settings.TOKEN_GENERATION_REFRESH_SEC)
@@ -0,0 +1,30 @@
+"""token generation for stateless access tokens
+
+Revision ID: 28ff340128db
+Revises: 3815d4d8f009
+Create Date: 2026-10-17 10:12:41.203518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '28ff340128db'
+down_revision: Union[str, Sequence[str], None] = '3815d4d8f009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_generation', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_users_updated_at', 'users', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_updated_at', table_name='users')
+    op.drop_column('users', 'token_generation')
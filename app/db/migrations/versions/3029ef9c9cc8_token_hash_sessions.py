@@ -0,0 +1,51 @@
+"""hash-keyed multi-session tokens
+
+Revision ID: 3029ef9c9cc8
+Revises: 28ff340128db
+Create Date: 2026-10-17 11:40:27.918264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3029ef9c9cc8'
+down_revision: Union[str, Sequence[str], None] = '28ff340128db'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tokens', sa.Column('token_hash', sa.String(length=64), nullable=True))
+    op.add_column('tokens', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+    # existing sessions keep working; their real expiry is still enforced by the JWT itself,
+    # expires_at only has to be late enough for the purge not to drop live rows
+    op.execute(
+        "UPDATE tokens SET token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex'), "
+        "expires_at = now() + interval '1 day'"
+    )
+    op.alter_column('tokens', 'token_hash', nullable=False)
+    op.alter_column('tokens', 'expires_at', nullable=False)
+    op.drop_index(op.f('ix_tokens_token'), table_name='tokens')
+    op.create_index(op.f('ix_tokens_token_hash'), 'tokens', ['token_hash'], unique=True)
+    op.create_index(op.f('ix_tokens_expires_at'), 'tokens', ['expires_at'], unique=False)
+    op.create_index('ix_tokens_user_id_expires_at', 'tokens', ['user_id', 'expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tokens_user_id_expires_at', table_name='tokens')
+    op.drop_index(op.f('ix_tokens_expires_at'), table_name='tokens')
+    op.drop_index(op.f('ix_tokens_token_hash'), table_name='tokens')
+    # back to one token per user: keep the newest session
+    op.execute(
+        "DELETE FROM tokens t USING tokens newer "
+        "WHERE newer.user_id = t.user_id AND newer.id > t.id"
+    )
+    op.create_index(op.f('ix_tokens_token'), 'tokens', ['token'], unique=False)
+    op.drop_column('tokens', 'expires_at')
+    op.drop_column('tokens', 'token_hash')
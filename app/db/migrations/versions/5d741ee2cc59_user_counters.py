@@ -0,0 +1,49 @@
+"""per-user counters of exercises, workouts and groups
+
+Revision ID: 5d741ee2cc59
+Revises: aab4ee59bc3d
+Create Date: 2026-10-17 16:20:12.554031
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d741ee2cc59'
+down_revision: Union[str, Sequence[str], None] = 'aab4ee59bc3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exercises', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('workouts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('groups', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    # rows created while this runs and the app still counts with COUNT(*) are fixed by
+    # reconcile_user_counters_task; users without a row get one on their next create
+    op.execute(
+        "INSERT INTO user_counters (user_id, exercises, workouts, groups) "
+        "SELECT u.id, "
+        "(SELECT count(*) FROM exercises e WHERE e.user_id = u.id), "
+        "(SELECT count(*) FROM workouts w WHERE w.user_id = u.id), "
+        "(SELECT count(*) FROM groups g WHERE g.user_id = u.id) "
+        "FROM users u"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_counters')
@@ -0,0 +1,29 @@
+"""version of workouts for optimistic PATCH edits
+
+Revision ID: 7c1f0e9a4b2d
+Revises: d22d11523a68
+Create Date: 2026-10-17 19:12:08.671250
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1f0e9a4b2d'
+down_revision: Union[str, Sequence[str], None] = 'd22d11523a68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # a constant default, so PostgreSQL adds the column without rewriting the table
+    op.add_column('workouts', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('workouts', 'version')
@@ -0,0 +1,54 @@
+"""composite indexes for per-user lists and association lookups
+
+Revision ID: aab4ee59bc3d
+Revises: 3029ef9c9cc8
+Create Date: 2026-10-17 15:02:41.306518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'aab4ee59bc3d'
+down_revision: Union[str, Sequence[str], None] = '3029ef9c9cc8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, unique)
+INDEXES = (
+    ('ix_exercises_user_id_created_at', 'exercises', ['user_id', 'created_at'], False),
+    ('ix_workouts_user_id_created_at', 'workouts', ['user_id', 'created_at'], False),
+    ('ix_groups_user_id_created_at', 'groups', ['user_id', 'created_at'], False),
+    # workouts shared through a group: groups.any(...) correlates on groups.workout_id
+    ('ix_groups_workout_id', 'groups', ['workout_id'], False),
+    ('ix_association_workout_exercises_workout_id_position', 'association_workout_exercises',
+     ['workout_id', 'position'], False),
+    ('ix_association_workout_exercises_exercise_id', 'association_workout_exercises', ['exercise_id'], False),
+    ('uq_association_group_members_group_id_user_id', 'association_group_members', ['group_id', 'user_id'], True),
+    ('ix_association_group_members_user_id', 'association_group_members', ['user_id'], False),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # the unique membership index cannot be built over duplicates; keep the oldest row of each pair
+    op.execute(
+        "DELETE FROM association_group_members m USING association_group_members older "
+        "WHERE older.group_id = m.group_id AND older.user_id = m.user_id AND older.id < m.id"
+    )
+    # CREATE INDEX CONCURRENTLY does not lock out writes but cannot run inside a transaction.
+    # A failed concurrent build leaves an INVALID index behind, so it is dropped before retrying.
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,53 @@
+"""workout access of group members
+
+Revision ID: d22d11523a68
+Revises: 5d741ee2cc59
+Create Date: 2026-10-17 18:05:41.302117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd22d11523a68'
+down_revision: Union[str, Sequence[str], None] = '5d741ee2cc59'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('workout_access',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('workout_id', sa.Integer(), nullable=False),
+    sa.Column('via_group_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['via_group_id'], ['groups.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['workout_id'], ['workouts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_workout_access_user_id_workout_id_via_group_id', 'workout_access',
+                    ['user_id', 'workout_id', 'via_group_id'], unique=True)
+    op.create_index('ix_workout_access_via_group_id', 'workout_access', ['via_group_id'], unique=False)
+    op.create_index('ix_workout_access_workout_id', 'workout_access', ['workout_id'], unique=False)
+    # memberships changed while this runs are picked up by scripts/rebuild_workout_access.py
+    op.execute(
+        "INSERT INTO workout_access (user_id, workout_id, via_group_id) "
+        "SELECT m.user_id, g.workout_id, g.id "
+        "FROM association_group_members m JOIN groups g ON g.id = m.group_id "
+        "WHERE g.workout_id IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_workout_access_workout_id', table_name='workout_access')
+    op.drop_index('ix_workout_access_via_group_id', table_name='workout_access')
+    op.drop_index('uq_workout_access_user_id_workout_id_via_group_id', table_name='workout_access')
+    op.drop_table('workout_access')
@@ -3,3 +3,5 @@ from db.models.exercise_model import ExerciseModel
 from db.models.workout_model import WorkoutModel, WorkoutExerciseModel
 from db.models.group_model import GroupModel, GroupMemberModel
 from db.models.jwt_token_model import JWTTokenModel
+from db.models.user_counter_model import UserCounterModel
+from db.models.workout_access_model import WorkoutAccessModel
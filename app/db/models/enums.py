@@ -9,3 +9,10 @@ class PlanEnum(enum.Enum):
 class TypeTokensEnum(enum.Enum):
     email_verify = "email_verify"
     access = "access"
+
+
+class CounterKind(enum.Enum):
+    # values are the user_counters columns
+    exercises = "exercises"
+    workouts = "workouts"
+    groups = "groups"
@@ -2,13 +2,16 @@ from typing import List, Optional
 
 from fastapi import UploadFile
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, ForeignKey, JSON
+from sqlalchemy import String, Text, ForeignKey, JSON, Index
 
 from db.base import BaseModel
 
 
 class ExerciseModel(BaseModel):
     __tablename__ = "exercises"
+    __table_args__ = (
+        Index("ix_exercises_user_id_created_at", "user_id", "created_at"),
+    )
 
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
 
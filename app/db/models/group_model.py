@@ -1,13 +1,17 @@
 from __future__ import annotations
 from typing import List
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, Index
 
 from db.base import BaseModel
 
 
 class GroupModel(BaseModel):
     __tablename__ = "groups"
+    __table_args__ = (
+        Index("ix_groups_user_id_created_at", "user_id", "created_at"),
+        Index("ix_groups_workout_id", "workout_id"),
+    )
     name: Mapped[str] = mapped_column(String(200))
 
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
@@ -23,6 +27,10 @@ class GroupModel(BaseModel):
 
 class GroupMemberModel(BaseModel):
     __tablename__ = "association_group_members"
+    __table_args__ = (
+        Index("uq_association_group_members_group_id_user_id", "group_id", "user_id", unique=True),
+        Index("ix_association_group_members_user_id", "user_id"),
+    )
 
     group_id: Mapped[int] = mapped_column(ForeignKey("groups.id"))
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
@@ -1,4 +1,6 @@
-from sqlalchemy import String, ForeignKey
+from datetime import datetime
+
+from sqlalchemy import String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from db.base import BaseModel
@@ -6,7 +8,13 @@ from db.base import BaseModel
 
 class JWTTokenModel(BaseModel):
     __tablename__ = "tokens"
+    __table_args__ = (
+        Index("ix_tokens_user_id_expires_at", "user_id", "expires_at"),
+    )
 
-    token: Mapped[str] = mapped_column(String(600), index=True)
+    token: Mapped[str] = mapped_column(String(600))
+    # sha256 hex of the raw token, every lookup goes through this fixed-width key
+    token_hash: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
-    user: Mapped["UserModel"] = relationship(back_populates="token")
+    user: Mapped["UserModel"] = relationship(back_populates="tokens")
@@ -0,0 +1,14 @@
+from sqlalchemy import ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.base import BaseModel
+
+
+class UserCounterModel(BaseModel):
+    """How many exercises, workouts and groups a user owns, changed in the same transaction as the rows."""
+    __tablename__ = "user_counters"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), unique=True)
+    exercises: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    workouts: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    groups: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
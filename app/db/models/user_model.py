@@ -4,9 +4,9 @@ from dataclasses import dataclass
 from typing import List
 from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Boolean, Enum, Date
+from sqlalchemy import String, Boolean, Enum, Date, Integer, Index
 from db.base import BaseModel
-from db.models.enums import PlanEnum
+from db.models.enums import CounterKind, PlanEnum
 from utils.context import get_current_user
 from utils.raises import _forbidden
 
@@ -29,6 +29,9 @@ class PlanLimits:
 
 class UserModel(BaseModel):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_updated_at", "updated_at"),
+    )
 
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     is_admin: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
@@ -39,6 +42,8 @@ class UserModel(BaseModel):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     is_confirmed: Mapped[bool] = mapped_column(Boolean, default=False)
     plan: Mapped[PlanEnum] = mapped_column(Enum(PlanEnum, name="plan_enum"), default=PlanEnum.free, nullable=False)
+    # bumped to revoke every stateless access token issued before
+    token_generation: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     exercises: Mapped[List["ExerciseModel"]] = relationship(back_populates="user", cascade="all, delete-orphan")
     workouts: Mapped[List["WorkoutModel"]] = relationship(back_populates="user", cascade="all, delete-orphan")
@@ -47,12 +52,23 @@ class UserModel(BaseModel):
     groups: Mapped[List["GroupModel"]] = relationship(secondary="association_group_members", back_populates="members",
                                                       overlaps="groups_members")
     groups_members: Mapped[List["GroupMemberModel"]] = relationship(back_populates="user", overlaps="groups")
-    token: Mapped["JWTTokenModel"] = relationship(back_populates="user")
+    tokens: Mapped[List["JWTTokenModel"]] = relationship(back_populates="user", passive_deletes=True)
 
     def get_limits(self) -> PlanLimits:
         from core.config import PLAN_LIMITS_BY_NAME
         return PLAN_LIMITS_BY_NAME[self.plan.value]
 
+    def plan_limit(self, kind: CounterKind) -> int | None:
+        """Creation limit of the plan for user_counters; None for the administrator, who has no limits."""
+        if get_current_user().is_admin:
+            return None
+        limits = self.get_limits()
+        return {
+            CounterKind.exercises: limits.exercises_limit,
+            CounterKind.workouts: limits.workouts_limit,
+            CounterKind.groups: limits.groups_limit,
+        }[kind]
+
     def check_reached_limit_workouts(self, count_workouts: int) -> bool:
         # the administrator has the right to create objects without limits
         if count_workouts >= self.get_limits().workouts_limit and get_current_user().is_not_admin():
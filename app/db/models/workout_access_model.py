@@ -0,0 +1,22 @@
+from sqlalchemy import ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.base import BaseModel
+
+
+class WorkoutAccessModel(BaseModel):
+    """
+    Who may open a workout through a group: one row per member of a group that has a workout.
+    Kept in step with association_group_members and groups.workout_id by GroupRepository.
+    """
+    __tablename__ = "workout_access"
+    __table_args__ = (
+        Index("uq_workout_access_user_id_workout_id_via_group_id", "user_id", "workout_id", "via_group_id",
+              unique=True),
+        Index("ix_workout_access_via_group_id", "via_group_id"),
+        Index("ix_workout_access_workout_id", "workout_id"),
+    )
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    workout_id: Mapped[int] = mapped_column(ForeignKey("workouts.id", ondelete="CASCADE"))
+    via_group_id: Mapped[int] = mapped_column(ForeignKey("groups.id", ondelete="CASCADE"))
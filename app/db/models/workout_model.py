@@ -1,15 +1,20 @@
 from __future__ import annotations
 from typing import List, Optional
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, ForeignKey
+from sqlalchemy import String, Text, ForeignKey, Index, Integer
 
 from db.base import BaseModel
 
 
 class WorkoutModel(BaseModel):
     __tablename__ = "workouts"
+    __table_args__ = (
+        Index("ix_workouts_user_id_created_at", "user_id", "created_at"),
+    )
     title: Mapped[str] = mapped_column(String(200))
     description: Mapped[Optional[str]] = mapped_column(Text)
+    # bumped by every change of the exercise list; PATCH requests must name the version they edit
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1", nullable=False)
 
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
 
@@ -29,6 +34,10 @@ class WorkoutModel(BaseModel):
 
 class WorkoutExerciseModel(BaseModel):
     __tablename__ = "association_workout_exercises"
+    __table_args__ = (
+        Index("ix_association_workout_exercises_workout_id_position", "workout_id", "position"),
+        Index("ix_association_workout_exercises_exercise_id", "exercise_id"),
+    )
 
     workout_id: Mapped[int] = mapped_column(ForeignKey("workouts.id", ondelete="CASCADE"))
     exercise_id: Mapped[int] = mapped_column(ForeignKey("exercises.id", ondelete="CASCADE"))
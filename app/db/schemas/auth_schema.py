@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -21,3 +23,8 @@ class PayloadToken(BaseModel):
     time_now: int
     user_id: int
     type: str
+    token_generation: Optional[int] = None
+    # access tokens: random id, two sessions of the user issued in the same second get distinct tokens
+    jti: Optional[str] = None
+    # stateless access tokens: the user the token was issued to, UserPrincipalSchema as JSON
+    principal: Optional[str] = None
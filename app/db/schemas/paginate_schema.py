@@ -1,11 +1,19 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
 
 class PageMeta(BaseModel):
-    total: int
+    # total and pages are not counted for cursor pages
+    total: Optional[int] = None
     limit: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    # total stopped counting at PAGE_TOTAL_CAP and more rows exist ("10000+")
+    total_capped: bool = False
 
 class PaginationGet(BaseModel):
     limit: int = Field(default=10, ge=1)
-    start: int = Field(default=0, ge=0)
\ No newline at end of file
+    start: int = Field(default=0, ge=0)
+    # opaque next_cursor of the previous page; when set, start is ignored and the page is read by seek
+    cursor: Optional[str] = None
@@ -47,5 +47,10 @@ class UserAdminGetModelSchema(BaseIdSchema, BaseCreatedAndUpdateSchema, UserGetM
     model_config = {"from_attributes": True}
 
 
+class UserPrincipalSchema(BaseIdSchema, SystemUserSchema):
+    """What authorization needs of a user, the principal claim of stateless access tokens."""
+    updated_at: datetime
+
+
 class UserAdminPutModelSchema(UserGetModelSchema, SystemUserSchema):
     model_config = {"from_attributes": True}
@@ -1,6 +1,6 @@
-from typing import List
+from typing import Annotated, List, Literal, Optional, Union
 
-from pydantic import model_validator
+from pydantic import Field, model_validator
 
 from db.schemas.base_schema import BaseIdSchema, BaseModelSchema, BaseCreatedAndUpdateSchema
 from db.schemas.paginate_schema import PageMeta
@@ -42,6 +42,45 @@ class WorkoutExerciseCreateSchema(BaseModelSchema):
         return self
 
 
+class WorkoutInsertOperation(BaseModelSchema):
+    op: Literal["insert"]
+    position: int = Field(ge=1)
+    exercise_id: int
+    notes: Optional[str] = None
+
+
+class WorkoutMoveOperation(BaseModelSchema):
+    op: Literal["move"]
+    from_position: int = Field(ge=1)
+    to_position: int = Field(ge=1)
+
+
+class WorkoutRemoveOperation(BaseModelSchema):
+    op: Literal["remove"]
+    position: int = Field(ge=1)
+
+
+class WorkoutNotesOperation(BaseModelSchema):
+    op: Literal["update_notes"]
+    position: int = Field(ge=1)
+    notes: Optional[str]
+
+
+WorkoutOperation = Annotated[
+    Union[WorkoutInsertOperation, WorkoutMoveOperation, WorkoutRemoveOperation, WorkoutNotesOperation],
+    Field(discriminator="op"),
+]
+
+
+class WorkoutPatchSchema(BaseModelSchema):
+    """
+    PATCH /workouts/{id}: operations applied in order, each on the positions left by the previous one.
+    version is the one the client read; the request fails with 409 when the workout changed since.
+    """
+    version: int
+    operations: List[WorkoutOperation] = Field(min_length=1)
+
+
 class ExerciseFullSchema(BaseIdSchema, BaseCreatedAndUpdateSchema, BaseModelSchema):
     title: str
     type: str
@@ -57,10 +96,11 @@ class ExerciseFullSchema(BaseIdSchema, BaseCreatedAndUpdateSchema, BaseModelSche
 class WorkoutExerciseFullSchema(BaseModelSchema):
     exercise: ExerciseFullSchema
     position: int
+    notes: Optional[str] = None
 
 
 class WorkoutGetOneSchema(BaseIdSchema, BaseCreatedAndUpdateSchema, WorkoutCreateSchema):
-    pass
+    version: int
 
 
 class WorkoutFullSchema(WorkoutGetOneSchema):
@@ -1,14 +1,36 @@
+import atexit
 import logging
 import contextvars
+import multiprocessing
+import os
+import queue
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
 
 from pathlib import Path
 
 _LOG_DIR = Path(__file__).resolve().parent
-_LOG_FILE = str((_LOG_DIR / "app.log"))
+
+
+def _log_file_name(stem: str = "app") -> str:
+    # uvicorn workers are child processes; each writes and rotates its own file instead of racing on one
+    per_process = os.environ.get("LOG_FILE_PER_PROCESS")
+    if per_process is None:
+        per_process = "1" if multiprocessing.parent_process() is not None else "0"
+    return f"{stem}.{os.getpid()}.log" if per_process == "1" else f"{stem}.log"
+
+
+_LOG_FILE = str((_LOG_DIR / _log_file_name()))
+_SLOW_LOG_FILE = str((_LOG_DIR / _log_file_name("slow")))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
 
 request_id_var = contextvars.ContextVar("request_id", default="")
 request_user_var = contextvars.ContextVar("request_user", default="")
+# core.query_stats.QueryStats of the current request, filled by the engine cursor hooks
+request_queries_var = contextvars.ContextVar("request_queries", default=None)
+# core.slow_log.RequestTimings of the current request and the repository method running in it
+request_timings_var = contextvars.ContextVar("request_timings", default=None)
+repository_call_var = contextvars.ContextVar("repository_call", default=None)
 
 
 class CorrelationIdFilter(logging.Filter):
@@ -27,8 +49,23 @@ class CorrelationIdFilter(logging.Filter):
         return True
 
 
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler over a bounded queue: when the writer falls behind records are dropped and counted."""
+
+    def __init__(self, maxsize: int = LOG_QUEUE_SIZE) -> None:
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
 LOG_FORMAT = "%(asctime)s %(levelname)s [%(process_id)s] [%(method)s] [%(route)s] [user:%(user)s] [%(component)s] %(message)s %(payload)s"
 ACCESS_FORMAT = "%(asctime)s %(levelname)s [%(process_id)s] — %(message)s"
+SLOW_FORMAT = "%(asctime)s %(message)s"
 
 LOGGING_CONFIG = {
     "version": 1,
@@ -39,6 +76,7 @@ LOGGING_CONFIG = {
     "formatters": {
         "default": {"format": LOG_FORMAT},
         "access": {"format": ACCESS_FORMAT},
+        "slow": {"format": SLOW_FORMAT},
     },
     "handlers": {
         "console": {
@@ -61,6 +99,15 @@ LOGGING_CONFIG = {
             "filters": ["correlation"],
             "formatter": "default",
         },
+        "slow_file": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": _SLOW_LOG_FILE,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "encoding": "utf-8",
+            "delay": True,
+            "formatter": "slow",
+        },
     },
     "loggers": {
         "": {
@@ -82,10 +129,61 @@ LOGGING_CONFIG = {
             "level": "INFO",
             "propagate": False,
         },
+        "slow_requests": {
+            "handlers": ["slow_file"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
 
 
+_listeners: list[QueueListener] = []
+_queue_handlers: list[DroppingQueueHandler] = []
+
+
+def install_queue_handlers(logger_names: list[str]) -> None:
+    """
+    Move the handlers of the given loggers behind queues: the logger only enqueues the record and
+    one listener thread per distinct handler set does the formatting and the I/O.
+    """
+    by_handlers: dict[tuple, DroppingQueueHandler] = {}
+    for name in logger_names:
+        target = logging.getLogger(name)
+        handlers = tuple(target.handlers)
+        if not handlers:
+            continue
+        queue_handler = by_handlers.get(handlers)
+        if queue_handler is None:
+            queue_handler = DroppingQueueHandler()
+            # contextvars are only visible here, not in the listener thread
+            queue_handler.addFilter(CorrelationIdFilter())
+            listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+            listener.start()
+            by_handlers[handlers] = queue_handler
+            _queue_handlers.append(queue_handler)
+            _listeners.append(listener)
+        target.handlers = [queue_handler]
+
+
+def stop_logging() -> None:
+    """Flush what is queued and stop the listener threads."""
+    while _listeners:
+        _listeners.pop().stop()
+    _queue_handlers.clear()
+
+
+def logging_stats() -> dict:
+    return {
+        "queued": sum(handler.queue.qsize() for handler in _queue_handlers),
+        "dropped": sum(handler.dropped for handler in _queue_handlers),
+    }
+
+
 def setup_logging() -> None:
+    if _listeners:
+        return
     _LOG_DIR.mkdir(parents=True, exist_ok=True)
     dictConfig(LOGGING_CONFIG)
+    install_queue_handlers(list(LOGGING_CONFIG["loggers"]))
+    atexit.register(stop_logging)
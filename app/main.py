@@ -1,23 +1,71 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from sqlalchemy.orm import configure_mappers
 import uvicorn
 from dotenv import load_dotenv
 
 from api.v1 import auth, users, exercises, workout, group
-from core.middleware import CorrelationIdASGIMiddleware
+from core.config import settings
+from core.database import SessionLocal, engine, pool_status, read_router, warm_up
+from core.metrics import mark_process_dead, metrics_endpoint
+from core.middleware import CorrelationIdASGIMiddleware, BodyLogPolicy, BodyLogMode
+from core.password_hasher import password_hasher
+from core.session_store import session_store
+from core.token_generations import token_generations
 from logging_conf import setup_logging
 
 setup_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await session_store.start()
+    await token_generations.start(SessionLocal)
+    for db_engine in (engine, *read_router.engines):
+        await warm_up(db_engine, settings.DB_POOL_WARMUP_CONNECTIONS)
+    logger.info("Database pool ready: %s", pool_status(engine))
+    yield
+    await token_generations.stop()
+    await session_store.stop()
+    logger.info("Database pool at shutdown: %s", pool_status(engine))
+    for db_engine in (engine, *read_router.engines):
+        await db_engine.dispose()
+    password_hasher.shutdown()
+    mark_process_dead()
+
+
+def body_log_policies() -> dict[str, BodyLogPolicy]:
+    list_policy = BodyLogPolicy(BodyLogMode.errors, slow_ms=settings.BODY_LOG_SLOW_MS)
+    return {
+        # credentials and tokens never reach the log
+        "/api/v1/auth": BodyLogPolicy(BodyLogMode.headers, on_error=False),
+        # list pages only: detail and mutation routes under the same prefix keep the default policy
+        "GET /api/v1/workouts/": list_policy,
+        "GET /api/v1/exercises/": list_policy,
+        "GET /api/v1/groups/": list_policy,
+    }
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="FitnessApp API", version="0.1.0")
+    app = FastAPI(title="FitnessApp API", version="0.1.0", lifespan=lifespan)
     app.add_middleware(
         CorrelationIdASGIMiddleware,
         request_body_limit=8 * 1024,
         response_body_limit=8 * 1024,
         log_headers=False,
+        stream_request_body=True,
+        max_body_size=settings.MAX_REQUEST_BODY_SIZE,
+        body_log_policies=body_log_policies(),
+        default_body_log_policy=BodyLogPolicy(BodyLogMode.sampled, sample_rate=settings.BODY_LOG_SAMPLE_RATE,
+                                              slow_ms=settings.BODY_LOG_SLOW_MS),
+        query_stats_headers=settings.DEBUG_QUERY_HEADERS,
+        n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD,
+        slow_request_ms=settings.SLOW_REQUEST_MS,
     )
+    app.add_api_route("/metrics", metrics_endpoint, include_in_schema=False)
     app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
     app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
     app.include_router(exercises.router, prefix="/api/v1/exercises", tags=["exercises"])
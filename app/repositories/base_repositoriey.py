@@ -1,15 +1,32 @@
+import inspect
 import logging
 from abc import ABC
-from typing import Type, TypeVar
+from typing import Any, Optional, Type, TypeVar
 
-from sqlalchemy import select
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.config import settings
+from core.slow_log import timed_repository_method
+from repositories.unit_of_work import OnCommit, UnitOfWork
+from utils.pagination import Cursor
 from utils.raises import _bad_request
 
+# get_page default: the PAGE_TOTAL_CAP setting as it is at call time, the same value capped_total reads
+_SETTINGS_TOTAL_CAP: Any = object()
+
 
 class BaseRepo(ABC):
+    def __init_subclass__(cls, **kwargs):
+        # public coroutine methods of every repository are timed for the slow-request log
+        super().__init_subclass__(**kwargs)
+        for name, attr in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.iscoroutinefunction(attr):
+                setattr(cls, name, timed_repository_method(f"{cls.__name__}.{name}", attr))
+
     def __init__(self, session: AsyncSession):
         self.log = logging.LoggerAdapter(
             logging.getLogger(__name__),
@@ -18,11 +35,85 @@ class BaseRepo(ABC):
         self.session = session
         self.model = None
 
+    async def _commit(self) -> None:
+        """Commit, or only flush while a unit of work holds the request's transaction."""
+        if UnitOfWork.of(self.session) is not None:
+            await self.session.flush()
+        else:
+            await self.session.commit()
+
+    async def on_commit(self, callback: OnCommit) -> None:
+        """Run callback once the writes so far are committed: at the end of the unit of work, or now without one."""
+        unit_of_work = UnitOfWork.of(self.session)
+        if unit_of_work is not None:
+            unit_of_work.on_commit(callback)
+            return
+        result = callback()
+        if inspect.isawaitable(result):
+            await result
+
+    def _insert(self, model=None):
+        """INSERT of the session's dialect, for on_conflict_do_nothing on both PostgreSQL and SQLite."""
+        dialect = self.session.get_bind().dialect.name
+        return (pg_insert if dialect == "postgresql" else sqlite_insert)(model if model is not None else self.model)
+
+    def paginate(self, stmt, limit: int, start: int, after: Optional[Cursor] = None):
+        """One page of stmt in (created_at, id) order: by offset, or by seek after a cursor when given."""
+        if after is not None:
+            stmt = stmt.where(tuple_(self.model.created_at, self.model.id) > tuple_(*after))
+        else:
+            stmt = stmt.offset(limit * start)
+        return stmt.order_by(self.model.created_at.asc(), self.model.id.asc()).limit(limit)
+
+    def count_stmt(self, stmt, total_cap: Optional[int] = None):
+        """Number of rows stmt matches; with total_cap the scan stops after total_cap + 1 rows."""
+        counted = stmt.with_only_columns(self.model.id).order_by(None)
+        if total_cap is not None:
+            counted = counted.limit(total_cap + 1)
+        return select(func.count()).select_from(counted.subquery())
+
+    async def get_page(self, stmt, limit: int, start: int, after: Optional[Cursor] = None,
+                       total_cap: Optional[int] = _SETTINGS_TOTAL_CAP) -> tuple[list, Optional[int]]:
+        """
+        One page of stmt and, in the same statement, the number of rows stmt matches: count(*) OVER ()
+        without total_cap, otherwise a count that stops after total_cap + 1 rows, so a total above
+        total_cap means "more than total_cap". Cursor pages are not counted.
+        """
+        if total_cap is _SETTINGS_TOTAL_CAP:
+            total_cap = settings.PAGE_TOTAL_CAP
+        if after is not None:
+            return list((await self.session.scalars(self.paginate(stmt, limit, start, after))).all()), None
+        if total_cap is None:
+            total_column = func.count().over()
+        else:
+            total_column = self.count_stmt(stmt, total_cap).scalar_subquery()
+        rows = (await self.session.execute(self.paginate(stmt.add_columns(total_column.label("total")),
+                                                         limit, start))).all()
+        if rows:
+            return [row[0] for row in rows], rows[0].total
+        if start == 0:
+            return [], 0
+        # past the last page the window has no rows to report the total on
+        return [], await self.session.scalar(self.count_stmt(stmt, total_cap))
+
+    async def release_connection(self) -> None:
+        """
+        Commit the session's open transaction before slow work outside the database (S3 transfers,
+        password hashing), so the connection goes back to the pool instead of idling for the whole
+        call; the next statement checks one out again. Loaded objects stay usable, sessions do not
+        expire them on commit. Inside a unit of work this commits the request's writes so far.
+        """
+        unit_of_work = UnitOfWork.of(self.session)
+        if unit_of_work is not None:
+            await unit_of_work.commit()
+        elif self.session.in_transaction():
+            await self.session.commit()
+
     async def create_one_obj_model(self, data: dict):
         self.log.info(f"create_one_obj_model")
         obj = self.model(**data)
         self.session.add(obj)
-        await self.session.commit()
+        await self._commit()
         await self.session.refresh(obj)
         return obj
 
@@ -62,11 +153,42 @@ class BaseRepo(ABC):
             self.log.error("Exception %s", ex)
             raise _bad_request("Unexpected error")
 
+    async def _update_returning(self, stmt) -> list:
+        """
+        Rows of self.model that the UPDATE stmt changed, as loaded ORM objects with the new values:
+        one UPDATE ... RETURNING where the dialect has it, otherwise the ids are selected first and
+        the rows read back after the update.
+        """
+        if self.session.get_bind().dialect.update_returning:
+            result = await self.session.scalars(stmt.returning(self.model),
+                                                execution_options={"populate_existing": True})
+            return list(result.all())
+        ids = list((await self.session.scalars(select(self.model.id).where(stmt.whereclause))).all())
+        if not ids:
+            return []
+        await self.session.execute(stmt.where(self.model.id.in_(ids)),
+                                   execution_options={"synchronize_session": False})
+        result = await self.session.scalars(select(self.model).where(self.model.id.in_(ids)),
+                                            execution_options={"populate_existing": True})
+        return list(result.all())
+
+    async def execute_session_update_and_commit(self, stmt) -> list:
+        """execute_session_and_commit for an UPDATE of self.model, returning the updated rows."""
+        try:
+            self.log.info("execute_session_update_and_commit")
+            rows = await self._update_returning(stmt)
+            await self._commit()
+            return rows
+        except Exception as ex:
+            self.log.error("error execute stmt %s", stmt)
+            self.log.error("Exception %s", ex)
+            raise _bad_request("Unexpected error")
+
     async def execute_session_and_commit(self, stmt):
         try:
             self.log.info("execute_session_and_commit")
             await self.session.execute(stmt)
-            await self.session.commit()
+            await self._commit()
         except Exception as ex:
             self.log.error("error execute stmt %s", stmt)
             self.log.error("Exception %s", ex)
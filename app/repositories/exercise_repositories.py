@@ -1,10 +1,13 @@
-from typing import List, Any, Sequence
+from typing import List, Any, Optional, Sequence
 
 from sqlalchemy import update, select, func, and_, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.models import ExerciseModel, WorkoutExerciseModel
+from db.models import ExerciseModel, WorkoutExerciseModel, WorkoutModel
+from db.models.enums import CounterKind
 from repositories.base_repositoriey import BaseRepo
+from repositories.user_counter_repository import UserCounterRepository
+from utils.pagination import Cursor
 from utils.raises import _not_found
 
 
@@ -13,20 +16,14 @@ class ExerciseRepository(BaseRepo):
         super().__init__(session)
         self.model = ExerciseModel
         self.model_workout_exercise = WorkoutExerciseModel
+        self.counters = UserCounterRepository(session)
 
-    async def get_all_exercise_user(self, user_id: int, limit: int, start: int) -> tuple[Sequence[ExerciseModel], Any]:
-        self.log.info("get_all_exercise_user %s limit %s start %s", user_id, limit, start)
-        stmt_exercise = (
-            select(self.model)
-            .where(self.model.user_id == user_id)
-            .order_by(self.model.created_at.asc())
-            .offset(limit * start)
-            .limit(limit)
-        )
-        res_exercise = await self.session.execute(stmt_exercise)
-        exercises = res_exercise.scalars().all()
+    async def get_all_exercise_user(self, user_id: int, limit: int, start: int,
+                                    after: Optional[Cursor] = None) -> tuple[Sequence[ExerciseModel], Any]:
+        self.log.info("get_all_exercise_user %s limit %s start %s after %s", user_id, limit, start, after)
+        exercises, total = await self.get_page(
+            select(self.model).where(self.model.user_id == user_id), limit, start, after)
         self.log.info(f"exercises {exercises}")
-        total = await self.get_count_exercise_user(user_id)
         self.log.info(f"count all exercises {total}")
         return exercises, total
 
@@ -47,6 +44,9 @@ class ExerciseRepository(BaseRepo):
 
     async def get_count_exercise_user(self, user_id: int) -> int:
         self.log.info("get_count_exercise_user %s", user_id)
+        counted = await self.counters.get_count(user_id, CounterKind.exercises)
+        if counted is not None:
+            return counted
         stmt_count_exercise = select(func.count()).select_from(
             select(self.model.id).where(self.model.user_id == user_id).subquery()
         )
@@ -60,10 +60,12 @@ class ExerciseRepository(BaseRepo):
                     self.model.id == exercise_id,
                     self.model.user_id == user_id
                 )
-            ).values(**data).returning(self.model)
+            ).values(**data)
         )
-        await self.execute_session_and_commit(stmt)
-        return await self.get_by_id(user_id, exercise_id)
+        exercise = next(iter(await self.execute_session_update_and_commit(stmt)), None)
+        if exercise is None:
+            raise _not_found("Workout not found")
+        return exercise
 
     async def find_count_self_exercise(self, user_id: int, list_id_exercise: List[int]) -> int:
         self.log.info("find_count_self_exercise list id exercise %s, user id %s", list_id_exercise, user_id)
@@ -78,61 +80,51 @@ class ExerciseRepository(BaseRepo):
         return await self.execute_session_get_one(stmt)
 
     async def remove_exercise_id(self, exercise_id: int, start_index: int = 1) -> None:
+        """
+        Delete the exercise and its place in every workout; the exercises left in those workouts are
+        renumbered from start_index in their previous order, and their version is bumped so a PATCH
+        built on the old list is rejected. A fixed number of statements however many workouts use the exercise.
+        """
         self.log.info("remove_exercise_id %s", exercise_id)
-        workouts_touched: set[int] = set()
-        total_deleted = 0
-
+        assoc = self.model_workout_exercise
         async with self.session.begin_nested():
-            stmt = select(self.model_workout_exercise.workout_id) \
-                .where(self.model_workout_exercise.exercise_id == exercise_id) \
-                .distinct()
-            res = await self.session.execute(stmt)
-            workout_ids = [row[0] for row in res.all()]
-
-            if not workout_ids:
-                self.log.info("Not Found workout for exercise Id")
-                del_stmt = delete(self.model).where(self.model.id == exercise_id)
-                await self.session.execute(del_stmt)
-                return await self.session.commit()
-
-            for workout_id in workout_ids:
-                self.log.info("Workout id %s", workout_id)
-                stmt = select(self.model_workout_exercise) \
-                    .where(self.model_workout_exercise.workout_id == workout_id) \
-                    .order_by(self.model_workout_exercise.position)
-                res = await self.session.execute(stmt)
-                assoc_list = res.scalars().all()
-                if not assoc_list:
-                    continue
-
-                remaining = [a for a in assoc_list if a.exercise_id != exercise_id]
-                self.log.info("remaining list %s", remaining)
-                removed_count = len(assoc_list) - len(remaining)
-                self.log.info("removed count %s", removed_count)
-                if removed_count == 0:
-                    continue
-
-                del_stmt = delete(self.model_workout_exercise).where(
-                    (self.model_workout_exercise.workout_id == workout_id) &
-                    (self.model_workout_exercise.exercise_id == exercise_id)
+            touched = select(assoc.workout_id).where(assoc.exercise_id == exercise_id)
+            # first, while the rows still name the exercise; it also locks the workouts against a PATCH
+            await self.session.execute(
+                update(WorkoutModel).where(WorkoutModel.id.in_(touched))
+                .values(version=WorkoutModel.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            remaining = (
+                select(
+                    assoc.id,
+                    (func.row_number().over(partition_by=assoc.workout_id, order_by=(assoc.position, assoc.id))
+                     + (start_index - 1)).label("new_position"),
                 )
-                await self.session.execute(del_stmt)
-                total_deleted += removed_count
-                workouts_touched.add(workout_id)
-                self.log.info("recalculate ordinal numbers")
-                for new_pos, assoc in enumerate(remaining, start=start_index):
-                    if assoc.position != new_pos:
-                        upd = update(self.model_workout_exercise) \
-                            .where(self.model_workout_exercise.id == assoc.id) \
-                            .values(position=new_pos)
-                        await self.session.execute(upd)
-            del_exercise = delete(self.model).where(self.model.id == exercise_id)
-            await self.session.execute(del_exercise)
-        await self.session.commit()
+                .where(assoc.workout_id.in_(touched), assoc.exercise_id != exercise_id)
+                .subquery()
+            )
+            self.log.info("recalculate ordinal numbers")
+            renumbered = await self.session.execute(
+                update(assoc)
+                .where(assoc.id == remaining.c.id, assoc.position != remaining.c.new_position)
+                .values(position=remaining.c.new_position)
+                .execution_options(synchronize_session=False)
+            )
+            removed = await self.session.execute(
+                delete(assoc).where(assoc.exercise_id == exercise_id).execution_options(synchronize_session=False)
+            )
+            self.log.info("removed count %s, renumbered %s", removed.rowcount, renumbered.rowcount)
+            del_exercise = delete(self.model).where(self.model.id == exercise_id).returning(self.model.user_id)
+            await self._release_owner(await self.session.scalar(del_exercise))
+        await self._commit()
         return None
 
+    async def _release_owner(self, owner_id: int | None) -> None:
+        if owner_id is not None:
+            await self.counters.release(owner_id, CounterKind.exercises)
+
     async def update_link_exercise(self, exercise_id: int, exercise_link: str):
         self.log.info("update_link_exercise id %s, link %s", exercise_id, exercise_link)
         stmt = update(self.model).where(self.model.id == exercise_id).values(media_url=exercise_link)
-        await self.execute_session_and_commit(stmt)
-        return await self.session.get(self.model, exercise_id)
+        return next(iter(await self.execute_session_update_and_commit(stmt)), None)
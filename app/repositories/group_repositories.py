@@ -1,11 +1,15 @@
-from typing import List, Sequence, Any, Coroutine
+from typing import List, Sequence, Any, Coroutine, Optional
 
 from sqlalchemy import select, func, and_, delete, update, or_, Row, RowMapping, exists
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, joinedload
 
 from db.models import GroupModel, GroupMemberModel
+from db.models.enums import CounterKind
 from repositories.base_repositoriey import BaseRepo
+from repositories.user_counter_repository import UserCounterRepository
+from repositories.workout_access_repository import WorkoutAccessRepository
+from utils.pagination import Cursor
 from utils.raises import _not_found
 
 
@@ -14,6 +18,8 @@ class GroupRepository(BaseRepo):
         super().__init__(session)
         self.model = GroupModel
         self.model_member_group = GroupMemberModel
+        self.counters = UserCounterRepository(session)
+        self.access = WorkoutAccessRepository(session)
 
     async def get_group_user_by_id(self, id_group: int, user_id: int) -> GroupModel:
         self.log.info("get_group_by_id")
@@ -41,19 +47,29 @@ class GroupRepository(BaseRepo):
             raise _not_found("Group not found")
         return group
 
-    async def rename_group(self, group_name: str, group_id: int):
+    async def rename_group(self, group_name: str, group_id: int, user_id: int | None = None) -> GroupModel | None:
+        """Renamed group, or None when there is no such group (owned by user_id, when given)."""
         self.log.info("rename_group")
-        stmt = update(self.model).where(self.model.id == group_id).values(name=group_name)
-        await self.execute_session_and_commit(stmt)
+        stmt = (
+            update(self.model)
+            .where(self.model.id == group_id, *([] if user_id is None else [self.model.user_id == user_id]))
+            .values(name=group_name)
+        )
+        return next(iter(await self.execute_session_update_and_commit(stmt)), None)
 
     async def delete_group(self, group_id: int, user_id: int) -> None:
         self.log.info("delete_group")
         stmt = (
             delete(self.model)
             .where(self.model.id == group_id, self.model.user_id == user_id)
+            .returning(self.model.id)
         )
+        await self.access.revoke(group_id)
         await self.remove_all_member_group_id(group_id)
-        await self.execute_session_and_commit(stmt)
+        # only a delete that removed the row gives the slot back, a repeated or foreign delete does not
+        if await self.session.scalar(stmt) is not None:
+            await self.counters.release(user_id, CounterKind.groups)
+        await self._commit()
 
     async def add_members_group(self, members_schema: List[int], id_group: int, user_id: int) -> GroupModel:
         self.log.info("add_members_group members_schema %s id_group %s user_id %s", members_schema, id_group, user_id)
@@ -62,7 +78,9 @@ class GroupRepository(BaseRepo):
             members_obj = GroupMemberModel(user_id=member_id, group_id=id_group)
             self.session.add(members_obj)
             list_members.append(members_obj)
-        await self.session.commit()
+        await self.session.flush()
+        await self.access.grant(id_group, members_schema)
+        await self._commit()
         return await self.get_group_by_id_with_full_relation(id_group, user_id)
 
     async def get_group_by_id_with_full_relation(self, id_group: int, user_id: int,
@@ -84,26 +102,17 @@ class GroupRepository(BaseRepo):
             raise _not_found("Group not found")
         return group
 
-    async def get_groups_user(self, user_id: int, limit: int, start: int) -> tuple[Sequence[GroupModel], Any]:
+    async def get_groups_user(self, user_id: int, limit: int, start: int,
+                              after: Optional[Cursor] = None) -> tuple[Sequence[GroupModel], Any]:
         self.log.info("get_groups_user")
         base_where = (self.model.user_id == user_id,)
-        stmt_group = (
-            select(self.model)
-            .where(*base_where)
-            .order_by(self.model.created_at.asc())
-            .offset(start * limit)
-            .limit(limit)
-        )
-        groups_result = await self.session.scalars(stmt_group)
-        groups = groups_result.all()
-
-        stmt_count = select(func.count()).select_from(self.model).where(*base_where)
-        total = await self.session.scalar(stmt_count)
-
-        return groups, int(total)
+        return await self.get_page(select(self.model).where(*base_where), limit, start, after)
 
     async def get_groups_user_count(self, user_id: int) -> int:
         self.log.info("get_groups_user_count")
+        counted = await self.counters.get_count(user_id, CounterKind.groups)
+        if counted is not None:
+            return counted
         base_where = (self.model.user_id == user_id,)
         stmt_count = select(func.count()).select_from(self.model).where(*base_where)
         total = await self.session.scalar(stmt_count)
@@ -131,22 +140,9 @@ class GroupRepository(BaseRepo):
         result = await self.session.execute(stmt)
         return int(result.scalar_one())
 
-    async def get_all_groups(self, user_id: int, limit: int, start: int):
+    async def get_all_groups(self, user_id: int, limit: int, start: int, after: Optional[Cursor] = None):
         self.log.info("get_all_groups")
-        stmt_workouts = (
-            select(self.model)
-            .where(self.model.user_id == user_id)
-            .order_by(self.model.created_at.asc())
-            .offset(limit * start)
-            .limit(limit)
-        )
-        res_workouts = await self.session.execute(stmt_workouts)
-        workouts = res_workouts.scalars().all()
-        stmt_count_workouts = select(func.count()).select_from(
-            select(self.model.id).where(self.model.user_id == user_id).subquery()
-        )
-        total = (await self.session.execute(stmt_count_workouts)).scalar_one()
-        return workouts, total
+        return await self.get_page(select(self.model).where(self.model.user_id == user_id), limit, start, after)
 
     async def remove_member_group_id(self, list_ids_members: List[int], group_id: int) -> None:
         self.log.info("remove_member_group_id")
@@ -157,6 +153,7 @@ class GroupRepository(BaseRepo):
                 self.model_member_group.user_id.in_(list_ids_members)
             )
         )
+        await self.access.revoke(group_id, list_ids_members)
         await self.execute_session_and_commit(stmt)
 
     async def remove_all_member_group_id(self, group_id: int) -> None:
@@ -173,6 +170,9 @@ class GroupRepository(BaseRepo):
         self.log.info("update_workout_in_group")
         stmt = update(self.model).where(self.model.id == id_group,
                                         self.model.user_id == user_id).values(workout_id=id_workout)
+        # granted ahead of the update for the workout it sets; nothing changes when the group is not the user's
+        await self.access.revoke(id_group, owner_id=user_id)
+        await self.access.grant(id_group, workout_id=id_workout, owner_id=user_id)
         await self.execute_session_and_commit(stmt)
 
         return await self.get_group_by_id_with_full_relation(id_group, user_id)
@@ -185,6 +185,7 @@ class GroupRepository(BaseRepo):
                 self.model.id == id_group,
             ).values(workout_id=None)
         )
+        await self.access.revoke(id_group)
         await self.execute_session_and_commit(stmt)
 
         return None
@@ -0,0 +1,62 @@
+import inspect
+import logging
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+OnCommit = Callable[[], Any]
+
+
+class UnitOfWork:
+    """
+    One transaction per request that the repositories enlist in. While it is active on a session,
+    repository commits only flush; the unit of work commits once when the request succeeds and rolls
+    back when anything raises, HTTPException included. Callbacks from on_commit run after that commit
+    and are dropped with a rollback.
+    """
+
+    KEY = "unit_of_work"
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self._callbacks: List[OnCommit] = []
+
+    @classmethod
+    def of(cls, session: AsyncSession) -> Optional["UnitOfWork"]:
+        return session.info.get(cls.KEY)
+
+    async def __aenter__(self) -> "UnitOfWork":
+        self.session.info[self.KEY] = self
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        try:
+            if exc_type is None:
+                await self.commit()
+            else:
+                await self.rollback()
+        finally:
+            self.session.info.pop(self.KEY, None)
+        return False
+
+    def on_commit(self, callback: OnCommit) -> None:
+        self._callbacks.append(callback)
+
+    async def commit(self) -> None:
+        """Commit what the request wrote so far; the unit of work stays active for the rest of it."""
+        await self.session.commit()
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                # the data is committed already, a failed side effect must not turn the response into an error
+                logger.exception("on_commit callback %r failed", callback)
+
+    async def rollback(self) -> None:
+        self._callbacks.clear()
+        await self.session.rollback()
@@ -0,0 +1,95 @@
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import ExerciseModel, GroupModel, UserCounterModel, UserModel, WorkoutModel
+from db.models.enums import CounterKind
+from repositories.base_repositoriey import BaseRepo
+
+
+class UserCounterRepository(BaseRepo):
+    """
+    user_counters rows. reserve and release do not commit: they run in the transaction of the insert or
+    delete they account for, and the repository method doing that commits both.
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+        self.model = UserCounterModel
+        self.sources = {
+            CounterKind.exercises: ExerciseModel,
+            CounterKind.workouts: WorkoutModel,
+            CounterKind.groups: GroupModel,
+        }
+
+    def _counted(self, kind: CounterKind, user_id):
+        source = self.sources[kind]
+        return select(func.count()).select_from(source).where(source.user_id == user_id).scalar_subquery()
+
+    async def get_count(self, user_id: int, kind: CounterKind) -> int | None:
+        column = getattr(self.model, kind.value)
+        return await self.session.scalar(select(column).where(self.model.user_id == user_id))
+
+    async def reserve(self, user_id: int, kind: CounterKind, limit: int | None) -> int:
+        """
+        Count one more `kind` for the user unless that reaches `limit` (None: no limit) and return the count
+        before. A single conditional UPDATE, so concurrent creates cannot pass the limit together;
+        when the limit is reached nothing changes and the returned count is >= limit.
+        """
+        self.log.info("reserve %s for user %s limit %s", kind.value, user_id, limit)
+        column = getattr(self.model, kind.value)
+        stmt = update(self.model).where(self.model.user_id == user_id)
+        if limit is not None:
+            stmt = stmt.where(column < limit)
+        stmt = stmt.values({column: column + 1}).returning(column).execution_options(synchronize_session=False)
+        reserved = await self.session.scalar(stmt)
+        if reserved is None:
+            current = await self.get_count(user_id, kind)
+            if current is not None:
+                return current
+            # users created before the counters existed get their row on first use
+            await self.create_counters(user_id)
+            reserved = await self.session.scalar(stmt)
+            if reserved is None:
+                return await self.get_count(user_id, kind)
+        return reserved - 1
+
+    async def release(self, user_id: int, kind: CounterKind, count: int = 1) -> None:
+        self.log.info("release %s %s for user %s", count, kind.value, user_id)
+        column = getattr(self.model, kind.value)
+        stmt = (
+            update(self.model)
+            .where(self.model.user_id == user_id, column >= count)
+            .values({column: column - count})
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(stmt)
+
+    async def create_counters(self, user_id: int) -> None:
+        stmt = self._insert().values(
+            user_id=user_id, **{kind.value: self._counted(kind, user_id) for kind in CounterKind}
+        ).on_conflict_do_nothing(index_elements=[self.model.user_id])
+        await self.session.execute(stmt)
+
+    async def reconcile(self, chunk_size: int) -> int:
+        """Recount every user's rows, chunk_size users per transaction; returns the number of users covered."""
+        self.log.info("reconcile chunk size %s", chunk_size)
+        max_id = await self.session.scalar(select(func.max(UserModel.id))) or 0
+        covered = 0
+        for low in range(1, max_id + 1, chunk_size):
+            high = low + chunk_size - 1
+            updated = await self.session.execute(
+                update(self.model)
+                .where(self.model.user_id.between(low, high))
+                .values({kind.value: self._counted(kind, self.model.user_id) for kind in CounterKind})
+                .execution_options(synchronize_session=False)
+            )
+            counted = {kind.value: self._counted(kind, UserModel.id) for kind in CounterKind}
+            inserted = await self.session.execute(
+                self._insert().from_select(
+                    ["user_id", *counted],
+                    select(UserModel.id, *counted.values()).where(UserModel.id.between(low, high)),
+                ).on_conflict_do_nothing(index_elements=[self.model.user_id])
+            )
+            await self.session.commit()
+            covered += updated.rowcount + inserted.rowcount
+        return covered
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
-from typing import List
+from datetime import datetime, timedelta, timezone
+from typing import Collection, List, Sequence, Set
 
 from fastapi import HTTPException
-from sqlalchemy import select, delete, update, func, insert
+from sqlalchemy import select, delete, update, func, insert, Row, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.orm import selectinload, joinedload, contains_eager
 from sqlalchemy.util import await_only
 
+from core.config import settings
+from core.principal_cache import principal_cache
+from core.security import token_digest
+from core.session_store import session_store
 from db.models import UserModel
 from db.models.jwt_token_model import JWTTokenModel
 from repositories.base_repositoriey import BaseRepo
@@ -20,17 +25,38 @@ class UserRepository(BaseRepo):
         self.model = UserModel
         self.token_model = JWTTokenModel
 
+    async def invalidate_auth(self, user_id: int) -> None:
+        self.log.info("invalidate_auth user id %s", user_id)
+        # after the commit, a request in between would cache the old row again
+        await self.on_commit(lambda: self._drop_auth(user_id))
+
+    @staticmethod
+    async def _drop_auth(user_id: int) -> None:
+        principal_cache.invalidate_user(user_id)
+        await session_store.invalidate_user(user_id)
+
     async def find_user_email(self, mail: str) -> UserModel | None:
         self.log.info("find_user_email %s ", mail)
-        stmt = select(self.model).where(self.model.email == mail).options(joinedload(self.model.token))
+        stmt = select(self.model).where(self.model.email == mail)
         return await self.execute_session_get_one(stmt)
 
-    async def find_user_id(self, id_user: int, need_token: bool = False) -> UserModel | Exception:
+    async def find_user_id(self, id_user: int, token: str | None = None) -> UserModel | Exception:
+        """
+        With token the user comes with user.tokens holding only the matching session row (or empty),
+        found by a probe of the unique token_hash index.
+        """
         self.log.info("find_user_id %s ", id_user)
         stmt = select(self.model).where(self.model.id == id_user)
-        if need_token:
-            stmt = stmt.options(joinedload(self.model.token))
-        result_user = await self.execute_session_get_one(stmt)
+        if token is not None:
+            stmt = (
+                stmt.outerjoin(self.token_model, and_(self.token_model.token_hash == token_digest(token),
+                                                      self.token_model.user_id == self.model.id))
+                .options(contains_eager(self.model.tokens))
+                .execution_options(populate_existing=True)
+            )
+            result_user = (await self.session.execute(stmt)).unique().scalars().one_or_none()
+        else:
+            result_user = await self.execute_session_get_one(stmt)
         if result_user is None:
             raise _not_found('User not found')
         return result_user
@@ -42,15 +68,26 @@ class UserRepository(BaseRepo):
         stmt = select(func.count()).select_from(self.model).where(self.model.id.in_(list_users_id))
         return await self.execute_session_get_one(stmt)
 
+    async def get_existing_user_ids(self, user_ids: Collection[int], chunk_size: int = 1000) -> Set[int]:
+        """Which of user_ids still have a row, probed by primary key chunk by chunk."""
+        self.log.info("get_existing_user_ids %s users", len(user_ids))
+        user_ids = list(user_ids)
+        existing: Set[int] = set()
+        for start in range(0, len(user_ids), chunk_size):
+            stmt = select(self.model.id).where(self.model.id.in_(user_ids[start:start + chunk_size]))
+            existing.update((await self.session.execute(stmt)).scalars())
+        return existing
+
     async def remove_user_id(self, user_id: int) -> bool:
         self.log.info("remove_user_id %s", user_id)
         stmt = delete(self.model).where(self.model.id == user_id)
         await self.session.execute(stmt)
+        await self.invalidate_auth(user_id)
         try:
             await self.find_user_id(user_id)
             return False
         except HTTPException as e:
-            return e.detail == "Workout not found"
+            return e.detail == "User not found"
 
     async def update_is_confirmed_user(self, user_id):
         self.log.info("update_is_confirmed_user %s", user_id)
@@ -59,26 +96,100 @@ class UserRepository(BaseRepo):
 
     async def update_user(self, data, user_id: int) -> UserModel:
         self.log.info("update_user by id %s data %s", user_id, data)
-        stmt = update(self.model).where(self.model.id == user_id).values(**data)
-        await self.execute_session_and_commit(stmt)
-        return await self.find_user_id(user_id)
+        # updated_at tells the workers that stateless tokens of the user carry an outdated principal
+        stmt = update(self.model).where(self.model.id == user_id).values(**data, updated_at=func.now())
+        user = next(iter(await self.execute_session_update_and_commit(stmt)), None)
+        if user is None:
+            raise _not_found('User not found')
+        await self.invalidate_auth(user_id)
+        return user
 
-    async def add_token_user(self, token: str, user_id: int) -> str | None:
+    async def add_token_user(self, token: str, user_id: int, expires_at: datetime | None = None) -> str | None:
+        """New session row; the oldest sessions beyond MAX_SESSIONS_PER_USER are dropped."""
         self.log.info("add_token_user by id %s ", user_id)
-        obj = JWTTokenModel(token=token, user_id=user_id)
+        if expires_at is None:
+            expires_at = datetime.now(timezone.utc) + timedelta(minutes=settings.VERIFY_TOKEN_TTL_MIN)
+        obj = JWTTokenModel(token=token, token_hash=token_digest(token), expires_at=expires_at, user_id=user_id)
         self.session.add(obj)
-        await self.session.commit()
-        await self.session.refresh(obj)
+        await self.session.flush()
+        keep = (
+            select(self.token_model.id)
+            .where(self.token_model.user_id == user_id)
+            .order_by(self.token_model.expires_at.desc(), self.token_model.id.desc())
+            .limit(settings.MAX_SESSIONS_PER_USER)
+        )
+        stmt = delete(self.token_model).where(self.token_model.user_id == user_id, self.token_model.id.not_in(keep))
+        evicted = (await self.session.execute(stmt)).rowcount
+        await self._commit()
+        if evicted:
+            self.log.info("evicted %s oldest sessions of user id %s", evicted, user_id)
+            await self.invalidate_auth(user_id)
         return obj.token
 
-    async def update_token_user(self, token: str, user_id: int) -> str:
+    async def update_token_user(self, token: str, user_id: int, expires_at: datetime | None = None) -> str:
+        """Replace every session of the user with a single new one."""
         self.log.info("update_token_user by id %s ", user_id)
-        stmt = update(self.token_model).where(self.token_model.user_id == user_id).values(token=token)
-        await self.execute_session_and_commit(stmt)
-        result = await self.find_user_id(user_id, True)
-        return result.token.token
+        stmt = delete(self.token_model).where(self.token_model.user_id == user_id)
+        await self.session.execute(stmt)
+        await self.invalidate_auth(user_id)
+        return await self.add_token_user(token, user_id, expires_at)
+
+    async def find_token(self, token: str) -> JWTTokenModel | None:
+        self.log.info("find_token")
+        stmt = select(self.token_model).where(self.token_model.token_hash == token_digest(token))
+        return await self.execute_session_get_one(stmt)
 
-    async def remove_token_user(self, user_id: int) -> str | None:
+    async def remove_token_user(self, user_id: int, token: str | None = None) -> None:
+        """Drop one session by its token, or all sessions of the user."""
         self.log.info("remove_token_user by id %s ", user_id)
         stmt = delete(self.token_model).where(self.token_model.user_id == user_id)
+        if token is not None:
+            stmt = stmt.where(self.token_model.token_hash == token_digest(token))
         await self.execute_session_and_commit(stmt)
+        await self.invalidate_auth(user_id)
+
+    async def purge_expired_tokens(self, chunk_size: int = settings.TOKEN_PURGE_CHUNK_SIZE) -> int:
+        """Delete expired session rows in chunks, each chunk its own short transaction."""
+        self.log.info("purge_expired_tokens chunk %s", chunk_size)
+        now = datetime.now(timezone.utc)
+        purged = 0
+        while True:
+            chunk = (
+                select(self.token_model.id)
+                .where(self.token_model.expires_at < now)
+                .limit(chunk_size)
+            )
+            stmt = delete(self.token_model).where(self.token_model.id.in_(chunk))
+            deleted = (await self.session.execute(stmt)).rowcount
+            await self.session.commit()
+            purged += deleted
+            if deleted < chunk_size:
+                return purged
+
+    async def bump_token_generation(self, user_id: int) -> int:
+        self.log.info("bump_token_generation by id %s ", user_id)
+        stmt = (
+            update(self.model)
+            .where(self.model.id == user_id)
+            .values(token_generation=self.model.token_generation + 1, updated_at=func.now())
+            .returning(self.model.token_generation)
+        )
+        generation = (await self.session.execute(stmt)).scalar_one()
+        await self._commit()
+        await self.invalidate_auth(user_id)
+        return generation
+
+    async def get_last_updated_at(self) -> datetime | None:
+        self.log.info("get_last_updated_at")
+        return await self.session.scalar(select(func.max(self.model.updated_at)))
+
+    async def get_token_generations(self, changed_since: datetime | None, bumped: bool = False) -> Sequence[Row]:
+        """Users changed since changed_since, with bumped also every user whose generation was ever bumped."""
+        self.log.info("get_token_generations changed since %s bumped %s", changed_since, bumped)
+        stmt = select(self.model.id, self.model.token_generation, self.model.updated_at)
+        conditions = []
+        if changed_since is not None:
+            conditions.append(self.model.updated_at >= changed_since)
+        if bumped or changed_since is None:
+            conditions.append(self.model.token_generation > 0)
+        return (await self.session.execute(stmt.where(or_(*conditions)))).all()
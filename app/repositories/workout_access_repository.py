@@ -0,0 +1,92 @@
+from typing import List, Optional
+
+from sqlalchemy import delete, exists, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import GroupMemberModel, GroupModel, WorkoutAccessModel
+from repositories.base_repositoriey import BaseRepo
+
+
+class WorkoutAccessRepository(BaseRepo):
+    """
+    workout_access rows. grant and revoke do not commit: GroupRepository calls them inside the transaction
+    that changes the members or the workout of a group and commits both. Both lock the group row first, so
+    concurrent changes of the same group's members and workout are applied one after the other and each
+    sees the other's committed rows.
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+        self.model = WorkoutAccessModel
+        self.model_group = GroupModel
+        self.model_group_member = GroupMemberModel
+
+    def has_access(self, user_id, workout_id):
+        """Condition for workout queries: user_id sees workout_id through a group."""
+        return exists().where(self.model.user_id == user_id, self.model.workout_id == workout_id)
+
+    def accessible_workout_ids(self, user_id):
+        return select(self.model.workout_id).where(self.model.user_id == user_id)
+
+    def _granted(self, *where, workout_id=None):
+        """(user_id, workout_id, via_group_id) of the members of the groups matching where."""
+        workout = self.model_group.workout_id if workout_id is None else literal(workout_id)
+        return (
+            select(self.model_group_member.user_id, workout, self.model_group.id)
+            .join(self.model_group, self.model_group.id == self.model_group_member.group_id)
+            .where(*where)
+        )
+
+    def group_lock(self, group_id: int):
+        return select(self.model_group.id).where(self.model_group.id == group_id).with_for_update()
+
+    async def lock_group(self, group_id: int) -> None:
+        """SELECT ... FOR UPDATE of the group, held until the transaction ends; SQLite locks the whole database."""
+        await self.session.execute(self.group_lock(group_id))
+
+    async def grant(self, group_id: int, user_ids: Optional[List[int]] = None, workout_id: Optional[int] = None,
+                    owner_id: Optional[int] = None) -> None:
+        """
+        Give the members of the group (only user_ids when given) access to its workout, or to workout_id
+        when the group is about to be pointed at it; owner_id restricts that to the owner's group.
+        """
+        self.log.info("grant group %s users %s workout %s", group_id, user_ids, workout_id)
+        await self.lock_group(group_id)
+        where = [self.model_group.id == group_id]
+        if workout_id is None:
+            where.append(self.model_group.workout_id.is_not(None))
+        if user_ids is not None:
+            where.append(self.model_group_member.user_id.in_(user_ids))
+        if owner_id is not None:
+            where.append(self.model_group.user_id == owner_id)
+        stmt = self._insert().from_select(
+            ["user_id", "workout_id", "via_group_id"], self._granted(*where, workout_id=workout_id)
+        ).on_conflict_do_nothing()
+        await self.session.execute(stmt)
+
+    async def revoke(self, group_id: int, user_ids: Optional[List[int]] = None,
+                     owner_id: Optional[int] = None) -> None:
+        self.log.info("revoke group %s users %s", group_id, user_ids)
+        await self.lock_group(group_id)
+        stmt = delete(self.model).where(self.model.via_group_id == group_id)
+        if user_ids is not None:
+            stmt = stmt.where(self.model.user_id.in_(user_ids))
+        if owner_id is not None:
+            stmt = stmt.where(exists().where(self.model_group.id == group_id, self.model_group.user_id == owner_id))
+        await self.session.execute(stmt)
+
+    async def rebuild(self, chunk_size: int) -> int:
+        """Recreate the rows of every group from its members, chunk_size groups per transaction."""
+        self.log.info("rebuild chunk size %s", chunk_size)
+        max_id = await self.session.scalar(select(func.max(self.model_group.id))) or 0
+        granted = 0
+        for low in range(1, max_id + 1, chunk_size):
+            high = low + chunk_size - 1
+            await self.session.execute(delete(self.model).where(self.model.via_group_id.between(low, high)))
+            inserted = await self.session.execute(self._insert().from_select(
+                ["user_id", "workout_id", "via_group_id"],
+                self._granted(self.model_group.id.between(low, high), self.model_group.workout_id.is_not(None)),
+            ).on_conflict_do_nothing())
+            await self.session.commit()
+            granted += inserted.rowcount
+        return granted
@@ -1,16 +1,24 @@
-from typing import List
+from typing import List, Optional
 
 from fastapi import HTTPException
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, func, and_, or_, delete, update, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, joinedload
 
 from db.models import WorkoutModel, GroupMemberModel, ExerciseModel, GroupModel, UserModel
+from db.models.enums import CounterKind
 from db.models.workout_model import WorkoutExerciseModel
-from db.schemas.workout_schema import WorkoutExerciseCreateSchema, ExerciseCreateSchema
+from db.schemas.workout_schema import (
+    WorkoutExerciseCreateSchema, ExerciseCreateSchema, WorkoutInsertOperation, WorkoutMoveOperation, WorkoutOperation,
+    WorkoutRemoveOperation,
+)
 from repositories.base_repositoriey import BaseRepo
+from repositories.user_counter_repository import UserCounterRepository
+from repositories.workout_access_repository import WorkoutAccessRepository
 from utils.context import get_current_user
-from utils.raises import _not_found
+from utils.pagination import Cursor
+from utils.raises import _bad_request, _conflict, _not_found
+from utils.workout_utils import diff_workout_exercises
 
 
 class WorkoutRepository(BaseRepo):
@@ -22,6 +30,8 @@ class WorkoutRepository(BaseRepo):
         self.model_exercise = ExerciseModel
         self.model_user = UserModel
         self.model_workout_exercise = WorkoutExerciseModel
+        self.counters = UserCounterRepository(session)
+        self.access = WorkoutAccessRepository(session)
 
     async def add_workout(self, data: dict, exercises_schema: List[ExerciseCreateSchema], user_id: int) -> WorkoutModel:
         self.log.info("add_workout data %s", data)
@@ -32,7 +42,7 @@ class WorkoutRepository(BaseRepo):
             workout_obj.workout_exercises.append(exercise)
         self.log.info("New workout %s", workout_obj)
         self.session.add(workout_obj)
-        await self.session.commit()
+        await self._commit()
         await self.session.refresh(workout_obj)
         return workout_obj
 
@@ -44,19 +54,110 @@ class WorkoutRepository(BaseRepo):
         self.log.info("Workout %s", workout_obj)
         workout_obj.title = workout_schema.workout.title
         workout_obj.description = workout_schema.workout.description
-        workout_obj.workout_exercises.clear()
-        await self.session.flush()
-        for schema in workout_schema.exercises:
-            exercise = self.model_workout_exercise(**schema.model_dump())
-            workout_obj.workout_exercises.append(exercise)
-        self.session.add(workout_obj)
-        self.log.info("New workout %s", workout_obj)
-        await self.session.commit()
-        await self.session.refresh(workout_obj)
+        existing = list(workout_obj.workout_exercises)
+        to_delete, to_update, to_insert = diff_workout_exercises(existing, workout_schema.exercises)
+        self.log.info("delete %s, move %s, insert %s", len(to_delete), len(to_update), len(to_insert))
+        assoc = self.model_workout_exercise
+        if to_delete:
+            await self.session.execute(delete(assoc).where(assoc.id.in_(to_delete))
+                                       .execution_options(synchronize_session=False))
+        if to_update:
+            await self.session.execute(update(assoc), to_update)
+        if to_insert:
+            await self.session.execute(insert(assoc), [{**row, "workout_id": workout_id} for row in to_insert])
+        workout_obj.version = self.model.version + 1
+        await self._commit()
+        self._expire_exercises(workout_obj, existing)
         return workout_obj
 
+    def _expire_exercises(self, workout_obj: WorkoutModel, rows) -> None:
+        # the rows were changed by statement, not through the collection: reload them on next access
+        self.session.expire(workout_obj, ["workout_exercises", "version"])
+        for row in rows:
+            self.session.expire(row)
+
+    async def patch_workout(self, workout_obj: WorkoutModel, version: int, operations: List[WorkoutOperation]) -> int:
+        """
+        Apply operations to the exercise list of the workout in one transaction and return the new version.
+        Each operation touches only the rows between the positions it names; the version check also locks
+        the workout row, so concurrent patches of one workout run one after another.
+        """
+        self.log.info("patch_workout id %s version %s operations %s", workout_obj.id, version, len(operations))
+        workout_id = workout_obj.id
+        assoc = self.model_workout_exercise
+        rows = list(workout_obj.workout_exercises)
+        try:
+            # a savepoint, so a rejected operation undoes the patch and nothing else the request wrote
+            async with self.session.begin_nested():
+                new_version = await self.session.scalar(
+                    update(self.model)
+                    .where(self.model.id == workout_id, self.model.version == version)
+                    .values(version=self.model.version + 1)
+                    .returning(self.model.version)
+                    .execution_options(synchronize_session=False)
+                )
+                if new_version is None:
+                    raise _conflict("Workout was changed, reload it and retry")
+                size = await self.session.scalar(
+                    select(func.coalesce(func.max(assoc.position), 0)).where(assoc.workout_id == workout_id))
+                for operation in operations:
+                    size = await self._apply_operation(workout_id, size, operation)
+            await self._commit()
+        finally:
+            self._expire_exercises(workout_obj, rows)
+        return new_version
+
+    def _shift(self, workout_id: int, low: int, high: int | None, by: int):
+        assoc = self.model_workout_exercise
+        where = [assoc.workout_id == workout_id, assoc.position >= low]
+        if high is not None:
+            where.append(assoc.position <= high)
+        return (update(assoc).where(*where).values(position=assoc.position + by)
+                .execution_options(synchronize_session=False))
+
+    async def _apply_operation(self, workout_id: int, size: int, operation: WorkoutOperation) -> int:
+        """Run one operation on a list of positions 1..size and return its size afterwards."""
+        assoc = self.model_workout_exercise
+        at_position = (assoc.workout_id == workout_id, assoc.position == getattr(operation, "position", None))
+        if isinstance(operation, WorkoutInsertOperation):
+            if operation.position > size + 1:
+                raise _bad_request(f"Cannot insert at position {operation.position} of {size}")
+            await self.session.execute(self._shift(workout_id, operation.position, None, 1))
+            await self.session.execute(insert(assoc).values(
+                workout_id=workout_id, exercise_id=operation.exercise_id, position=operation.position,
+                notes=operation.notes))
+            return size + 1
+        if isinstance(operation, WorkoutMoveOperation):
+            source, target = operation.from_position, operation.to_position
+            if max(source, target) > size:
+                raise _bad_request(f"Cannot move {source} to {target} of {size}")
+            if source == target:
+                return size
+            moved_id = await self.session.scalar(
+                select(assoc.id).where(assoc.workout_id == workout_id, assoc.position == source))
+            if source < target:
+                await self.session.execute(self._shift(workout_id, source + 1, target, -1))
+            else:
+                await self.session.execute(self._shift(workout_id, target, source - 1, 1))
+            await self.session.execute(update(assoc).where(assoc.id == moved_id).values(position=target)
+                                       .execution_options(synchronize_session=False))
+            return size
+        if operation.position > size:
+            raise _bad_request(f"No exercise at position {operation.position} of {size}")
+        if isinstance(operation, WorkoutRemoveOperation):
+            await self.session.execute(delete(assoc).where(*at_position).execution_options(synchronize_session=False))
+            await self.session.execute(self._shift(workout_id, operation.position + 1, None, -1))
+            return size - 1
+        # update_notes
+        await self.session.execute(update(assoc).where(*at_position).values(notes=operation.notes)
+                                   .execution_options(synchronize_session=False))
+        return size
+
     async def get_workout_count(self, user_id: int) -> int:
         self.log.info("get_workout_count user id %s", user_id)
+        counted = await self.counters.get_count(user_id, CounterKind.workouts)
+        if counted is not None:
+            return counted
         stmt = select(func.count()).select_from(
             select(self.model).where(self.model.user_id == user_id).subquery())
         return (await self.session.execute(stmt)).scalar_one()
@@ -68,11 +169,7 @@ class WorkoutRepository(BaseRepo):
             filters.append(
                 or_(
                     self.model.user_id == user_id,
-                    self.model.groups.any(
-                        self.model_group.members.any(
-                            self.model_group_member.user_id == user_id
-                        )
-                    ),
+                    self.access.has_access(user_id, workout_id),
                 )
             )
         stmt = (
@@ -89,8 +186,8 @@ class WorkoutRepository(BaseRepo):
             raise _not_found("Workout not found")
         return workout
 
-    async def get_all_workouts(self, user_id: int, limit: int, start: int):
-        self.log.info("get_all_workouts user id %s limit %s start %s", user_id, limit, start)
+    async def get_all_workouts(self, user_id: int, limit: int, start: int, after: Optional[Cursor] = None):
+        self.log.info("get_all_workouts user id %s limit %s start %s after %s", user_id, limit, start, after)
         stmt = (
             select(self.model)
             .options(
@@ -98,23 +195,18 @@ class WorkoutRepository(BaseRepo):
             .where(
                 or_(
                     self.model.user_id == user_id,
-                    self.model.groups.any(
-                        self.model_group.members.any(self.model_group_member.user_id == user_id))
+                    self.model.id.in_(self.access.accessible_workout_ids(user_id)),
                 )
             )
-            .order_by(self.model.created_at.asc())
-            .offset(limit * start)
-            .limit(limit)
         )
-        workouts = (await self.session.execute(stmt)).scalars().all()
-        self.log.info("Try get count workouts")
-        total = await self.get_workout_count(user_id)
-        return workouts, total
+        # the total covers shared workouts too, which the owner's counter does not
+        return await self.get_page(stmt, limit, start, after)
 
     async def remove_workout_id(self, workout: WorkoutModel) -> bool:
         self.log.info("remove_workout_id id %s", workout.id)
+        await self.counters.release(workout.user_id, CounterKind.workouts)
         await self.session.delete(workout)
-        await self.session.commit()
+        await self._commit()
         try:
             await self.get_workout_for_user(workout.id, workout.user_id, True)
             return True
@@ -0,0 +1,102 @@
+"""
+Request throughput with INFO logging written by the handlers inline versus through the queue and
+listener thread. The endpoint logs like a service + repository call chain does.
+--sink-latency-us adds a sleep to every handler flush, standing in for a slow disk or a blocked stderr pipe.
+
+    cd app && python -m scripts.bench_logging --requests 3000 --lines 6 --sink-latency-us 100
+"""
+import argparse
+import asyncio
+import copy
+import logging
+import logging.config
+import os
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+
+import logging_conf
+
+
+def _config(log_file: str) -> dict:
+    config = copy.deepcopy(logging_conf.LOGGING_CONFIG)
+    config["handlers"]["file"]["filename"] = log_file
+    return config
+
+
+def build_app(lines: int) -> FastAPI:
+    app = FastAPI()
+    log = logging.LoggerAdapter(logging.getLogger("services.bench"), {"component": "BenchServices"})
+
+    @app.get("/ping")
+    async def ping():
+        for number in range(lines):
+            log.info("step %s of request, data %s", number, {"id": number, "name": "workout"})
+        return {"status": "OK"}
+
+    return app
+
+
+async def _drive(app: FastAPI, count: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/ping", "raw_path": b"/ping", "query_string": b"", "root_path": "",
+        "headers": [], "client": ("bench", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(count):
+        await app(dict(scope), receive, send)
+    return count / (time.perf_counter() - started)
+
+
+def _slow_down_sinks(latency_sec: float) -> None:
+    flush = logging.StreamHandler.flush
+
+    def slow_flush(self):
+        flush(self)
+        time.sleep(latency_sec)
+
+    logging.StreamHandler.flush = slow_flush
+
+
+async def main(count: int, lines: int, sink_latency_us: float) -> None:
+    # console output goes nowhere, the file handler writes to a temp dir
+    sys.stderr = open(os.devnull, "w")
+    log_dir = tempfile.mkdtemp()
+    app = build_app(lines)
+    if sink_latency_us:
+        _slow_down_sinks(sink_latency_us / 1e6)
+
+    logging.config.dictConfig(_config(os.path.join(log_dir, "inline.log")))
+    inline = await _drive(app, count)
+
+    logging.config.dictConfig(_config(os.path.join(log_dir, "queued.log")))
+    logging_conf.install_queue_handlers(list(logging_conf.LOGGING_CONFIG["loggers"]))
+    queued = await _drive(app, count)
+    stats = logging_conf.logging_stats()
+    drain_started = time.perf_counter()
+    logging_conf.stop_logging()
+    drained = time.perf_counter() - drain_started
+
+    sys.stderr = sys.__stderr__
+    print(f"{'handlers inline':<40} {inline:10.1f} req/s")
+    print(f"{'queue + listener thread':<40} {queued:10.1f} req/s")
+    print(f"left in queue {stats['queued']}, dropped {stats['dropped']}, drained in {drained:.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--lines", type=int, default=6)
+    parser.add_argument("--sink-latency-us", type=float, default=0)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.lines, args.sink_latency_us))
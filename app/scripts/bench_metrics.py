@@ -0,0 +1,67 @@
+"""
+Per-request cost of the Prometheus instrumentation in CorrelationIdASGIMiddleware, with body logging off
+so only the metrics differ. --multiprocess measures the mmap-backed values used with several workers.
+
+    cd app && python -m scripts.bench_metrics --requests 20000 [--multiprocess]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+def build_app():
+    body = b'{"status":"OK"}'
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+async def _drive(app, count: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/v1/auth/healthcheck", "raw_path": b"/api/v1/auth/healthcheck",
+        "query_string": b"", "root_path": "", "headers": [], "client": ("bench", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(count):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / count
+
+
+async def main(count: int) -> None:
+    # imported here so PROMETHEUS_MULTIPROC_DIR is in place before prometheus_client picks its value class
+    from core.middleware import BodyLogMode, BodyLogPolicy, CorrelationIdASGIMiddleware
+
+    off = BodyLogPolicy(BodyLogMode.off)
+    inner = build_app()
+    results = {}
+    for record_metrics in (False, True):
+        app = CorrelationIdASGIMiddleware(inner, default_body_log_policy=off, record_metrics=record_metrics)
+        await _drive(app, 500)
+        results[record_metrics] = await _drive(app, count)
+    print(f"{'middleware, metrics off':<40} {results[False] * 1e6:8.1f} us/request")
+    print(f"{'middleware, metrics on':<40} {results[True] * 1e6:8.1f} us/request")
+    print(f"{'metrics overhead':<40} {(results[True] - results[False]) * 1e6:8.1f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--multiprocess", action="store_true")
+    args = parser.parse_args()
+    if args.multiprocess:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,90 @@
+"""
+Per-request cost of CorrelationIdASGIMiddleware in front of a list endpoint for each body-log policy.
+Log records are formatted and discarded, so the cost of building the log lines is counted.
+
+    cd app && python -m scripts.bench_middleware --requests 3000 --items 200
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from core.middleware import BodyLogMode, BodyLogPolicy, CorrelationIdASGIMiddleware
+from logging_conf import CorrelationIdFilter, LOG_FORMAT
+
+
+class _FormatOnlyHandler(logging.Handler):
+    def emit(self, record: logging.LogRecord) -> None:
+        self.format(record)
+
+
+def _install_discarding_handler() -> None:
+    handler = _FormatOnlyHandler()
+    handler.addFilter(CorrelationIdFilter())
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+
+
+def build_app(items: int):
+    """Raw ASGI app sending a pre-serialized page, so the numbers are the middleware alone."""
+    body = json.dumps({
+        "items": [{"id": number, "name": f"workout {number}", "description": "x" * 80, "exercises": [1, 2, 3]}
+                  for number in range(items)],
+        "meta": {"total": items, "limit": items, "offset": 0},
+    }).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+async def _drive(app, count: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/v1/workouts/", "raw_path": b"/api/v1/workouts/",
+        "query_string": b"limit=200", "root_path": "", "headers": [(b"accept", b"application/json")],
+        "client": ("bench", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(count):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / count
+
+
+async def main(count: int, items: int) -> None:
+    _install_discarding_handler()
+    inner = build_app(items)
+    variants = {
+        "always + parse (previous behaviour)": BodyLogPolicy(BodyLogMode.always, parse=True),
+        "always, raw text": BodyLogPolicy(BodyLogMode.always),
+        "sampled 10%": BodyLogPolicy(BodyLogMode.sampled, sample_rate=0.1),
+        "errors only": BodyLogPolicy(BodyLogMode.errors),
+        "headers": BodyLogPolicy(BodyLogMode.headers),
+        "off": BodyLogPolicy(BodyLogMode.off),
+    }
+    for label, policy in variants.items():
+        app = CorrelationIdASGIMiddleware(inner, stream_request_body=True, default_body_log_policy=policy)
+        await _drive(app, 100)
+        took = await _drive(app, count)
+        print(f"{label:<40} {took * 1e6:9.1f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--items", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.items))
@@ -0,0 +1,82 @@
+"""
+Latency of one list page plus its total for a user with many exercises: the page and a separate COUNT(*),
+the page with count(*) OVER () in the same statement, and the page with a count capped at PAGE_TOTAL_CAP.
+
+    cd app && python -m scripts.bench_page_totals --rows 200000 --limit 20 --cap 10000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert, select
+
+from db.models import ExerciseModel, UserModel
+from repositories.exercise_repositories import ExerciseRepository
+from scripts.bench_utils import describe_latency, make_sessionmaker, make_sqlite_engine, quiet_logging, timer
+
+
+async def _load(session_maker, rows: int, batch: int = 50000) -> int:
+    async with session_maker() as session:
+        user_id = (await session.execute(insert(UserModel.__table__).returning(UserModel.__table__.c.id), [{
+            "email": "bench@example.com", "password_hash": "x", "is_admin": False, "is_active": True,
+            "is_confirmed": True, "plan": "free", "token_generation": 0,
+        }])).scalar_one()
+        for start in range(0, rows, batch):
+            await session.execute(insert(ExerciseModel.__table__), [
+                {"user_id": user_id, "title": f"exercise {number}", "type": "strength"}
+                for number in range(start, min(rows, start + batch))
+            ])
+            await session.commit()
+    return user_id
+
+
+async def _page_then_count(repo: ExerciseRepository, stmt, limit: int, cap: int):
+    items = (await repo.session.scalars(repo.paginate(stmt, limit, 0))).all()
+    return items, await repo.session.scalar(repo.count_stmt(stmt))
+
+
+async def _window(repo: ExerciseRepository, stmt, limit: int, cap: int):
+    return await repo.get_page(stmt, limit, 0, total_cap=None)
+
+
+async def _capped(repo: ExerciseRepository, stmt, limit: int, cap: int):
+    return await repo.get_page(stmt, limit, 0, total_cap=cap)
+
+
+async def _measure(session_maker, read, user_id: int, limit: int, cap: int, repeats: int) -> list[float]:
+    samples = []
+    async with session_maker() as session:
+        repo = ExerciseRepository(session)
+        stmt = select(ExerciseModel).where(ExerciseModel.user_id == user_id)
+        for _ in range(repeats):
+            started = time.perf_counter()
+            items, _ = await read(repo, stmt, limit, cap)
+            samples.append(time.perf_counter() - started)
+            assert len(items) == limit
+            session.expunge_all()
+    return samples
+
+
+async def main(rows: int, limit: int, cap: int, repeats: int) -> None:
+    quiet_logging()
+    path = os.path.join(tempfile.mkdtemp(), "page_totals.db")
+    engine = await make_sqlite_engine(f"sqlite+aiosqlite:///{path}")
+    session_maker = make_sessionmaker(engine)
+    with timer(f"load {rows} exercises", rows):
+        user_id = await _load(session_maker, rows)
+
+    for read in (_page_then_count, _window, _capped):
+        describe_latency(read.__name__.strip("_"), await _measure(session_maker, read, user_id, limit, cap, repeats))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--cap", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.limit, args.cap, args.repeats))
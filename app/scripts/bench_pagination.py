@@ -0,0 +1,91 @@
+"""
+Latency of ExerciseRepository.get_all_exercise_user on page 1 and a deep page for a user with many exercises,
+with OFFSET pagination (which also counts the rows) versus seeking after a (created_at, id) cursor.
+
+    cd app && python -m scripts.bench_pagination --rows 1000000 --limit 100 --page 10000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select
+
+from db.models import ExerciseModel, UserModel
+from repositories.exercise_repositories import ExerciseRepository
+from scripts.bench_utils import describe_latency, make_sessionmaker, make_sqlite_engine, quiet_logging, timer
+
+
+async def _load(session_maker, rows: int, batch: int = 50000) -> int:
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    async with session_maker() as session:
+        user_id = (await session.execute(insert(UserModel.__table__).returning(UserModel.__table__.c.id), [{
+            "email": "bench@example.com", "password_hash": "x", "is_admin": False, "is_active": True,
+            "is_confirmed": True, "plan": "free", "token_generation": 0,
+        }])).scalar_one()
+        for start in range(0, rows, batch):
+            await session.execute(insert(ExerciseModel.__table__), [
+                # a few rows share each timestamp, as bulk imports do
+                {"user_id": user_id, "title": f"exercise {number}", "type": "strength",
+                 "created_at": base + timedelta(seconds=number // 4), "updated_at": base}
+                for number in range(start, min(rows, start + batch))
+            ])
+            await session.commit()
+    return user_id
+
+
+async def _cursor_before(session_maker, user_id: int, offset: int):
+    """The (created_at, id) of the row just before the page, i.e. what the previous page handed out."""
+    if offset == 0:
+        return None
+    async with session_maker() as session:
+        row = (await session.execute(
+            select(ExerciseModel.created_at, ExerciseModel.id)
+            .where(ExerciseModel.user_id == user_id)
+            .order_by(ExerciseModel.created_at, ExerciseModel.id)
+            .offset(offset - 1).limit(1)
+        )).one()
+    return row.created_at, row.id
+
+
+async def _measure(session_maker, user_id: int, limit: int, page: int, after, repeats: int) -> list[float]:
+    samples = []
+    async with session_maker() as session:
+        repo = ExerciseRepository(session)
+        for _ in range(repeats):
+            started = time.perf_counter()
+            items, _ = await repo.get_all_exercise_user(user_id, limit, page, after)
+            samples.append(time.perf_counter() - started)
+            assert len(items) == limit
+            session.expunge_all()
+    return samples
+
+
+async def main(rows: int, limit: int, page: int, repeats: int) -> None:
+    quiet_logging()
+    path = os.path.join(tempfile.mkdtemp(), "pagination.db")
+    engine = await make_sqlite_engine(f"sqlite+aiosqlite:///{path}")
+    session_maker = make_sessionmaker(engine)
+    with timer(f"load {rows} exercises", rows):
+        user_id = await _load(session_maker, rows)
+
+    for label, number in (("page 1", 0), (f"page {page}", page - 1)):
+        after = await _cursor_before(session_maker, user_id, number * limit)
+        describe_latency(f"offset, {label}", await _measure(session_maker, user_id, limit, number, None, repeats))
+        if after is not None:
+            describe_latency(f"cursor, {label}", await _measure(session_maker, user_id, limit, 0, after, repeats))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--page", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    if args.page * args.limit > args.rows:
+        parser.error("--page * --limit must not exceed --rows")
+    asyncio.run(main(args.rows, args.limit, args.page, args.repeats))
@@ -0,0 +1,74 @@
+"""
+p99 latency of an unrelated GET endpoint while a storm of logins verifies bcrypt hashes,
+with bcrypt running inline on the event loop and in the bounded password executor.
+
+    cd app && python -m scripts.bench_password_hashing --logins 40 --gets 400
+"""
+import argparse
+import asyncio
+import time
+
+import bcrypt
+import httpx
+from fastapi import FastAPI
+
+from core.password_hasher import PasswordHasher
+from scripts.bench_utils import describe_latency, quiet_logging
+
+
+def build_app(hasher: PasswordHasher | None, hashed: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "OK"}
+
+    @app.post("/login")
+    async def login():
+        if hasher is None:
+            return bcrypt.checkpw(b"password", hashed.encode())
+        return await hasher.verify("password", hashed)
+
+    return app
+
+
+async def _storm(app: FastAPI, logins: int, gets: int, interval: float = 0.005) -> list[float]:
+    transport = httpx.ASGITransport(app=app)
+    latencies: list[float] = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def get_loop():
+            # requests "arrive" on a fixed schedule, so time spent waiting for a blocked loop counts
+            first_arrival = time.perf_counter()
+            for number in range(gets):
+                arrival = first_arrival + number * interval
+                await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+                await client.get("/ping")
+                latencies.append(time.perf_counter() - arrival)
+
+        logins_tasks = [client.post("/login") for _ in range(logins)]
+        await asyncio.gather(get_loop(), *logins_tasks, return_exceptions=True)
+    return latencies
+
+
+async def main(logins: int, gets: int, rounds: int, workers: int) -> None:
+    quiet_logging()
+    hashed = bcrypt.hashpw(b"password", bcrypt.gensalt(rounds=rounds)).decode()
+
+    inline = await _storm(build_app(None, hashed), logins, gets)
+    describe_latency("GET /ping, bcrypt inline", inline)
+
+    hasher = PasswordHasher(max_workers=workers, max_pending=logins, rounds=rounds)
+    offloaded = await _storm(build_app(hasher, hashed), logins, gets)
+    describe_latency("GET /ping, bcrypt in executor", offloaded)
+    print(f"executor stats: {hasher.stats()}")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--gets", type=int, default=400)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.gets, args.rounds, args.workers))
@@ -0,0 +1,69 @@
+"""
+Requests/sec of an authenticated endpoint with and without the principal cache.
+
+    cd app && python -m scripts.bench_principal_cache --requests 2000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from core.config import settings
+from core.dependencies import get_db
+from core.principal_cache import principal_cache
+from db.models import UserModel
+from db.models.enums import TypeTokensEnum
+from main import create_app
+from repositories.user_repository import UserRepository
+from scripts.bench_utils import make_sessionmaker, make_sqlite_engine, quiet_logging
+from services.auth_service import AuthServ
+
+
+async def _run(client: httpx.AsyncClient, token: str, count: int) -> float:
+    headers = {"Authorization": f"Bearer {token}"}
+    started = time.perf_counter()
+    for _ in range(count):
+        response = await client.get("/api/v1/users/me", headers=headers)
+        response.raise_for_status()
+    return count / (time.perf_counter() - started)
+
+
+async def main(count: int) -> None:
+    quiet_logging()
+    engine = await make_sqlite_engine()
+    session_maker = make_sessionmaker(engine)
+
+    async with session_maker() as session:
+        user = UserModel(email="bench@example.com", password_hash="x", is_active=True, is_confirmed=True)
+        session.add(user)
+        await session.commit()
+        token = await AuthServ.issue_email_verify_token(user.id, TypeTokensEnum.access)
+        await UserRepository(session).add_token_user(token, user.id)
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    app = create_app()
+    app.dependency_overrides[get_db] = override_get_db
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        principal_cache.configure(0, 0)
+        await _run(client, token, 50)
+        without_cache = await _run(client, token, count)
+
+        principal_cache.configure(settings.PRINCIPAL_CACHE_MAX_SIZE, settings.PRINCIPAL_CACHE_TTL_SEC)
+        await _run(client, token, 50)
+        with_cache = await _run(client, token, count)
+
+    print(f"without principal cache: {without_cache:10.1f} req/s")
+    print(f"with principal cache:    {with_cache:10.1f} req/s")
+    print(f"cache stats: {principal_cache.stats()}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().requests))
@@ -0,0 +1,113 @@
+"""
+Deleting an exercise used by many workouts (5,000 by default, a few exercises each): the previous
+per-workout loop with one UPDATE per shifted position versus the set-based renumbering of
+ExerciseRepository.remove_exercise_id. Reports the time and the statements each run took.
+
+    cd app && python -m scripts.bench_remove_exercise --workouts 5000 --per-workout 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import delete, event, insert, select, update
+
+from db.models import ExerciseModel, UserModel, WorkoutModel
+from db.models.workout_model import WorkoutExerciseModel
+from repositories.exercise_repositories import ExerciseRepository
+from scripts.bench_utils import make_sessionmaker, make_sqlite_engine, quiet_logging
+
+
+async def _load(session_maker, prefix: str, workouts: int, per_workout: int, batch: int = 50000) -> int:
+    rng = random.Random(3)
+    async with session_maker() as session:
+        user_id = (await session.execute(insert(UserModel.__table__).returning(UserModel.__table__.c.id), [{
+            "email": f"{prefix}@example.com", "password_hash": "x", "is_admin": False,
+            "is_active": True, "is_confirmed": True, "plan": "free", "token_generation": 0,
+        }])).scalar_one()
+        exercise_ids = list((await session.execute(
+            insert(ExerciseModel.__table__).returning(ExerciseModel.__table__.c.id),
+            [{"user_id": user_id, "title": f"exercise {number}", "type": "strength"} for number in range(50)],
+        )).scalars())
+        removed = exercise_ids[0]
+        workout_ids = list((await session.execute(
+            insert(WorkoutModel.__table__).returning(WorkoutModel.__table__.c.id),
+            [{"user_id": user_id, "title": f"workout {number}"} for number in range(workouts)],
+        )).scalars())
+        rows = []
+        for workout_id in workout_ids:
+            layout = rng.sample(exercise_ids[1:], per_workout - 1)
+            layout.insert(rng.randrange(per_workout), removed)
+            rows.extend({"workout_id": workout_id, "exercise_id": exercise_id, "position": position}
+                        for position, exercise_id in enumerate(layout, start=1))
+            if len(rows) >= batch:
+                await session.execute(insert(WorkoutExerciseModel.__table__), rows)
+                rows = []
+        if rows:
+            await session.execute(insert(WorkoutExerciseModel.__table__), rows)
+        await session.commit()
+    return removed
+
+
+async def _remove_looping(repo: ExerciseRepository, exercise_id: int) -> None:
+    """The implementation remove_exercise_id replaced, kept here for comparison."""
+    assoc = WorkoutExerciseModel
+    async with repo.session.begin_nested():
+        workout_ids = (await repo.session.scalars(
+            select(assoc.workout_id).where(assoc.exercise_id == exercise_id).distinct())).all()
+        for workout_id in workout_ids:
+            assoc_list = (await repo.session.scalars(
+                select(assoc).where(assoc.workout_id == workout_id).order_by(assoc.position))).all()
+            remaining = [a for a in assoc_list if a.exercise_id != exercise_id]
+            await repo.session.execute(
+                delete(assoc).where((assoc.workout_id == workout_id) & (assoc.exercise_id == exercise_id)))
+            for new_pos, row in enumerate(remaining, start=1):
+                if row.position != new_pos:
+                    await repo.session.execute(update(assoc).where(assoc.id == row.id).values(position=new_pos))
+        await repo.session.execute(delete(ExerciseModel).where(ExerciseModel.id == exercise_id))
+    await repo.session.commit()
+
+
+async def _set_based(repo: ExerciseRepository, exercise_id: int) -> None:
+    await repo.remove_exercise_id(exercise_id)
+
+
+async def _run(engine, session_maker, remove, workouts: int, per_workout: int) -> None:
+    exercise_id = await _load(session_maker, remove.__name__, workouts, per_workout)
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        async with session_maker() as session:
+            started = time.perf_counter()
+            await remove(ExerciseRepository(session), exercise_id)
+            elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+    print(f"{remove.__name__.strip('_'):<16} {elapsed * 1000:10.1f}ms  {statements:7d} statements")
+
+
+async def main(workouts: int, per_workout: int) -> None:
+    quiet_logging()
+    path = os.path.join(tempfile.mkdtemp(), "remove_exercise.db")
+    engine = await make_sqlite_engine(f"sqlite+aiosqlite:///{path}")
+    session_maker = make_sessionmaker(engine)
+    for remove in (_remove_looping, _set_based):
+        await _run(engine, session_maker, remove, workouts, per_workout)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workouts", type=int, default=5000)
+    parser.add_argument("--per-workout", type=int, default=8)
+    args = parser.parse_args()
+    if not 1 <= args.per_workout <= 50:
+        parser.error("--per-workout must be between 1 and 50")
+    asyncio.run(main(args.workouts, args.per_workout))
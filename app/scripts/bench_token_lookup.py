@@ -0,0 +1,111 @@
+"""
+Token lookups against a large tokens table: the old layout (String(600) token index, no user_id index)
+versus sha256-keyed rows with a unique token_hash and an (user_id, expires_at) index.
+
+    cd app && python -m scripts.bench_token_lookup --rows 1000000 --lookups 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import secrets
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table, and_, delete, insert, select
+
+from core.security import token_digest
+from db.models import JWTTokenModel, UserModel
+from scripts.bench_utils import make_sessionmaker, make_sqlite_engine, quiet_logging, timer
+
+users = UserModel.__table__
+legacy_metadata = MetaData()
+legacy_tokens = Table(
+    "legacy_tokens", legacy_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("token", String(600), index=True),
+    Column("user_id", ForeignKey(users.c.id, ondelete="CASCADE")),
+)
+new_tokens = JWTTokenModel.__table__
+
+
+def _raw_token() -> str:
+    # roughly the size of the access tokens the service issues
+    return secrets.token_urlsafe(150)
+
+
+async def _load(session_maker, rows: int, users_count: int, batch: int = 20000) -> list[tuple[int, str]]:
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    sample: list[tuple[int, str]] = []
+    async with session_maker() as session:
+        await session.execute(insert(users), [
+            {"id": user_id, "email": f"user{user_id}@example.com", "password_hash": "x", "is_admin": False,
+             "is_active": True, "is_confirmed": True, "plan": "free", "token_generation": 0}
+            for user_id in range(1, users_count + 1)
+        ])
+        for start in range(0, rows, batch):
+            chunk = [(start + offset) % users_count + 1 for offset in range(min(batch, rows - start))]
+            tokens = [_raw_token() for _ in chunk]
+            await session.execute(insert(legacy_tokens), [
+                {"token": token, "user_id": user_id} for user_id, token in zip(chunk, tokens)
+            ])
+            await session.execute(insert(new_tokens), [
+                {"token": token, "token_hash": token_digest(token), "expires_at": expires_at, "user_id": user_id}
+                for user_id, token in zip(chunk, tokens)
+            ])
+            sample.extend(random.sample(list(zip(chunk, tokens)), k=min(len(chunk), 50)))
+            await session.commit()
+    return sample
+
+
+async def main(rows: int, lookups: int, users_count: int) -> None:
+    quiet_logging()
+    path = os.path.join(tempfile.mkdtemp(), "bench_tokens.db")
+    engine = await make_sqlite_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(legacy_metadata.create_all)
+    session_maker = make_sessionmaker(engine)
+
+    with timer(f"load {rows} token rows twice"):
+        sample = await _load(session_maker, rows, users_count)
+    probes = random.sample(sample, k=min(lookups, len(sample)))
+
+    async with session_maker() as session:
+        with timer("find_user_id, old: join by user_id", len(probes)):
+            for user_id, token in probes:
+                stmt = select(users.c.id, legacy_tokens.c.token) \
+                    .join(legacy_tokens, legacy_tokens.c.user_id == users.c.id).where(users.c.id == user_id)
+                found = (await session.execute(stmt)).all()
+                assert any(row.token == token for row in found)
+
+        with timer("find_user_id, new: token_hash probe", len(probes)):
+            for user_id, token in probes:
+                stmt = select(users.c.id, new_tokens.c.token) \
+                    .outerjoin(new_tokens, and_(new_tokens.c.token_hash == token_digest(token),
+                                                new_tokens.c.user_id == users.c.id)) \
+                    .where(users.c.id == user_id)
+                assert (await session.execute(stmt)).one().token == token
+
+        removals = probes[:max(1, len(probes) // 10)]
+        with timer("remove_token_user, old: by user_id", len(removals)):
+            for user_id, _ in removals:
+                await session.execute(delete(legacy_tokens).where(legacy_tokens.c.user_id == user_id))
+            await session.commit()
+
+        with timer("remove_token_user, new: by token_hash", len(removals)):
+            for user_id, token in removals:
+                await session.execute(delete(new_tokens).where(new_tokens.c.user_id == user_id,
+                                                               new_tokens.c.token_hash == token_digest(token)))
+            await session.commit()
+
+    await engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.lookups, args.users))
@@ -0,0 +1,82 @@
+"""
+Editing exercises one at a time: the previous UPDATE followed by a SELECT of the row against
+ExerciseRepository.update_exercise, which reads the row back with UPDATE ... RETURNING, and the
+select-update-select fallback for dialects without it. --rtt-ms adds a simulated network round trip
+to every statement, which is what the saved SELECT costs against a remote PostgreSQL.
+
+    cd app && python -m scripts.bench_update_returning --edits 2000 --rtt-ms 0.5
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import and_, event, insert, update
+
+from db.models import ExerciseModel, UserModel
+from repositories.exercise_repositories import ExerciseRepository
+from scripts.bench_utils import make_sessionmaker, make_sqlite_engine, quiet_logging, timer
+
+
+async def _update_refetch(repo: ExerciseRepository, user_id: int, exercise_id: int, data: dict) -> ExerciseModel:
+    """update_exercise before it used RETURNING, kept here for comparison."""
+    stmt = update(repo.model).where(and_(repo.model.id == exercise_id, repo.model.user_id == user_id)).values(**data)
+    await repo.execute_session_and_commit(stmt)
+    return await repo.get_by_id(user_id, exercise_id)
+
+
+async def _update_returning(repo: ExerciseRepository, user_id: int, exercise_id: int, data: dict) -> ExerciseModel:
+    return await repo.update_exercise(data, user_id, exercise_id)
+
+
+async def _run(engine, session_maker, label: str, edit, user_id: int, ids: list, edits: int,
+               returning: bool) -> None:
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    dialect = engine.sync_engine.dialect
+    supported, dialect.update_returning = dialect.update_returning, returning
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        async with session_maker() as session:
+            repo = ExerciseRepository(session)
+            with timer(label, edits):
+                for number in range(edits):
+                    await edit(repo, user_id, ids[number % len(ids)], {"title": f"{label} {number}"})
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+        dialect.update_returning = supported
+    print(f"{'':<40} {statements / edits:.1f} statements per edit")
+
+
+async def main(edits: int, rtt_ms: float) -> None:
+    quiet_logging()
+    engine = await make_sqlite_engine()
+    session_maker = make_sessionmaker(engine)
+    async with session_maker() as session:
+        user_id = (await session.execute(insert(UserModel.__table__).returning(UserModel.__table__.c.id), [{
+            "email": "editor@example.com", "password_hash": "x", "is_admin": False,
+            "is_active": True, "is_confirmed": True, "plan": "free", "token_generation": 0,
+        }])).scalar_one()
+        ids = list((await session.execute(
+            insert(ExerciseModel.__table__).returning(ExerciseModel.__table__.c.id),
+            [{"user_id": user_id, "title": f"exercise {number}", "type": "strength", "description": ""}
+             for number in range(50)],
+        )).scalars())
+        await session.commit()
+    if rtt_ms:
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *_: time.sleep(rtt_ms / 1000))
+    await _run(engine, session_maker, "update + select", _update_refetch, user_id, ids, edits, True)
+    await _run(engine, session_maker, "update returning", _update_returning, user_id, ids, edits, True)
+    await _run(engine, session_maker, "fallback without returning", _update_returning, user_id, ids, edits, False)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--edits", type=int, default=2000)
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="simulated round trip per statement")
+    args = parser.parse_args()
+    asyncio.run(main(args.edits, args.rtt_ms))
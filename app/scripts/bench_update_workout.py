@@ -0,0 +1,111 @@
+"""
+Updating a 200-exercise workout where only two exercises swapped places: the previous clear-and-reinsert
+of every association row versus the diff applied by WorkoutRepository.update_workout. Reports latency and
+the statements one update takes.
+
+    cd app && python -m scripts.bench_update_workout --exercises 200 --repeats 50
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import event, insert
+
+from db.models import ExerciseModel, UserModel, WorkoutModel
+from db.models.workout_model import WorkoutExerciseModel
+from db.schemas.user_schema import UserAdminGetModelSchema
+from db.schemas.workout_schema import WorkoutExerciseCreateSchema
+from repositories.workout_repositories import WorkoutRepository
+from scripts.bench_utils import describe_latency, make_sessionmaker, make_sqlite_engine, quiet_logging
+from utils.context import set_current_user
+
+
+async def _load(session_maker, exercises: int) -> tuple[UserModel, int, list[int]]:
+    async with session_maker() as session:
+        user = UserModel(email="bench@example.com", password_hash="x", is_active=True, is_confirmed=True)
+        session.add(user)
+        await session.flush()
+        exercise_ids = list((await session.execute(
+            insert(ExerciseModel.__table__).returning(ExerciseModel.__table__.c.id),
+            [{"user_id": user.id, "title": f"exercise {number}", "type": "strength"} for number in range(exercises)],
+        )).scalars())
+        workout = WorkoutModel(title="bench", description="", user_id=user.id, workout_exercises=[
+            WorkoutExerciseModel(exercise_id=exercise_id, position=position)
+            for position, exercise_id in enumerate(exercise_ids, start=1)
+        ])
+        session.add(workout)
+        await session.commit()
+        return user, workout.id, exercise_ids
+
+
+def _swapped(exercise_ids: list[int], first: int, second: int) -> WorkoutExerciseCreateSchema:
+    order = list(exercise_ids)
+    order[first], order[second] = order[second], order[first]
+    return WorkoutExerciseCreateSchema.model_validate({
+        "workout": {"title": "bench", "description": ""},
+        "exercises": [{"exercise_id": exercise_id, "position": position}
+                      for position, exercise_id in enumerate(order, start=1)],
+    })
+
+
+async def _clear_and_reinsert(repo: WorkoutRepository, workout_id: int, user_id: int,
+                              schema: WorkoutExerciseCreateSchema) -> None:
+    """The implementation update_workout replaced, kept here for comparison."""
+    workout_obj = await repo.get_workout_for_user(workout_id, user_id)
+    workout_obj.title = schema.workout.title
+    workout_obj.description = schema.workout.description
+    workout_obj.workout_exercises.clear()
+    await repo.session.flush()
+    for item in schema.exercises:
+        workout_obj.workout_exercises.append(WorkoutExerciseModel(**item.model_dump()))
+    await repo.session.commit()
+    await repo.session.refresh(workout_obj)
+
+
+async def _diff(repo: WorkoutRepository, workout_id: int, user_id: int, schema: WorkoutExerciseCreateSchema) -> None:
+    await repo.update_workout(workout_id, user_id, schema)
+
+
+async def _measure(engine, session_maker, update, exercises: int, repeats: int) -> None:
+    user, workout_id, exercise_ids = await _load(session_maker, exercises)
+    set_current_user(UserAdminGetModelSchema.model_validate(user))
+    # alternate between two orders so that every update has a swap to apply
+    schemas = [_swapped(exercise_ids, 10, exercises - 10), _swapped(exercise_ids, 0, 0)]
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    samples = []
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        for number in range(repeats):
+            async with session_maker() as session:
+                started = time.perf_counter()
+                await update(WorkoutRepository(session), workout_id, user.id, schemas[number % 2])
+                samples.append(time.perf_counter() - started)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+    describe_latency(f"{update.__name__.strip('_')} ({statements / repeats:.0f} statements)", samples)
+
+
+async def main(exercises: int, repeats: int) -> None:
+    quiet_logging()
+    for update in (_clear_and_reinsert, _diff):
+        path = os.path.join(tempfile.mkdtemp(), "update_workout.db")
+        engine = await make_sqlite_engine(f"sqlite+aiosqlite:///{path}")
+        await _measure(engine, make_sessionmaker(engine), update, exercises, repeats)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--exercises", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    if args.exercises < 20:
+        parser.error("--exercises must be at least 20")
+    asyncio.run(main(args.exercises, args.repeats))
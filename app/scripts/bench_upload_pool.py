@@ -0,0 +1,152 @@
+"""
+Load test: latency of exercise list reads while large media uploads run, on a pool with no overflow.
+Compares the previous create_exercise, which kept a connection checked out for the whole S3 upload,
+with ExerciseServices.create_exercise, which releases it first. S3 is simulated by reading the file
+at --bandwidth MB/s, so the upload costs wall time but no CPU.
+
+    cd app && python -m scripts.bench_upload_pool --size-mb 100 --uploads 4 --pool-size 4
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from fastapi import UploadFile
+from sqlalchemy import insert
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from db.base import BaseModel
+from db.models import ExerciseModel, UserModel
+from db.models.enums import CounterKind
+from db.schemas.exercise_schema import CreateExerciseSchema
+from db.schemas.user_schema import UserAdminGetModelSchema
+from scripts.bench_utils import describe_latency, make_sessionmaker, quiet_logging
+from services.base_services import BaseServices
+from services.exercise_service import ExerciseServices
+from utils.context import get_current_user, set_current_user
+
+CHUNK = 8 * 1024 * 1024
+
+
+class ThrottledS3:
+    """Stands in for S3CloudConnector: reads the upload at a fixed bandwidth."""
+
+    bucket = "bench"
+
+    def __init__(self, bandwidth_mb: float) -> None:
+        self.bytes_per_sec = bandwidth_mb * 1024 * 1024
+
+    async def upload_upload_file(self, bucket, key: str, file: UploadFile, public) -> str:
+        while chunk := await file.read(CHUNK):
+            await asyncio.sleep(len(chunk) / self.bytes_per_sec)
+        return f"https://bench.local/{bucket}/{key}"
+
+    async def remove_file_url(self, bucket, key):
+        return None
+
+
+async def _create_holding(srv: ExerciseServices, payload: CreateExerciseSchema, file: UploadFile) -> None:
+    """The create_exercise flow before connections were released, kept here for comparison."""
+    user = await srv.repo_user.find_user_id(BaseServices.check_permission(get_current_user(), None))
+    user.check_reached_limit_exercises(
+        await srv.repo.counters.reserve(user.id, CounterKind.exercises, user.plan_limit(CounterKind.exercises)))
+    payload._user_id = user.id
+    new_exercise = await srv.repo.create_one_obj_model(payload.model_dump())
+    link = await srv.s3.upload_upload_file(srv.s3.bucket, new_exercise.get_media_url_path(file), file, True)
+    await srv.repo.update_link_exercise(new_exercise.id, link)
+
+
+async def _create_releasing(srv: ExerciseServices, payload: CreateExerciseSchema, file: UploadFile) -> None:
+    await srv.create_exercise(payload, file)
+
+
+async def _reads(session_maker, principal, stop: asyncio.Event, samples: list, timeouts: list) -> None:
+    set_current_user(principal)
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            async with session_maker() as session:
+                await ExerciseServices(session).get_exercises(20, 0, None)
+            samples.append(time.perf_counter() - started)
+        except PoolTimeoutError:
+            timeouts.append(time.perf_counter() - started)
+
+
+async def _upload(session_maker, create, principal, path: str, bandwidth_mb: float) -> None:
+    set_current_user(principal)
+    payload = CreateExerciseSchema(title="upload", type="strength", description="", time_work=None,
+                                   repetitions=10, count_sets=3, rest_sec=60)
+    with open(path, "rb") as media:
+        async with session_maker() as session:
+            srv = ExerciseServices(session)
+            srv.s3 = ThrottledS3(bandwidth_mb)
+            await create(srv, payload, UploadFile(filename="clip.mp4", file=media))
+
+
+async def _setup(path: str, uploads: int, pool_size: int, pool_timeout: float):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool,
+                                 pool_size=pool_size, max_overflow=0, pool_timeout=pool_timeout)
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseModel.metadata.create_all)
+    session_maker = make_sessionmaker(engine)
+    async with session_maker() as session:
+        # one uploader per user keeps every upload under the free plan's exercise limit
+        users = [UserModel(email=f"uploader{number}@example.com", password_hash="x", is_active=True,
+                           is_confirmed=True) for number in range(uploads + 1)]
+        session.add_all(users)
+        await session.flush()
+        await session.execute(insert(ExerciseModel.__table__), [
+            {"user_id": users[0].id, "title": f"exercise {number}", "type": "strength", "description": ""}
+            for number in range(50)
+        ])
+        await session.commit()
+        principals = [UserAdminGetModelSchema.model_validate(user) for user in users]
+    return engine, session_maker, principals
+
+
+async def _measure(label: str, create, media: str, args) -> None:
+    engine, session_maker, (reader, *uploaders) = await _setup(
+        os.path.join(tempfile.mkdtemp(), "upload_pool.db"), args.uploads, args.pool_size, args.pool_timeout)
+    stop = asyncio.Event()
+    samples, timeouts = [], []
+    readers = [asyncio.create_task(_reads(session_maker, reader, stop, samples, timeouts))
+               for _ in range(args.readers)]
+    started = time.perf_counter()
+    if create is None:
+        await asyncio.sleep(args.idle_sec)
+    else:
+        await asyncio.gather(*(_upload(session_maker, create, principal, media, args.bandwidth)
+                               for principal in uploaders))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*readers)
+    await engine.dispose()
+    describe_latency(f"{label} ({len(timeouts)} pool timeouts)", samples)
+    print(f"{'':<40} {elapsed:.1f}s, {len(samples) / elapsed:.0f} reads/s")
+
+
+async def main(args) -> None:
+    quiet_logging()
+    media = os.path.join(tempfile.mkdtemp(), "clip.mp4")
+    with open(media, "wb") as out:
+        for _ in range(args.size_mb):
+            out.write(os.urandom(1024 * 1024))
+    await _measure("reads, no uploads", None, media, args)
+    await _measure("reads, uploads holding connections", _create_holding, media, args)
+    await _measure("reads, uploads releasing connections", _create_releasing, media, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--bandwidth", type=float, default=50, help="simulated upload MB/s per upload")
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--pool-timeout", type=float, default=1)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--idle-sec", type=float, default=2)
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments))
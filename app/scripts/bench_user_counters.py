@@ -0,0 +1,94 @@
+"""
+Exercise creation for users a few rows below their plan limit, many creates in flight at once:
+the previous COUNT(*)-then-insert check versus the conditional increment on user_counters.
+Reports throughput and how many rows ended up over the limit.
+
+    cd app && python -m scripts.bench_user_counters --users 20 --limit 5000 --headroom 5 --attempts 20
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import func, insert, select
+
+from db.models import ExerciseModel, UserModel
+from db.models.enums import CounterKind
+from repositories.exercise_repositories import ExerciseRepository
+from repositories.user_counter_repository import UserCounterRepository
+from scripts.bench_utils import make_sessionmaker, make_sqlite_engine, quiet_logging, timer
+
+
+async def _load(session_maker, prefix: str, users: int, rows_per_user: int) -> list[int]:
+    async with session_maker() as session:
+        user_ids = list((await session.execute(insert(UserModel.__table__).returning(UserModel.__table__.c.id), [
+            {"email": f"{prefix}{number}@example.com", "password_hash": "x", "is_admin": False, "is_active": True,
+             "is_confirmed": True, "plan": "free", "token_generation": 0}
+            for number in range(users)
+        ])).scalars())
+        for user_id in user_ids:
+            await session.execute(insert(ExerciseModel.__table__), [
+                {"user_id": user_id, "title": f"exercise {number}", "type": "strength"}
+                for number in range(rows_per_user)
+            ])
+        await session.commit()
+        await UserCounterRepository(session).reconcile(chunk_size=1000)
+    return user_ids
+
+
+async def _create_counting(session_maker, user_id: int, limit: int) -> bool:
+    async with session_maker() as session:
+        repo = ExerciseRepository(session)
+        count = await session.scalar(select(func.count()).select_from(ExerciseModel)
+                                     .where(ExerciseModel.user_id == user_id))
+        if count >= limit:
+            return False
+        await repo.create_one_obj_model({"title": "new", "user_id": user_id})
+        return True
+
+
+async def _create_reserving(session_maker, user_id: int, limit: int) -> bool:
+    async with session_maker() as session:
+        repo = ExerciseRepository(session)
+        if await repo.counters.reserve(user_id, CounterKind.exercises, limit) >= limit:
+            return False
+        await repo.create_one_obj_model({"title": "new", "user_id": user_id})
+        return True
+
+
+async def _run(session_maker, create, user_ids: list[int], limit: int, attempts: int) -> None:
+    started = time.perf_counter()
+    await asyncio.gather(*(create(session_maker, user_id, limit) for _ in range(attempts) for user_id in user_ids))
+    elapsed = time.perf_counter() - started
+    async with session_maker() as session:
+        counts = (await session.execute(
+            select(func.count()).select_from(ExerciseModel).where(ExerciseModel.user_id.in_(user_ids))
+            .group_by(ExerciseModel.user_id)
+        )).scalars().all()
+    over = sum(max(0, count - limit) for count in counts)
+    total = attempts * len(user_ids)
+    print(f"{create.__name__:<24} {total / elapsed:10.1f} creates/s  rows over limit: {over}")
+
+
+async def main(users: int, limit: int, headroom: int, attempts: int) -> None:
+    quiet_logging()
+    path = os.path.join(tempfile.mkdtemp(), "counters.db")
+    engine = await make_sqlite_engine(f"sqlite+aiosqlite:///{path}")
+    session_maker = make_sessionmaker(engine)
+    with timer(f"load {users} users x {limit - headroom} exercises"):
+        counting_users = await _load(session_maker, "counting", users, limit - headroom)
+        reserving_users = await _load(session_maker, "reserving", users, limit - headroom)
+    await _run(session_maker, _create_counting, counting_users, limit, attempts)
+    await _run(session_maker, _create_reserving, reserving_users, limit, attempts)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--headroom", type=int, default=5)
+    parser.add_argument("--attempts", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.limit, args.headroom, args.attempts))
@@ -0,0 +1,55 @@
+import logging
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from db.base import BaseModel
+import db.models  # noqa: F401  register all tables on the metadata
+
+
+def quiet_logging(level: int = logging.WARNING) -> None:
+    """Benchmarks measure the code path, not the log handlers."""
+    logging.disable(level)
+
+
+async def make_sqlite_engine(url: str = "sqlite+aiosqlite:///:memory:") -> AsyncEngine:
+    engine = create_async_engine(url, poolclass=StaticPool) if url.endswith(":memory:") \
+        else create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseModel.metadata.create_all)
+    return engine
+
+
+def make_sessionmaker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@contextmanager
+def timer(label: str, count: int = 0) -> Iterator[None]:
+    started = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - started
+    if count:
+        print(f"{label:<40} {elapsed:8.3f}s  {count / elapsed:12.1f} ops/s")
+    else:
+        print(f"{label:<40} {elapsed:8.3f}s")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def describe_latency(label: str, samples: List[float]) -> None:
+    ms = [s * 1000 for s in samples]
+    print(
+        f"{label:<40} n={len(ms):<6} p50={percentile(ms, 50):8.2f}ms "
+        f"p99={percentile(ms, 99):8.2f}ms mean={statistics.fmean(ms) if ms else 0:8.2f}ms"
+    )
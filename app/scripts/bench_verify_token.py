@@ -0,0 +1,55 @@
+"""
+AuthServ.verify_token throughput with and without the decoded-JWT memo, for valid tokens
+and for a spray of repeated tokens with a bad signature.
+
+    cd app && python -m scripts.bench_verify_token --calls 50000
+"""
+import argparse
+import asyncio
+import logging
+
+from fastapi import HTTPException
+
+from db.models.enums import TypeTokensEnum
+from scripts.bench_utils import quiet_logging, timer
+from services import auth_service
+from services.auth_service import AuthServ
+
+
+def _verify_all(tokens: list[str], calls: int) -> None:
+    for number in range(calls):
+        try:
+            AuthServ.verify_token(tokens[number % len(tokens)])
+        except HTTPException:
+            pass
+
+
+def _set_memo(enabled: bool) -> None:
+    for cache, size in ((auth_service.verified_tokens, 10000), (auth_service.rejected_tokens, 1000)):
+        cache.clear()
+        cache.max_size = size if enabled else 0
+
+
+async def main(calls: int, users: int) -> None:
+    # every rejected token is logged at ERROR, the forged-token runs would time the log handler
+    quiet_logging(logging.ERROR)
+    valid = [await AuthServ.issue_email_verify_token(user_id, TypeTokensEnum.access) for user_id in range(users)]
+    forged = [token[:-4] + ("AAAA" if not token.endswith("AAAA") else "BBBB") for token in valid]
+
+    for enabled in (False, True):
+        _set_memo(enabled)
+        label = "memo" if enabled else "no memo"
+        with timer(f"verify valid tokens, {label}", calls):
+            _verify_all(valid, calls)
+        with timer(f"verify forged tokens, {label}", calls):
+            _verify_all(forged, calls)
+    print(f"verified cache: {auth_service.verified_tokens.stats()}")
+    print(f"rejected cache: {auth_service.rejected_tokens.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.users))
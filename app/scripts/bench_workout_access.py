@@ -0,0 +1,105 @@
+"""
+Visibility checks of workouts shared through groups, 10k groups x 100 members by default: the previous
+nested EXISTS over groups and association_group_members versus one lookup in workout_access, for opening
+a workout and for listing a member's workouts.
+
+    cd app && python -m scripts.bench_workout_access --groups 10000 --members 100 --users 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import insert, or_, select
+
+from db.models import GroupMemberModel, GroupModel, UserModel, WorkoutAccessModel, WorkoutModel
+from repositories.workout_access_repository import WorkoutAccessRepository
+from scripts.bench_utils import describe_latency, make_sessionmaker, make_sqlite_engine, quiet_logging, timer
+
+
+async def _load(session_maker, groups: int, members: int, users: int, batch: int = 50000) -> None:
+    rng = random.Random(7)
+    async with session_maker() as session:
+        await session.execute(insert(UserModel.__table__), [
+            {"email": f"user{number}@example.com", "password_hash": "x", "is_admin": False, "is_active": True,
+             "is_confirmed": True, "plan": "free", "token_generation": 0}
+            for number in range(users)
+        ])
+        await session.execute(insert(WorkoutModel.__table__), [
+            {"title": f"workout {number}", "user_id": 1 + number % users} for number in range(groups)
+        ])
+        await session.execute(insert(GroupModel.__table__), [
+            {"name": f"group {number}", "user_id": 1 + number % users, "workout_id": 1 + number}
+            for number in range(groups)
+        ])
+        rows = []
+        for group_id in range(1, groups + 1):
+            rows.extend({"group_id": group_id, "user_id": user_id}
+                        for user_id in rng.sample(range(1, users + 1), members))
+            if len(rows) >= batch or group_id == groups:
+                await session.execute(insert(GroupMemberModel.__table__), rows)
+                rows = []
+        await session.commit()
+        await WorkoutAccessRepository(session).rebuild(chunk_size=1000)
+
+
+def _nested(user_id: int):
+    return WorkoutModel.groups.any(GroupModel.members.any(GroupMemberModel.user_id == user_id))
+
+
+async def _measure(session_maker, statements, repeats: int) -> list[float]:
+    samples = []
+    async with session_maker() as session:
+        for _ in range(repeats):
+            for stmt in statements:
+                started = time.perf_counter()
+                (await session.execute(stmt)).all()
+                samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def main(groups: int, members: int, users: int, probes: int, repeats: int) -> None:
+    quiet_logging()
+    path = os.path.join(tempfile.mkdtemp(), "workout_access.db")
+    engine = await make_sqlite_engine(f"sqlite+aiosqlite:///{path}")
+    session_maker = make_sessionmaker(engine)
+    with timer(f"load {groups} groups x {members} members", groups * members):
+        await _load(session_maker, groups, members, users)
+
+    async with session_maker() as session:
+        pairs = (await session.execute(
+            select(WorkoutAccessModel.user_id, WorkoutAccessModel.workout_id).order_by(WorkoutAccessModel.id)
+            .limit(probes * 50))).all()[::50]
+        access = WorkoutAccessRepository(session)
+    for label, visible in (
+        ("nested exists", lambda user_id, workout_id: _nested(user_id)),
+        ("workout_access", lambda user_id, workout_id: access.has_access(user_id, workout_id)),
+    ):
+        opened = [select(WorkoutModel.id).where(WorkoutModel.id == workout_id,
+                                                or_(WorkoutModel.user_id == user_id, visible(user_id, workout_id)))
+                  for user_id, workout_id in pairs]
+        describe_latency(f"{label}, open", await _measure(session_maker, opened, repeats))
+    for label, visible in (
+        ("nested exists", _nested),
+        ("workout_access", lambda user_id: WorkoutModel.id.in_(access.accessible_workout_ids(user_id))),
+    ):
+        listed = [select(WorkoutModel.id).where(or_(WorkoutModel.user_id == user_id, visible(user_id)))
+                  .order_by(WorkoutModel.created_at, WorkoutModel.id).limit(20)
+                  for user_id, _ in pairs]
+        describe_latency(f"{label}, list", await _measure(session_maker, listed, repeats))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=10_000)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--probes", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    if args.members > args.users:
+        parser.error("--members must not exceed --users")
+    asyncio.run(main(args.groups, args.members, args.users, args.probes, args.repeats))
@@ -0,0 +1,17 @@
+"""
+Recreate workout_access from group memberships, e.g. after restoring groups from a backup
+or to pick up memberships changed while the migration backfilled the table.
+
+    cd app && python -m scripts.rebuild_workout_access --chunk-size 1000
+"""
+import argparse
+import asyncio
+
+from core.config import settings
+from tasks.maintenance_tasks import _rebuild_workout_access
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunk-size", type=int, default=settings.WORKOUT_ACCESS_REBUILD_CHUNK_SIZE)
+    args = parser.parse_args()
+    print(f"granted {asyncio.run(_rebuild_workout_access(args.chunk_size))} workout accesses")
@@ -1,7 +1,7 @@
 import logging
+import uuid
 from datetime import datetime, timedelta, timezone
 
-import bcrypt
 import jwt
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer, HTTPAuthorizationCredentials, HTTPBearer
@@ -10,12 +10,16 @@ from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.config import settings
+from core.password_hasher import password_hasher
+from core.token_generations import token_generations
 
 from db.models import UserModel
 from db.models.enums import TypeTokensEnum
 from db.schemas.auth_schema import PayloadToken
+from db.schemas.user_schema import UserAdminGetModelSchema, UserPrincipalSchema
 from services.base_services import BaseServices
 from utils.raises import _unauthorized
+from utils.ttl_cache import TTLCache
 
 pwd_context = CryptContext(
     schemes=["bcrypt"],
@@ -26,22 +30,34 @@ security_bearer = HTTPBearer(auto_error=False)
 
 logger = logging.getLogger(__name__)
 
+# verified payloads by raw token, each kept until its token_limit_verify;
+# rejected tokens sit in their own short-lived cache so a token spray cannot evict the valid ones
+verified_tokens = TTLCache(settings.JWT_VERIFY_CACHE_MAX_SIZE, settings.JWT_VERIFY_CACHE_TTL_SEC)
+rejected_tokens = TTLCache(settings.JWT_VERIFY_NEGATIVE_MAX_SIZE, settings.JWT_VERIFY_NEGATIVE_TTL_SEC)
+
 
 class AuthServ(BaseServices):
     def __init__(self, session: AsyncSession):
         super().__init__()
 
     @staticmethod
-    async def issue_email_verify_token(user_id: int, type_token: TypeTokensEnum = TypeTokensEnum.email_verify) -> str:
+    async def issue_email_verify_token(user_id: int, type_token: TypeTokensEnum = TypeTokensEnum.email_verify,
+                                       token_generation: int | None = None,
+                                       principal: UserAdminGetModelSchema | None = None) -> str:
         logger.info("Issue email verify token")
         now = datetime.now(timezone.utc)
+        # only what authorization needs: the claim is readable by anyone who sees the token
+        claim = UserPrincipalSchema.model_validate(principal).model_dump_json() if principal is not None else None
         payload = PayloadToken(
             token_limit_verify=int((now + timedelta(minutes=settings.VERIFY_TOKEN_TTL_MIN)).timestamp()),
             time_now=int(now.timestamp()),
             user_id=user_id,
-            type=type_token.name)
+            type=type_token.name,
+            token_generation=token_generation,
+            jti=uuid.uuid4().hex if type_token == TypeTokensEnum.access else None,
+            principal=claim)
 
-        return jwt.encode(payload.model_dump(), settings.JWT_SECRET, algorithm=settings.JWT_ALG)
+        return jwt.encode(payload.model_dump(exclude_none=True), settings.JWT_SECRET, algorithm=settings.JWT_ALG)
 
     @staticmethod
     async def check_active_and_confirmed_user(user: UserModel) -> bool | HTTPException:
@@ -66,12 +82,11 @@ class AuthServ(BaseServices):
 
     @staticmethod
     async def hash_password(plain: str) -> str:
-        salt = bcrypt.gensalt(rounds=12)
-        return bcrypt.hashpw(plain.encode(), salt).decode()
+        return await password_hasher.hash(plain)
 
     @staticmethod
     async def verify_password(plain: str, hashed: str) -> bool:
-        return bcrypt.checkpw(plain.encode(), hashed.encode())
+        return await password_hasher.verify(plain, hashed)
 
     @staticmethod
     async def get_bearer_token(
@@ -87,11 +102,17 @@ class AuthServ(BaseServices):
     async def refresh_token(payload: PayloadToken, user_id: int):
         if payload.token_limit_verify - datetime.now(timezone.utc).timestamp() < 0:
             return await AuthServ.issue_email_verify_token(user_id, TypeTokensEnum.access)
-        return jwt.encode(payload.model_dump(), settings.JWT_SECRET, algorithm=settings.JWT_ALG)
+        return jwt.encode(payload.model_dump(exclude_none=True), settings.JWT_SECRET, algorithm=settings.JWT_ALG)
 
     @staticmethod
     def verify_token(raw_token: str) -> PayloadToken:
         logger.info("verify token")
+        payload = verified_tokens.get(raw_token)
+        if payload is not None:
+            return payload
+        rejected = rejected_tokens.get(raw_token)
+        if rejected is not None:
+            raise _unauthorized(rejected)
         try:
             payload = jwt.decode(
                 raw_token,
@@ -100,13 +121,54 @@ class AuthServ(BaseServices):
             )
         except ExpiredSignatureError:
             logger.error("Token expired")
+            rejected_tokens.set(raw_token, "Token expired")
             raise _unauthorized("Token expired")
         except InvalidSignatureError:
             logger.error("Invalid signature")
+            rejected_tokens.set(raw_token, "Invalid signature")
             raise _unauthorized("Invalid signature")
         except InvalidTokenError:
             logger.error("Invalid token")
+            rejected_tokens.set(raw_token, "Invalid token")
             raise _unauthorized("Invalid token")
         payload = PayloadToken(**payload)
         logger.info("Payload Token")
+        verified_tokens.set(raw_token, payload, payload.token_limit_verify - datetime.now(timezone.utc).timestamp())
         return payload
+
+    @staticmethod
+    def verify_stateless_token(raw_token: str) -> PayloadToken | None:
+        """
+        Verify an access token without the database: signature, lifetime and token_generation claim.
+        Returns None while this worker has not loaded the generation map yet, the caller falls back to the DB.
+        """
+        payload = AuthServ.verify_token(raw_token)
+        current_generation = token_generations.get(payload.user_id)
+        if current_generation is None:
+            return None
+        if payload.type != TypeTokensEnum.access.name or payload.token_generation is None:
+            logger.error("Not a stateless access token")
+            raise _unauthorized("Token is not valid")
+        if payload.token_generation < current_generation or token_generations.revoked(payload.user_id):
+            logger.error("Token revoked")
+            raise _unauthorized("Token revoked")
+        if payload.token_limit_verify - datetime.now(timezone.utc).timestamp() < 0:
+            logger.error("Token timed out")
+            raise _unauthorized("Token timed out")
+        return payload
+
+    @staticmethod
+    def stateless_principal(payload: PayloadToken) -> UserPrincipalSchema | None:
+        """
+        The user a verified stateless token was issued to, from its principal claim. None when the
+        token has no claim or the user's row changed after the snapshot; the caller reads the row then.
+        """
+        if payload.principal is None:
+            return None
+        principal = UserPrincipalSchema.model_validate_json(payload.principal)
+        if principal.id != payload.user_id:
+            raise _unauthorized("Token is not valid")
+        if token_generations.changed_since(payload.user_id, principal.updated_at):
+            return None
+        token_generations.trust(payload.user_id)
+        return principal
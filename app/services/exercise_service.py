@@ -5,11 +5,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.s3_cloud_connector import S3CloudConnector
 from db.models import ExerciseModel
+from db.models.enums import CounterKind
 from db.schemas.exercise_schema import CreateExerciseSchema, ExercisePage, PageMeta, UpdateExerciseSchema
 from repositories.exercise_repositories import ExerciseRepository
 from repositories.user_repository import UserRepository
 from services.base_services import BaseServices
 from utils.context import get_current_user
+from utils.pagination import capped_total, decode_cursor, next_cursor
 
 
 class ExerciseServices(BaseServices):
@@ -19,15 +21,18 @@ class ExerciseServices(BaseServices):
         self.repo_user = UserRepository(session)
         self.s3 = S3CloudConnector()
 
-    async def get_exercises(self, limit: int, start: int, user_id: int) -> ExercisePage:
+    async def get_exercises(self, limit: int, start: int, user_id: int, cursor: str | None = None) -> ExercisePage:
         self.log.info("Try get exercises")
+        after = decode_cursor(cursor) if cursor else None
         exercises, total = await self.repo.get_all_exercise_user(
-            BaseServices.check_permission(get_current_user(), user_id), limit, start)
+            BaseServices.check_permission(get_current_user(), user_id), limit, start, after)
         self.log.info("exercises %s", exercises)
         self.log.info("total %s", total)
-        pages = ceil(total / limit) if limit else 1
+        total, total_capped = capped_total(total)
+        pages = (ceil(total / limit) if limit else 1) if total is not None else None
         return ExercisePage(
-            meta=PageMeta(total=total, limit=limit, pages=pages),
+            meta=PageMeta(total=total, limit=limit, pages=pages, total_capped=total_capped,
+                          next_cursor=next_cursor(exercises, limit)),
             exercises=exercises,
         )
 
@@ -38,15 +43,24 @@ class ExerciseServices(BaseServices):
     async def create_exercise(self, payload: CreateExerciseSchema, file: UploadFile,
                               user_id: int | None = None) -> ExerciseModel:
         self.log.info("add_exercise")
-        user = await self.repo_user.find_user_id(BaseServices.check_permission(get_current_user(), user_id), False)
+        user = await self.repo_user.find_user_id(BaseServices.check_permission(get_current_user(), user_id))
         user_id = user_id if user_id is not None else user.id
-        user.check_reached_limit_exercises(await self.repo.get_count_exercise_user(user_id))
+        user.check_reached_limit_exercises(
+            await self.repo.counters.reserve(user_id, CounterKind.exercises, user.plan_limit(CounterKind.exercises)))
         payload._user_id = user_id
         new_exercise = await self.repo.create_one_obj_model(payload.model_dump())
         self.log.info("New exercise %s", new_exercise)
         self.log.info("Try upload file")
-        link_exercise = await self.s3.upload_upload_file(self.s3.bucket, new_exercise.get_media_url_path(file), file,
-                                                         True)
+        await self.repo.release_connection()
+        try:
+            link_exercise = await self.s3.upload_upload_file(self.s3.bucket, new_exercise.get_media_url_path(file),
+                                                             file, True)
+        except Exception:
+            # the row and its counter slot were committed before the upload, the failed request takes them back
+            self.log.warning("Upload failed, remove exercise id %s", new_exercise.id)
+            await self.repo.remove_exercise_id(new_exercise.id)
+            await self.repo.release_connection()
+            raise
         self.log.info("link exercise %s", link_exercise)
         new_exercise = await self.repo.update_link_exercise(new_exercise.id, link_exercise)
         self.log.info("New exercise %s", new_exercise)
@@ -69,10 +83,12 @@ class ExerciseServices(BaseServices):
         self.log.info("old link %s", link_for_remove)
         name_key_file = exercise.get_media_url_path(file)
         self.log.info("name key file %s", name_key_file)
+        await self.repo.release_connection()
         link_exercise = await self.s3.upload_upload_file(self.s3.bucket, name_key_file, file, True)
         self.log.info("new link exercise %s", link_exercise)
         new_exercise = await self.repo.update_link_exercise(exercise_id, link_exercise)
         if link_for_remove != name_key_file and link_for_remove is not None:
+            await self.repo.release_connection()
             await self.s3.remove_file_url(self.s3.bucket, new_exercise.get_key(link_for_remove))
         return new_exercise
 
@@ -81,6 +97,7 @@ class ExerciseServices(BaseServices):
         exercise = await self.repo.get_by_id(get_current_user().id, exercise_id, get_current_user().is_admin)
         self.log.info("exercise %s", exercise)
         self.log.info("remove file url")
+        await self.repo.release_connection()
         await self.s3.remove_file_url(self.s3.bucket, exercise.get_key_media_url_path_old())
         self.log.info("remove exercise id")
         await self.repo.remove_exercise_id(exercise_id)
@@ -4,6 +4,7 @@ from typing import List
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.models import GroupModel
+from db.models.enums import CounterKind
 from db.schemas.group_schema import GroupCreateSchema, GroupPage, GroupMembersAddSchema
 from db.schemas.paginate_schema import PageMeta
 
@@ -12,7 +13,8 @@ from repositories.user_repository import UserRepository
 from repositories.workout_repositories import WorkoutRepository
 from services.base_services import BaseServices
 from utils.context import get_current_user
-from utils.raises import _forbidden
+from utils.pagination import capped_total, decode_cursor, next_cursor
+from utils.raises import _forbidden, _not_found
 
 
 class GroupServices(BaseServices):
@@ -24,22 +26,26 @@ class GroupServices(BaseServices):
 
     async def create_group(self, group_schema: GroupCreateSchema, user_id: int | None, ):
         self.log.info("create group")
-        user = await self.repo_user.find_user_id(BaseServices.check_permission(get_current_user(), user_id), False)
-        user.check_reached_limit_group(await self.repo.get_groups_user_count(user.id))
+        user = await self.repo_user.find_user_id(BaseServices.check_permission(get_current_user(), user_id))
+        user.check_reached_limit_group(
+            await self.repo.counters.reserve(user.id, CounterKind.groups, user.plan_limit(CounterKind.groups)))
         group_schema._user_id = user.id
         return await self.repo.create_one_obj_model(group_schema.model_dump())
 
     async def rename_group(self, group_id: int, group_name: str) -> GroupModel:
         self.log.info("rename group")
-        group = await self.repo.find_group_by_id(group_id, get_current_user().id, get_current_user().is_admin)
-        await self.repo.rename_group(group_name, group_id)
-        return await self.repo.get_group_user_by_id(group_id, group.user_id)
+        user = get_current_user()
+        # the owner filter of the UPDATE is the permission check, RETURNING hands back the renamed row
+        group = await self.repo.rename_group(group_name, group_id, None if user.is_admin else user.id)
+        if group is None:
+            raise _not_found("Group not found")
+        return group
 
     async def add_members_in_group(self, id_group: int, members_schema: List[GroupMembersAddSchema],
                                    user_id: int | None):
         self.log.info("add members in group")
         list_members_id = {member.user_id for member in members_schema}
-        user = await self.repo_user.find_user_id(BaseServices.check_permission(get_current_user(), user_id), False)
+        user = await self.repo_user.find_user_id(BaseServices.check_permission(get_current_user(), user_id))
         group = await self.repo.get_group_by_id_with_full_relation(id_group, user.id, get_current_user().is_admin)
         user.check_reached_limit_group(len(group.members))
         if list_members_id & {member.id for member in group.members if member is not None}:
@@ -51,19 +57,23 @@ class GroupServices(BaseServices):
 
     async def add_workout_in_group(self, group_id: int, id_workout: int, user_id: int | None):
         self.log.info("add workout in group")
-        user = await self.repo_user.find_user_id(BaseServices.check_permission(get_current_user(), user_id), False)
+        user = await self.repo_user.find_user_id(BaseServices.check_permission(get_current_user(), user_id))
         await self.workout_repo.get_workout_for_user(id_workout, user.id, get_current_user().is_admin)
         await self.repo.find_group_by_id(group_id, user.id, get_current_user().is_admin)
         return await self.repo.update_workout_in_group(group_id, id_workout, user.id)
 
-    async def get_groups_user(self, limit: int, start: int, user_id: int | None, ) -> GroupPage:
+    async def get_groups_user(self, limit: int, start: int, user_id: int | None,
+                              cursor: str | None = None) -> GroupPage:
         self.log.info("get groups user")
+        after = decode_cursor(cursor) if cursor else None
         groups, total = await self.repo.get_groups_user(BaseServices.check_permission(get_current_user(), user_id),
-                                                        limit, start)
-        pages = ceil(total / limit) if limit else 1
+                                                        limit, start, after)
+        total, total_capped = capped_total(total)
+        pages = (ceil(total / limit) if limit else 1) if total is not None else None
         return GroupPage(
             groups=groups,
-            meta=PageMeta(total=total, limit=limit, pages=pages),
+            meta=PageMeta(total=total, limit=limit, pages=pages, total_capped=total_capped,
+                          next_cursor=next_cursor(groups, limit)),
         )
 
     async def get_group_by_id(self, id_group: int) -> GroupModel:
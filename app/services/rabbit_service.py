@@ -7,6 +7,8 @@ from aio_pika import Message, DeliveryMode, RobustConnection
 from aio_pika.abc import AbstractIncomingMessage, AbstractChannel, AbstractQueue
 from fastapi.encoders import jsonable_encoder
 
+from core.metrics import track_external
+
 Handler = Callable[[bytes], Awaitable[None]] | Callable[[bytes], None]
 
 
@@ -52,7 +54,8 @@ class RabbitClientStateless:
                 body=body,
                 delivery_mode=DeliveryMode.PERSISTENT if persistent else DeliveryMode.NOT_PERSISTENT,
             )
-            await chan.default_exchange.publish(msg, routing_key=q.name)
+            with track_external("rabbitmq", "publish"):
+                await chan.default_exchange.publish(msg, routing_key=q.name)
         finally:
             await chan.close()
             await conn.close()
@@ -70,7 +73,8 @@ class RabbitClientStateless:
                 content_type="application/json",
                 content_encoding="utf-8",
             )
-            await chan.default_exchange.publish(msg, routing_key=q.name)
+            with track_external("rabbitmq", "publish"):
+                await chan.default_exchange.publish(msg, routing_key=q.name)
         finally:
             await chan.close()
             await conn.close()
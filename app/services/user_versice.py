@@ -3,12 +3,16 @@ from datetime import datetime, timezone
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.config import settings
+from core.session_store import session_store
+from core.token_generations import token_generations
 from db.models.enums import TypeTokensEnum
 from db.schemas.auth_schema import TokenResponse
 from repositories.user_repository import UserRepository
 from db.models import UserModel
 from db.schemas.qeue_schemas import QeueSignupUserSchema
-from db.schemas.user_schema import UserRegisterSchema, UserPostModelUpdateSchema, UserAdminPutModelSchema
+from db.schemas.user_schema import UserRegisterSchema, UserPostModelUpdateSchema, UserAdminPutModelSchema, \
+    UserAdminGetModelSchema
 from services.auth_service import AuthServ
 
 from services.base_services import BaseServices
@@ -26,14 +30,16 @@ class UserServices(BaseServices):
         self.log.info("create_user")
         find_user = await self.repo.find_user_email(user.email)
         if find_user is None:
+            await self.repo.release_connection()
             user.password_hash = await AuthServ.hash_password(user.password_hash)
             user_dict = user.model_dump()
             user = await self.repo.create_one_obj_model(user_dict)
             token = await AuthServ.issue_email_verify_token(user.id, TypeTokensEnum.email_verify)
             self.log.info("Create token for registration ", )
             data = QeueSignupUserSchema(token=token, email_to=user.email, subject="Подтверждение e-mail", )
-            celery_app.send_task(name='tasks.email_tasks.send_signup_email_task', args=(data.model_dump(),),
-                                 queue="test_queues")
+            # no mail for a signup that is rolled back
+            await self.repo.on_commit(lambda: celery_app.send_task(
+                name='tasks.email_tasks.send_signup_email_task', args=(data.model_dump(),), queue="test_queues"))
             return True
         raise _conflict(f"User with email: {user.email} exists")
 
@@ -55,18 +61,16 @@ class UserServices(BaseServices):
             self.log.warning("User not found")
             raise HTTPException(status_code=404, detail="User not found")
         self.log.info("Find user email %s ", user_email)
+        await self.repo.release_connection()
         if not await AuthServ.verify_password(user_password_hash, user_db.password_hash):
             self.log.warn("Wrong password")
             raise _forbidden("Wrong password")
         if await AuthServ.check_active_and_confirmed_user(user_db):
-            if user_db.token is not None:
-                payload = AuthServ.verify_token(user_db.token.token)
-                if payload.token_limit_verify - datetime.now(timezone.utc).timestamp() < 0:
-                    return await self.repo.update_token_user(
-                        await AuthServ.issue_email_verify_token(user_db.id, TypeTokensEnum.access), user_db.id)
-                return user_db.token.token
-            return await self.repo.add_token_user(
-                await AuthServ.issue_email_verify_token(user_db.id, TypeTokensEnum.access), user_db.id)
+            # every login is its own session, older devices stay signed in up to MAX_SESSIONS_PER_USER
+            principal = UserAdminGetModelSchema.model_validate(user_db)
+            token = await self.add_session(user_db.id, user_db.token_generation, principal)
+            await self.remember_session(token, principal)
+            return token
         raise _unauthorized("User is not active")
 
     async def update_user_profile(self, user_schema: UserPostModelUpdateSchema, user_id: int):
@@ -74,6 +78,7 @@ class UserServices(BaseServices):
         update_user = await self.repo.update_user(user_schema.model_dump(), user_id)
         if update_user is not None:
             self.log.info("update user %s", update_user)
+            await self.mark_principal_changed(update_user)
             return update_user
         self.log.warning("User not found")
         raise HTTPException(status_code=404, detail="User not found")
@@ -89,6 +94,7 @@ class UserServices(BaseServices):
             self.log.warning("User not found")
             raise _not_found("User not found")
         self.log.info("user", update_user.email)
+        await self.mark_principal_changed(update_user)
         return update_user
 
     async def find_user(self, user_id: int) -> UserModel:
@@ -99,13 +105,60 @@ class UserServices(BaseServices):
         self.log.info("remove_user")
         if await self.repo.remove_user_id(user_id):
             self.log.info("User remove")
+            await self.mark_user_deleted(user_id)
             return _ok("User remove")
         else:
             self.log.warning("User not remove")
             return _bad_request("User not remove")
 
-    async def refresh_token(self) -> TokenResponse:
+    async def refresh_token(self, raw_token: str) -> TokenResponse:
+        """Replace the session of raw_token, the other devices of the user stay signed in."""
         current_user = get_current_user()
-        await self.repo.remove_token_user(current_user.id)
-        token: str = await AuthServ.issue_email_verify_token(current_user.id, TypeTokensEnum.access)
-        return TokenResponse(access_token=await self.repo.add_token_user(token, current_user.id))
+        await self.repo.remove_token_user(current_user.id, raw_token)
+        token_generation = None
+        if settings.AUTH_STATELESS_TOKENS:
+            # not a revocation: the new token joins the other devices at the current generation
+            user = await self.repo.find_user_id(current_user.id)
+            token_generation = user.token_generation
+            current_user = UserAdminGetModelSchema.model_validate(user)
+        token = await self.add_session(current_user.id, token_generation, current_user)
+        await self.remember_session(token, current_user)
+        return TokenResponse(access_token=token)
+
+    async def add_session(self, user_id: int, token_generation: int | None,
+                          principal: UserAdminGetModelSchema | None = None) -> str:
+        """New session row; stateless access tokens also carry the principal as a claim."""
+        if not settings.AUTH_STATELESS_TOKENS:
+            principal = None
+        token = await AuthServ.issue_email_verify_token(user_id, TypeTokensEnum.access, token_generation, principal)
+        expires_at = datetime.fromtimestamp(AuthServ.verify_token(token).token_limit_verify, timezone.utc)
+        return await self.repo.add_token_user(token, user_id, expires_at)
+
+    async def revoke_stateless_tokens(self, user_id: int) -> int:
+        """Every stateless token of the user stops verifying: logout from all devices, a password change."""
+        self.log.info("revoke stateless tokens user id %s", user_id)
+        token_generation = await self.repo.bump_token_generation(user_id)
+        await self.repo.on_commit(lambda: token_generations.set(user_id, token_generation))
+        return token_generation
+
+    async def mark_principal_changed(self, user: UserModel) -> None:
+        """This worker stops trusting principal claims of the user at once, the others on their next refresh."""
+        if settings.AUTH_STATELESS_TOKENS:
+            user_id, updated_at = user.id, user.updated_at
+            await self.repo.on_commit(lambda: token_generations.touch(user_id, updated_at))
+
+    async def mark_user_deleted(self, user_id: int) -> None:
+        """This worker refuses the user's stateless tokens at once, the others on their next refresh."""
+        if settings.AUTH_STATELESS_TOKENS:
+            await self.repo.on_commit(lambda: token_generations.revoke(user_id))
+
+    async def remember_session(self, token: str, user: UserAdminGetModelSchema) -> None:
+        """
+        Store the session snapshot once the token row is committed, after any invalidation the
+        request queued, so neither a rolled back token nor a deleted snapshot ends up in Redis.
+        """
+        if not session_store.enabled:
+            return
+        self.log.info("remember session user id %s", user.id)
+        token_limit_verify = AuthServ.verify_token(token).token_limit_verify
+        await self.repo.on_commit(lambda: session_store.put(token, user, token_limit_verify))
@@ -3,13 +3,17 @@ from math import ceil
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.models import WorkoutModel
+from db.models.enums import CounterKind
 from db.schemas.paginate_schema import PageMeta
-from db.schemas.workout_schema import WorkoutCreateSchema, WorkoutExerciseCreateSchema, WorkoutPage
+from db.schemas.workout_schema import (
+    WorkoutCreateSchema, WorkoutExerciseCreateSchema, WorkoutInsertOperation, WorkoutPage, WorkoutPatchSchema,
+)
 from repositories.exercise_repositories import ExerciseRepository
 from repositories.user_repository import UserRepository
 from repositories.workout_repositories import WorkoutRepository
 from services.base_services import BaseServices
 from utils.context import get_current_user
+from utils.pagination import capped_total, decode_cursor, next_cursor
 from utils.workout_utils import get_list_set_exercises_schema, check_belonging_exercise_on_user
 
 
@@ -20,17 +24,20 @@ class WorkoutServices(BaseServices):
         self.repo_exercise = ExerciseRepository(session)
         self.repo_user = UserRepository(session)
 
-    async def get_workouts(self, limit: int, start: int, user_id: int = None):
+    async def get_workouts(self, limit: int, start: int, user_id: int = None, cursor: str | None = None):
         self.log.info("Try get all workouts repo")
+        after = decode_cursor(cursor) if cursor else None
         workouts, total = await self.repo_workout.get_all_workouts(
-            BaseServices.check_permission(get_current_user(), user_id), limit, start)
+            BaseServices.check_permission(get_current_user(), user_id), limit, start, after)
         self.log.info("workouts %s", workouts)
         self.log.info("total %s", total)
-        pages = ceil(total / limit) - 1 if limit else 1
+        total, total_capped = capped_total(total)
+        pages = (ceil(total / limit) - 1 if limit else 1) if total is not None else None
         self.log.info("pages %s", pages)
         return WorkoutPage(
             workouts=workouts,
-            meta=PageMeta(total=total, limit=limit, pages=pages),
+            meta=PageMeta(total=total, limit=limit, pages=pages, total_capped=total_capped,
+                          next_cursor=next_cursor(workouts, limit)),
         )
 
     async def get_workout_id(self, workout_id: int) -> WorkoutModel:
@@ -50,13 +57,30 @@ class WorkoutServices(BaseServices):
         result_workout = await self.repo_workout.update_workout(workout_id, workout.user_id, workout_schema)
         return await self.get_workout_id(result_workout.id)
 
+    async def patch_workout(self, workout_id: int, patch_schema: WorkoutPatchSchema) -> WorkoutModel:
+        self.log.info("patch_workout")
+        workout = await self.repo_workout.get_workout_for_user(workout_id, get_current_user().id,
+                                                               get_current_user().is_admin)
+        list_id_exercise = list({operation.exercise_id for operation in patch_schema.operations
+                                 if isinstance(operation, WorkoutInsertOperation)})
+        if list_id_exercise:
+            count_self_exercise = await self.repo_exercise.find_count_self_exercise(workout.user_id,
+                                                                                    list_id_exercise)
+            await check_belonging_exercise_on_user(count_self_exercise, list_id_exercise)
+        await self.repo_workout.patch_workout(workout, patch_schema.version, patch_schema.operations)
+        return await self.get_workout_id(workout_id)
+
     async def create_workout(self, workout_schema: WorkoutExerciseCreateSchema, user_id: int = None) -> WorkoutModel:
         self.log.info("create_workout")
         user = await self.repo_user.find_user_id(BaseServices.check_permission(get_current_user(), user_id))
-        user.check_reached_limit_workouts(await self.repo_workout.get_workout_count(user_id))
+        user_id = user.id
         list_id_exercise = await get_list_set_exercises_schema(workout_schema.exercises)
         count_self_exercise = await self.repo_exercise.find_count_self_exercise(user_id, list_id_exercise)
         await check_belonging_exercise_on_user(count_self_exercise, list_id_exercise)
+        # the counter row stays locked until add_workout commits, so reserve last
+        count_workouts = await self.repo_workout.counters.reserve(user_id, CounterKind.workouts,
+                                                                  user.plan_limit(CounterKind.workouts))
+        user.check_reached_limit_workouts(count_workouts)
         result_workout = await self.repo_workout.add_workout(workout_schema.workout.model_dump(),
                                                              workout_schema.exercises,
                                                              user_id)
@@ -0,0 +1,53 @@
+import asyncio
+
+from celery import shared_task
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from core.config import settings
+from repositories.user_counter_repository import UserCounterRepository
+from repositories.user_repository import UserRepository
+from repositories.workout_access_repository import WorkoutAccessRepository
+
+
+async def _purge_expired_tokens(chunk_size: int) -> int:
+    # every task run gets its own event loop, so no pooled connections are carried across runs
+    engine = create_async_engine(settings.POSTGRES_URL, poolclass=NullPool)
+    try:
+        async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+            return await UserRepository(session).purge_expired_tokens(chunk_size)
+    finally:
+        await engine.dispose()
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 3})
+def purge_expired_tokens_task(self, chunk_size: int = settings.TOKEN_PURGE_CHUNK_SIZE) -> int:
+    return asyncio.run(_purge_expired_tokens(chunk_size))
+
+
+async def _reconcile_user_counters(chunk_size: int) -> int:
+    engine = create_async_engine(settings.POSTGRES_URL, poolclass=NullPool)
+    try:
+        async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+            return await UserCounterRepository(session).reconcile(chunk_size)
+    finally:
+        await engine.dispose()
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 3})
+def reconcile_user_counters_task(self, chunk_size: int = settings.COUNTER_RECONCILE_CHUNK_SIZE) -> int:
+    return asyncio.run(_reconcile_user_counters(chunk_size))
+
+
+async def _rebuild_workout_access(chunk_size: int) -> int:
+    engine = create_async_engine(settings.POSTGRES_URL, poolclass=NullPool)
+    try:
+        async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+            return await WorkoutAccessRepository(session).rebuild(chunk_size)
+    finally:
+        await engine.dispose()
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 3})
+def rebuild_workout_access_task(self, chunk_size: int = settings.WORKOUT_ACCESS_REBUILD_CHUNK_SIZE) -> int:
+    return asyncio.run(_rebuild_workout_access(chunk_size))
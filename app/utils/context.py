@@ -27,3 +27,7 @@ def get_current_user() -> UserAdminGetModelSchema:
     if user is None:
         raise _unauthorized("No current user")
     return user
+
+
+def get_current_user_or_none() -> Optional[UserAdminGetModelSchema]:
+    return _current_user.get()
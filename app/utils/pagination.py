@@ -0,0 +1,40 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from core.config import settings
+from utils.raises import _bad_request
+
+# position of a row in a (created_at, id) ordered listing
+Cursor = tuple[datetime, int]
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise _bad_request("Invalid cursor")
+
+
+def next_cursor(items: Sequence[Any], limit: int) -> Optional[str]:
+    """Cursor after the last row of a full page; a shorter page is the last one."""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(last.created_at, last.id)
+
+
+def capped_total(total: Optional[int]) -> tuple[Optional[int], bool]:
+    """A total counted up to PAGE_TOTAL_CAP + 1 rows, as (total to report, whether there are more than that)."""
+    cap = settings.PAGE_TOTAL_CAP
+    if total is None or cap is None or total <= cap:
+        return total, False
+    return cap, True
@@ -28,3 +28,15 @@ def _ok(detail: str = "OK"):
 
 def _conflict(detail: str = "Conflict"):
     return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+
+def _payload_too_large(detail: str = "Request body too large"):
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+
+def _service_unavailable(detail: str = "Service unavailable", retry_after: int = 1):
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(retry_after)},
+    )
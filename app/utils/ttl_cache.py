@@ -0,0 +1,84 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Bounded LRU mapping where every entry also has its own expiry.
+    Not thread safe: it is meant to live inside one event loop of one worker.
+    """
+
+    def __init__(
+            self,
+            max_size: int,
+            ttl_sec: float,
+            *,
+            on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl_sec = ttl_sec
+        self.on_evict = on_evict
+        self.clock = clock
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_sec > 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at <= self.clock():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_sec: Optional[float] = None) -> bool:
+        if not self.enabled:
+            return False
+        ttl = self.ttl_sec if ttl_sec is None else min(ttl_sec, self.ttl_sec)
+        if ttl <= 0:
+            return False
+        self._data[key] = (self.clock() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            old_key, (_, old_value) = self._data.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(old_key, old_value)
+        return True
+
+    def pop(self, key: Hashable) -> Any:
+        item = self._data.pop(key, None)
+        return None if item is None else item[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _drop(self, key: Hashable) -> None:
+        item = self._data.pop(key, None)
+        if item is not None and self.on_evict is not None:
+            self.on_evict(key, item[1])
@@ -1,4 +1,5 @@
-from typing import List
+from collections import defaultdict
+from typing import List, Sequence
 
 from db.schemas.workout_schema import ExerciseCreateSchema
 from utils.raises import _forbidden
@@ -8,6 +9,38 @@ async def get_list_set_exercises_schema(exercise_schemas: List[ExerciseCreateSch
     return list(set([i.exercise_id for i in exercise_schemas]))
 
 
+def diff_workout_exercises(existing: Sequence, exercise_schemas: List[ExerciseCreateSchema]
+                           ) -> tuple[list[int], list[dict], list[dict]]:
+    """
+    What turns the existing association rows (with id, exercise_id, position) into exercise_schemas:
+    (ids to delete, {"id", "position"} to update, {"exercise_id", "position"} to insert). Rows keep their
+    id whenever the exercise stays in the workout; an exercise listed several times is matched by position
+    first, then in order.
+    """
+    rows_by_exercise = defaultdict(list)
+    for row in sorted(existing, key=lambda row: (row.position, row.id)):
+        rows_by_exercise[row.exercise_id].append(row)
+    positions_by_exercise = defaultdict(list)
+    for schema in sorted(exercise_schemas, key=lambda schema: schema.position):
+        positions_by_exercise[schema.exercise_id].append(schema.position)
+
+    to_delete, to_update, to_insert = [], [], []
+    for exercise_id in rows_by_exercise.keys() | positions_by_exercise.keys():
+        rows = rows_by_exercise.get(exercise_id, [])
+        positions = list(positions_by_exercise.get(exercise_id, []))
+        moved = []
+        for row in rows:
+            if row.position in positions:
+                positions.remove(row.position)
+            else:
+                moved.append(row)
+        rows = moved
+        to_update.extend({"id": row.id, "position": position} for row, position in zip(rows, positions))
+        to_delete.extend(row.id for row in rows[len(positions):])
+        to_insert.extend({"exercise_id": exercise_id, "position": position} for position in positions[len(rows):])
+    return to_delete, to_update, to_insert
+
+
 async def check_belonging_exercise_on_user(count_self_exercise: int, list_id_exercise: List[int]):
     if count_self_exercise != len(list_id_exercise):
         raise _forbidden("You do not have the right to use exercise that do not belong to you.")
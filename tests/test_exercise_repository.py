@@ -1,6 +1,12 @@
+from datetime import datetime, timedelta, timezone
+
 import pytest
-from db.models import ExerciseModel, UserModel
+from sqlalchemy import select
+
+from db.models import ExerciseModel, UserModel, WorkoutModel
+from db.models.workout_model import WorkoutExerciseModel
 from repositories.exercise_repositories import ExerciseRepository
+from utils.pagination import decode_cursor, next_cursor
 
 
 @pytest.mark.asyncio
@@ -55,6 +61,35 @@ class TestExerciseRepository:
         assert total == 2
         assert len(items) == 2
 
+    async def test_cursor_pages_are_stable_under_inserts(self, session):
+        repo = ExerciseRepository(session)
+
+        user = UserModel(email="cursor_exercise@example.com", password_hash="123")
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
+
+        base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        # pairs share a created_at, so the id has to break ties
+        session.add_all([ExerciseModel(title=f"E{number}", user_id=user.id, created_at=base + timedelta(minutes=number // 2))
+                         for number in range(7)])
+        await session.commit()
+
+        first, total = await repo.get_all_exercise_user(user.id, limit=3, start=0)
+        assert total == 7
+        session.add(ExerciseModel(title="earlier", user_id=user.id, created_at=base - timedelta(days=1)))
+        await session.commit()
+
+        titles = [item.title for item in first]
+        cursor = next_cursor(first, 3)
+        while cursor is not None:
+            page, total = await repo.get_all_exercise_user(user.id, limit=3, start=0, after=decode_cursor(cursor))
+            assert total is None
+            titles.extend(item.title for item in page)
+            cursor = next_cursor(page, 3)
+
+        assert titles == [f"E{number}" for number in range(7)]
+
     async def test_remove_exercise(self, session):
         repo = ExerciseRepository(session)
 
@@ -71,3 +106,40 @@ class TestExerciseRepository:
         await repo.remove_exercise_id(exercise.id)
         result = await repo.get_by_id(user.id, exercise.id)
         assert result is None
+
+    async def test_remove_exercise_renumbers_every_workout(self, session):
+        repo = ExerciseRepository(session)
+
+        user = UserModel(email="renumber_exercise@example.com", password_hash="123")
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
+
+        removed, kept, other = [ExerciseModel(title=title, user_id=user.id) for title in ("X", "A", "B")]
+        workouts = [WorkoutModel(title=f"W{number}", user_id=user.id) for number in range(3)]
+        session.add_all([removed, kept, other, *workouts])
+        await session.flush()
+        layouts = [
+            [removed, kept, other],
+            [kept, removed, other, removed],
+            # not using the removed exercise: positions stay as they are, gaps included
+            [kept, other],
+        ]
+        for workout, layout in zip(workouts, layouts):
+            session.add_all([WorkoutExerciseModel(workout_id=workout.id, exercise_id=exercise.id, position=position)
+                             for position, exercise in zip((1, 3, 4, 7), layout)])
+        await session.commit()
+
+        await repo.remove_exercise_id(removed.id)
+
+        rows = (await session.execute(
+            select(WorkoutExerciseModel.workout_id, WorkoutExerciseModel.exercise_id, WorkoutExerciseModel.position)
+            .where(WorkoutExerciseModel.workout_id.in_([workout.id for workout in workouts]))
+            .order_by(WorkoutExerciseModel.workout_id, WorkoutExerciseModel.position)
+        )).tuples().all()
+        assert rows == [
+            (workouts[0].id, kept.id, 1), (workouts[0].id, other.id, 2),
+            (workouts[1].id, kept.id, 1), (workouts[1].id, other.id, 2),
+            (workouts[2].id, kept.id, 1), (workouts[2].id, other.id, 3),
+        ]
+        assert await session.get(ExerciseModel, removed.id, populate_existing=True) is None
@@ -2,7 +2,10 @@ import pytest
 from datetime import datetime
 from fastapi import UploadFile
 from io import BytesIO
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from db.base import BaseModel
 from db.models import UserModel, ExerciseModel
 from db.models.user_model import PlanLimits
 from db.schemas.user_schema import UserAdminGetModelSchema
@@ -267,3 +270,38 @@ async def test_remove_exercise_deletes_from_db(service, user, session):
     repo = ExerciseRepository(session)
     exercises, total = await repo.get_all_exercise_user(user.id, limit=10, start=0)
     assert total == 0
+
+
+@pytest.mark.asyncio
+async def test_s3_calls_do_not_hold_a_connection(tmp_path):
+    """Во время загрузки и удаления файлов в S3 соединение возвращено в пул."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'upload.db'}", poolclass=AsyncAdaptedQueuePool)
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseModel.metadata.create_all)
+    checked_out = []
+
+    async def upload(bucket, key, file, public):
+        checked_out.append(engine.sync_engine.pool.checkedout())
+        return f"https://fake-s3.local/{key}"
+
+    async def remove(bucket, key):
+        checked_out.append(engine.sync_engine.pool.checkedout())
+
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        owner = UserModel(email="upload@example.com", password_hash="123", is_active=True, is_confirmed=True)
+        session.add(owner)
+        await session.commit()
+        set_current_user(UserAdminGetModelSchema.model_validate(owner))
+        srv = ExerciseServices(session)
+        srv.s3.upload_upload_file = upload
+        srv.s3.remove_file_url = remove
+
+        created = await srv.create_exercise(CreateExerciseSchema(title="Row", type="strength", description="Back",
+                                                                 time_work=None, repetitions=12, count_sets=3,
+                                                                 rest_sec=60),
+                                            UploadFile(filename="row.mp4", file=BytesIO(b"video")))
+        await srv.update_file_exercise(created.id, UploadFile(filename="row2.mp4", file=BytesIO(b"video")))
+        await srv.remove_exercise_from_all_workout(created.id)
+    await engine.dispose()
+
+    assert checked_out == [0, 0, 0, 0]
@@ -0,0 +1,145 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from api.v1 import exercises, group, workout
+from core.config import settings
+from core.dependencies import get_current_user_from_token, get_db
+from core.middleware import BodyLogMode, BodyLogPolicy, CorrelationIdASGIMiddleware
+from core.query_stats import instrument_query_stats
+from db.base import BaseModel
+from db.models import ExerciseModel, GroupMemberModel, GroupModel, UserModel, WorkoutAccessModel, WorkoutModel
+from db.schemas.user_schema import UserAdminGetModelSchema
+from repositories.exercise_repositories import ExerciseRepository
+from utils.context import set_current_user
+from utils.pagination import capped_total
+
+
+async def _user(session, prefix: str) -> UserModel:
+    user = UserModel(email=f"{prefix}-{uuid.uuid4().hex[:8]}@example.com", password_hash="123",
+                     is_active=True, is_confirmed=True)
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
+@pytest.fixture()
+async def list_app(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'lists.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseModel.metadata.create_all)
+    instrument_query_stats(engine)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_maker() as session:
+        owner = await _user(session, "lists")
+        friend = await _user(session, "friend")
+        base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        session.add_all([ExerciseModel(title=f"E{number}", description="", user_id=owner.id,
+                                       created_at=base + timedelta(minutes=number)) for number in range(3)])
+        session.add_all([WorkoutModel(title=f"W{number}", description="", user_id=owner.id) for number in range(2)])
+        shared = WorkoutModel(title="Shared", description="", user_id=friend.id)
+        friends_group = GroupModel(name="Friends", user_id=friend.id, workout=shared)
+        session.add_all([shared, friends_group, *[GroupModel(name=f"G{number}", user_id=owner.id)
+                                                  for number in range(3)]])
+        await session.flush()
+        session.add_all([GroupMemberModel(group_id=friends_group.id, user_id=owner.id),
+                         WorkoutAccessModel(user_id=owner.id, workout_id=shared.id, via_group_id=friends_group.id)])
+        await session.commit()
+        # the workouts list is admin-only; without user_id it still lists the caller's own rows
+        principal = UserAdminGetModelSchema.model_validate(owner).model_copy(update={"is_admin": True})
+
+    async def test_db():
+        async with session_maker() as session:
+            yield session
+
+    async def test_user():
+        set_current_user(principal)
+        return principal
+
+    inner = FastAPI()
+    inner.include_router(exercises.router, prefix="/api/v1/exercises")
+    inner.include_router(workout.router, prefix="/api/v1/workouts")
+    inner.include_router(group.router, prefix="/api/v1/groups")
+    inner.dependency_overrides[get_db] = test_db
+    inner.dependency_overrides[get_current_user_from_token] = test_user
+    app = CorrelationIdASGIMiddleware(inner, query_stats_headers=True,
+                                      default_body_log_policy=BodyLogPolicy(BodyLogMode.off))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+class TestListQueries:
+    @pytest.mark.parametrize("path, key, total, queries", [
+        ("/api/v1/exercises/", "exercises", 3, 1),
+        # the page, then the selectin loads of the shared workout's group and its members
+        ("/api/v1/workouts/", "workouts", 3, 3),
+        ("/api/v1/groups/", "groups", 3, 1),
+    ])
+    async def test_page_and_total_in_one_statement(self, list_app, path, key, total, queries):
+        response = await list_app.get(path, params={"limit": 3})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert len(body[key]) == 3
+        assert body["meta"]["total"] == total
+        assert body["meta"]["total_capped"] is False
+        assert response.headers["x-db-query-count"] == str(queries)
+
+    async def test_cursor_page_is_not_counted(self, list_app):
+        first = (await list_app.get("/api/v1/exercises/", params={"limit": 2})).json()
+
+        response = await list_app.get("/api/v1/exercises/",
+                                      params={"limit": 2, "cursor": first["meta"]["next_cursor"]})
+
+        assert [item["title"] for item in response.json()["exercises"]] == ["E2"]
+        assert response.json()["meta"]["total"] is None
+        assert response.headers["x-db-query-count"] == "1"
+
+
+@pytest.mark.asyncio
+class TestGetPage:
+    async def test_window_and_capped_totals(self, session):
+        repo = ExerciseRepository(session)
+        user = await _user(session, "page")
+        session.add_all([ExerciseModel(title=f"E{number}", user_id=user.id) for number in range(5)])
+        await session.commit()
+        stmt = select(ExerciseModel).where(ExerciseModel.user_id == user.id)
+
+        items, total = await repo.get_page(stmt, limit=2, start=1, total_cap=None)
+        assert [item.title for item in items] == ["E2", "E3"]
+        assert total == 5
+
+        items, total = await repo.get_page(stmt, limit=2, start=0, total_cap=3)
+        assert len(items) == 2
+        assert total == 4
+
+        assert await repo.get_page(stmt, limit=2, start=5, total_cap=None) == ([], 5)
+        assert await repo.get_page(stmt, limit=2, start=5, total_cap=3) == ([], 4)
+
+    async def test_default_cap_follows_the_setting(self, session, monkeypatch):
+        repo = ExerciseRepository(session)
+        user = await _user(session, "page-setting")
+        session.add_all([ExerciseModel(title=f"E{number}", user_id=user.id) for number in range(5)])
+        await session.commit()
+        stmt = select(ExerciseModel).where(ExerciseModel.user_id == user.id)
+        monkeypatch.setattr(settings, "PAGE_TOTAL_CAP", 3)
+
+        _, total = await repo.get_page(stmt, limit=2, start=0)
+
+        assert total == 4 and capped_total(total) == (3, True)
+
+    async def test_capped_total(self, monkeypatch):
+        monkeypatch.setattr(settings, "PAGE_TOTAL_CAP", 3)
+
+        assert capped_total(3) == (3, False)
+        assert capped_total(4) == (3, True)
+        assert capped_total(None) == (None, False)
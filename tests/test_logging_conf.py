@@ -0,0 +1,43 @@
+import logging
+from logging.handlers import QueueListener
+
+from logging_conf import CorrelationIdFilter, DroppingQueueHandler, request_id_var
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def _record(message: str) -> logging.LogRecord:
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+
+class TestQueueLogging:
+    def test_full_queue_drops_and_counts(self):
+        handler = DroppingQueueHandler(maxsize=2)
+        for number in range(5):
+            handler.handle(_record(f"line {number}"))
+
+        assert handler.queue.qsize() == 2
+        assert handler.dropped == 3
+
+    def test_request_id_is_captured_before_the_listener(self):
+        handler = DroppingQueueHandler(maxsize=10)
+        handler.addFilter(CorrelationIdFilter())
+        sink = _Collect()
+        listener = QueueListener(handler.queue, sink)
+        listener.start()
+
+        token = request_id_var.set("req-42")
+        try:
+            handler.handle(_record("inside request"))
+        finally:
+            request_id_var.reset(token)
+        listener.stop()
+
+        assert [record.process_id for record in sink.records] == ["req-42"]
@@ -0,0 +1,116 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+from botocore.exceptions import ClientError
+from fastapi import FastAPI, HTTPException
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from core.metrics import UNMATCHED_ROUTE, instrument_engine, metrics_endpoint
+from core.password_hasher import PasswordHasher
+from core.s3_cloud_connector import S3CloudConnector
+from core.middleware import CorrelationIdASGIMiddleware
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class FailingS3Session:
+    """aioboto3.Session whose client rejects every call."""
+
+    @asynccontextmanager
+    async def client(self, *args, **kwargs):
+        class Client:
+            async def delete_object(self, **kwargs):
+                raise ClientError({"Error": {"Code": "AccessDenied", "Message": "denied"}}, "DeleteObject")
+
+        yield Client()
+
+
+@pytest.mark.asyncio
+class TestMetrics:
+    async def test_requests_counted_by_route_template(self):
+        inner = FastAPI()
+
+        @inner.get("/items/{item_id}")
+        async def item(item_id: int):
+            return {"id": item_id}
+
+        inner.add_api_route("/metrics", metrics_endpoint)
+        app = CorrelationIdASGIMiddleware(inner)
+        labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+        before = _sample("http_requests_total", **labels)
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/items/1")
+            await client.get("/items/2")
+            exposed = (await client.get("/metrics")).text
+
+        assert _sample("http_requests_total", **labels) == before + 2
+        assert 'http_requests_total{method="GET",route="/items/{item_id}",status="200"}' in exposed
+        assert _sample("http_requests_in_flight") == 0
+
+    async def test_pool_gauges_follow_checkouts(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}")
+        instrument_engine(engine)
+
+        async with engine.connect() as conn:
+            await conn.execute(text("select 1"))
+            assert _sample("db_pool_checked_out") == 1
+        assert _sample("db_pool_checked_out") == 0
+        await engine.dispose()
+
+    async def test_handled_s3_errors_are_counted(self):
+        connector = S3CloudConnector()
+        connector.session = FailingS3Session()
+        before = _sample("external_call_errors_total", service="s3", operation="delete")
+
+        assert await connector.remove_file_url("bucket", "key") is None
+
+        assert _sample("external_call_errors_total", service="s3", operation="delete") == before + 1
+
+    async def test_early_413_is_counted(self):
+        inner = FastAPI()
+
+        @inner.post("/upload")
+        async def upload():
+            return {}
+
+        app = CorrelationIdASGIMiddleware(inner, max_body_size=4)
+        labels = {"method": "POST", "route": UNMATCHED_ROUTE, "status": "413"}
+        before = _sample("http_requests_total", **labels)
+
+        async def chunks():
+            yield b"12345678"
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            declared = await client.post("/upload", content=b"12345678")
+            streamed = await client.post("/upload", content=chunks())
+
+        assert declared.status_code == streamed.status_code == 413
+        assert _sample("http_requests_total", **labels) == before + 2
+
+    async def test_password_executor_is_exported(self):
+        hasher = PasswordHasher(max_workers=1, max_pending=1, rounds=4)
+        waits = _sample("password_hash_queue_wait_seconds_count")
+        hashes = _sample("password_hash_duration_seconds_count")
+        rejected = _sample("password_hash_rejected_total")
+        try:
+            hashed = await hasher.hash("secret")
+            verifying = asyncio.create_task(hasher.verify("secret", hashed))
+            await asyncio.sleep(0)
+            assert _sample("password_hash_pending") == 1
+            with pytest.raises(HTTPException):
+                await hasher.verify("secret", hashed)
+            assert await verifying
+        finally:
+            hasher.shutdown()
+
+        assert _sample("password_hash_queue_wait_seconds_count") == waits + 2
+        assert _sample("password_hash_duration_seconds_count") == hashes + 2
+        assert _sample("password_hash_pending") == 0
+        assert _sample("password_hash_rejected_total") == rejected + 1
@@ -0,0 +1,214 @@
+import json
+import logging
+import tracemalloc
+
+import httpx
+import pytest
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from core.middleware import BodyLogMode, BodyLogPolicy, CorrelationIdASGIMiddleware
+from core.query_stats import instrument_query_stats
+from core.slow_log import TimedRoute, explain_sampler, explain_statement, timed_dependency
+from repositories.base_repositoriey import BaseRepo
+
+CHUNK = b"x" * (1024 * 1024)
+
+
+def _upload_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        total = 0
+        async for chunk in request.stream():
+            total += len(chunk)
+        return {"size": total}
+
+    return app
+
+
+async def _call(app, chunks: int, headers: list | None = None) -> tuple[int, dict]:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/upload", "raw_path": b"/upload", "query_string": b"",
+        "root_path": "", "headers": headers or [(b"content-type", b"application/octet-stream")],
+        "client": ("test", 1), "server": ("test", 80),
+    }
+    sent = 0
+
+    async def receive():
+        nonlocal sent
+        if sent < chunks:
+            sent += 1
+            return {"type": "http.request", "body": CHUNK, "more_body": sent < chunks}
+        return {"type": "http.disconnect"}
+
+    response: dict = {"body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], json.loads(response["body"])
+
+
+@pytest.mark.asyncio
+class TestCorrelationMiddleware:
+    async def test_streaming_memory_is_constant(self):
+        app = CorrelationIdASGIMiddleware(_upload_app(), stream_request_body=True)
+
+        tracemalloc.start()
+        try:
+            status, body = await _call(app, chunks=500)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert status == 200
+        assert body == {"size": 500 * len(CHUNK)}
+        assert peak < 8 * 1024 * 1024
+
+    async def test_content_length_over_limit_is_rejected_early(self):
+        app = CorrelationIdASGIMiddleware(_upload_app(), stream_request_body=True, max_body_size=len(CHUNK))
+        headers = [(b"content-type", b"application/octet-stream"), (b"content-length", b"%d" % (3 * len(CHUNK)))]
+
+        status, body = await _call(app, chunks=3, headers=headers)
+
+        assert status == 413
+        assert "exceeds" in body["detail"]
+
+    async def test_stream_over_limit_is_rejected(self):
+        app = CorrelationIdASGIMiddleware(_upload_app(), stream_request_body=True, max_body_size=2 * len(CHUNK))
+
+        status, _ = await _call(app, chunks=5)
+
+        assert status == 413
+
+    async def test_policy_resolution(self):
+        errors = BodyLogPolicy(BodyLogMode.errors)
+        headers = BodyLogPolicy(BodyLogMode.headers)
+        app = CorrelationIdASGIMiddleware(
+            _upload_app(),
+            body_log_policies={"/api/v1/workouts/": errors, "/api/v1/auth": headers},
+            default_body_log_policy=BodyLogPolicy(BodyLogMode.off),
+        )
+
+        assert app.resolve_policy("/api/v1/workouts/", "/api/v1/workouts/") is errors
+        assert app.resolve_policy("/api/v1/workouts/{workout_id}", "/api/v1/workouts/5") is errors
+        assert app.resolve_policy(None, "/api/v1/auth/login") is headers
+        assert app.resolve_policy(None, "/api/v1/users/me").mode == BodyLogMode.off
+
+    async def test_list_policy_is_scoped_by_method_and_template(self):
+        errors = BodyLogPolicy(BodyLogMode.errors)
+        headers = BodyLogPolicy(BodyLogMode.headers)
+        default = BodyLogPolicy(BodyLogMode.sampled)
+        app = CorrelationIdASGIMiddleware(
+            _upload_app(),
+            body_log_policies={"/api/v1/auth": headers, "GET /api/v1/workouts/": errors,
+                               "GET /api/v1/groups/": errors},
+            default_body_log_policy=default,
+        )
+
+        assert app.resolve_policy("/api/v1/workouts/", "/api/v1/workouts/", "GET") is errors
+        assert app.resolve_policy("/api/v1/workouts/", "/api/v1/workouts/", "POST") is default
+        assert app.resolve_policy("/api/v1/workouts/{workout_id}", "/api/v1/workouts/5", "GET") is default
+        assert app.resolve_policy("/api/v1/workouts/{workout_id}", "/api/v1/workouts/5", "PATCH") is default
+        assert app.resolve_policy("/api/v1/groups/rename_group/{group_id}", "/api/v1/groups/rename_group/1",
+                                  "PUT") is default
+        assert app.resolve_policy("/api/v1/groups/", "/api/v1/groups/", "get") is errors
+        assert app.resolve_policy("/api/v1/auth/login", "/api/v1/auth/login", "POST") is headers
+
+    async def test_locking_select_is_not_analyzed(self):
+        assert explain_statement("SELECT id FROM users").startswith("EXPLAIN (ANALYZE, BUFFERS) ")
+        for lock in ("FOR UPDATE", "for share", "FOR NO KEY UPDATE", "FOR KEY SHARE"):
+            statement = f"SELECT groups.id FROM groups WHERE groups.id = $1 {lock}"
+            assert explain_statement(statement) == f"EXPLAIN {statement}"
+
+    async def test_off_route_still_logs_errors(self, caplog):
+        inner = FastAPI()
+
+        @inner.post("/upload")
+        async def upload(request: Request):
+            await request.body()
+            raise HTTPException(status_code=400, detail="broken upload")
+
+        app = CorrelationIdASGIMiddleware(inner, stream_request_body=True,
+                                          default_body_log_policy=BodyLogPolicy(BodyLogMode.off))
+        headers = [(b"content-type", b"text/plain")]
+        with caplog.at_level(logging.INFO, logger="core.middleware"):
+            status, _ = await _call(app, chunks=1, headers=headers)
+
+        assert status == 400
+        lines = [record.getMessage() for record in caplog.records if record.name == "core.middleware"]
+        assert any(line.startswith("HTTP response 400") and "broken upload" in line for line in lines)
+
+    async def test_query_stats_headers_and_n_plus_one(self, tmp_path, caplog):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'queries.db'}")
+        instrument_query_stats(engine)
+        inner = FastAPI()
+
+        @inner.get("/items")
+        async def items():
+            async with engine.connect() as conn:
+                for number in range(4):
+                    await conn.execute(text("select :number"), {"number": number})
+            return {"ok": True}
+
+        app = CorrelationIdASGIMiddleware(inner, query_stats_headers=True, n_plus_one_threshold=3)
+        with caplog.at_level(logging.INFO, logger="core.middleware"):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get("/items")
+        await engine.dispose()
+
+        assert response.headers["x-db-query-count"] == "4"
+        assert response.headers["x-db-n-plus-one"] == "1"
+        assert any(record.getMessage().startswith("Suspected N+1") for record in caplog.records)
+
+    async def test_slow_request_record(self, tmp_path, caplog, monkeypatch):
+        # core.database attaches the app's PostgreSQL engine on import, it would sample this request now and then
+        monkeypatch.setattr(explain_sampler, "engine", None)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'slow.db'}")
+        instrument_query_stats(engine)
+
+        class ItemRepository(BaseRepo):
+            async def get_items(self):
+                return (await self.session.execute(text("select 1"))).all()
+
+        @timed_dependency("auth")
+        async def current_user():
+            return "user"
+
+        router = APIRouter(route_class=TimedRoute)
+
+        @router.get("/items/{item_id}")
+        async def items(item_id: int, user: str = Depends(current_user)):
+            async with AsyncSession(engine) as session:
+                await ItemRepository(session).get_items()
+            return {"id": item_id}
+
+        inner = FastAPI()
+        inner.include_router(router)
+        app = CorrelationIdASGIMiddleware(inner, default_body_log_policy=BodyLogPolicy(BodyLogMode.off),
+                                          slow_request_ms=0)
+        slow_logger = logging.getLogger("slow_requests")
+        slow_logger.addHandler(caplog.handler)
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get("/items/7")
+        finally:
+            slow_logger.removeHandler(caplog.handler)
+            await engine.dispose()
+
+        assert response.status_code == 200
+        records = [json.loads(record.getMessage()) for record in caplog.records if record.name == "slow_requests"]
+        assert len(records) == 1
+        record = records[0]
+        assert record["route"] == "/items/{item_id}"
+        assert {"auth", "dependencies", "service", "serialization", "repository", "db"} <= set(record["phases"])
+        assert record["statements"][0]["repository"] == "ItemRepository.get_items"
+        assert "explain" not in record
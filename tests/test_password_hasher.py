@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from core.password_hasher import PasswordHasher
+
+
+@pytest.mark.asyncio
+class TestPasswordHasher:
+    async def test_hash_and_verify(self):
+        hasher = PasswordHasher(max_workers=2, max_pending=4, rounds=4)
+        hashed = await hasher.hash("password")
+
+        assert hashed.startswith("$2b$04$")
+        assert await hasher.verify("password", hashed)
+        assert not await hasher.verify("wrong", hashed)
+        assert hasher.stats()["hash_time"]["count"] == 3
+        hasher.shutdown()
+
+    async def test_rejects_when_saturated(self):
+        hasher = PasswordHasher(max_workers=1, max_pending=1, rounds=4)
+        first = asyncio.create_task(hasher.hash("password"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as e:
+            await hasher.hash("password")
+        assert e.value.status_code == 503
+        assert hasher.rejected == 1
+
+        await first
+        assert hasher.pending == 0
+        hasher.shutdown()
+
+    async def test_cancelled_callers_free_their_slot_when_the_job_leaves_the_pool(self):
+        hasher = PasswordHasher(max_workers=1, max_pending=2, rounds=4)
+        release = threading.Event()
+        try:
+            running = asyncio.create_task(hasher._run(release.wait))
+            queued = asyncio.create_task(hasher._run(release.wait))
+            await asyncio.sleep(0.05)
+            assert hasher.pending == 2
+
+            queued.cancel()
+            running.cancel()
+            await asyncio.sleep(0.05)
+            # the queued job is dropped, the running one still holds the only worker
+            assert hasher.pending == 1
+            admitted = asyncio.create_task(hasher._run(release.wait))
+            await asyncio.sleep(0.05)
+            assert hasher.pending == 2
+            with pytest.raises(HTTPException):
+                await hasher._run(release.wait)
+
+            release.set()
+            await admitted
+            await asyncio.sleep(0.05)
+            assert hasher.pending == 0
+        finally:
+            release.set()
+            hasher.shutdown()
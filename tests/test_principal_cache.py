@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.principal_cache import PrincipalCache, principal_cache
+from db.models import UserModel
+from db.schemas.user_schema import UserAdminGetModelSchema
+from repositories.user_repository import UserRepository
+
+
+def _token_limit(minutes: int = 30) -> int:
+    return int((datetime.now(timezone.utc) + timedelta(minutes=minutes)).timestamp())
+
+
+async def _principal(session, email: str) -> UserAdminGetModelSchema:
+    user = UserModel(email=email, password_hash="123", is_active=True, is_confirmed=True)
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    return UserAdminGetModelSchema.model_validate(user)
+
+
+@pytest.mark.asyncio
+class TestPrincipalCache:
+    async def test_hit_and_miss_counters(self, session):
+        cache = PrincipalCache(max_size=10, ttl_sec=30)
+        principal = await _principal(session, "cache_hit@example.com")
+
+        assert cache.get("token") is None
+        cache.put("token", principal, _token_limit())
+        assert cache.get("token").id == principal.id
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    async def test_expired_token_is_not_cached(self, session):
+        cache = PrincipalCache(max_size=10, ttl_sec=30)
+        principal = await _principal(session, "cache_expired@example.com")
+
+        cache.put("token", principal, _token_limit(-1))
+        assert cache.get("token") is None
+
+    async def test_lru_bound(self, session):
+        cache = PrincipalCache(max_size=2, ttl_sec=30)
+        principal = await _principal(session, "cache_lru@example.com")
+
+        for token in ("a", "b", "c"):
+            cache.put(token, principal, _token_limit())
+        assert cache.get("a") is None
+        assert cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+
+    async def test_repository_invalidates_user(self, user_repo: UserRepository):
+        principal = await _principal(user_repo.session, "cache_invalidate@example.com")
+        principal_cache.configure(10, 30)
+        await user_repo.add_token_user("cached", principal.id)
+        principal_cache.put("cached", principal, _token_limit())
+
+        await user_repo.update_user({"first_name": "John"}, principal.id)
+        assert principal_cache.get("cached") is None
+
+        principal_cache.put("cached", principal, _token_limit())
+        await user_repo.remove_token_user(principal.id)
+        assert principal_cache.get("cached") is None
@@ -0,0 +1,114 @@
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from db.models import ExerciseModel, GroupMemberModel, GroupModel, UserModel, WorkoutAccessModel, WorkoutModel
+from db.models.workout_model import WorkoutExerciseModel
+from repositories.exercise_repositories import ExerciseRepository
+from repositories.group_repositories import GroupRepository
+from repositories.workout_repositories import WorkoutRepository
+
+
+async def _plans(session, call) -> list[str]:
+    """Run a repository call and return the SQLite query plan of every SELECT/UPDATE/DELETE it executed."""
+    executed = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            executed.append((statement, parameters))
+
+    engine = session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        await call()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    conn = await session.connection()
+    plans = []
+    for statement, parameters in executed:
+        rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        plans.append(" | ".join(row[-1] for row in rows))
+    return plans
+
+
+def _on(plans: list[str], table: str) -> list[str]:
+    return [plan for plan in plans if f" {table} " in plan]
+
+
+def _uses(plans: list[str], index: str) -> bool:
+    return any(f"INDEX {index} " in f"{plan} " or f"INDEX {index}(" in plan for plan in plans)
+
+
+@pytest.fixture()
+async def dataset(session):
+    suffix = uuid.uuid4().hex[:8]
+    owner = UserModel(email=f"plans-owner-{suffix}@example.com", password_hash="123",
+                      is_active=True, is_confirmed=True)
+    member = UserModel(email=f"plans-member-{suffix}@example.com", password_hash="123",
+                       is_active=True, is_confirmed=True)
+    session.add_all([owner, member])
+    await session.flush()
+    exercises = [ExerciseModel(title=f"E{number}", user_id=owner.id) for number in range(3)]
+    workout = WorkoutModel(title="Plans", user_id=owner.id)
+    session.add_all([*exercises, workout])
+    await session.flush()
+    session.add_all([WorkoutExerciseModel(workout_id=workout.id, exercise_id=exercise.id, position=position)
+                     for position, exercise in enumerate(exercises, start=1)])
+    group = GroupModel(name="Plans", user_id=owner.id, workout_id=workout.id)
+    session.add(group)
+    await session.flush()
+    session.add_all([GroupMemberModel(group_id=group.id, user_id=member.id),
+                     WorkoutAccessModel(user_id=member.id, workout_id=workout.id, via_group_id=group.id)])
+    await session.commit()
+    return owner, member, exercises, workout, group
+
+
+@pytest.mark.asyncio
+class TestQueryPlans:
+    async def test_exercise_list(self, session, dataset):
+        owner, *_ = dataset
+        repo = ExerciseRepository(session)
+
+        plans = await _plans(session, lambda: repo.get_all_exercise_user(owner.id, 10, 0))
+
+        assert _on(plans, "exercises")
+        assert all(_uses([plan], "ix_exercises_user_id_created_at") for plan in _on(plans, "exercises"))
+        assert not any("TEMP B-TREE FOR ORDER BY" in plan for plan in plans)
+
+    async def test_workout_lists(self, session, dataset):
+        owner, member, _, workout, _ = dataset
+        repo = WorkoutRepository(session)
+
+        count_plans = await _plans(session, lambda: repo.get_workout_count(owner.id))
+        shared_plans = await _plans(session, lambda: repo.get_all_workouts(member.id, 10, 0))
+        detail_plans = await _plans(session, lambda: repo.get_workout_for_user(workout.id, member.id))
+
+        assert _uses(count_plans, "ix_workouts_user_id_created_at")
+        assert _uses(_on(shared_plans, "workout_access"), "uq_workout_access_user_id_workout_id_via_group_id")
+        assert _uses(shared_plans, "ix_groups_workout_id")
+        assert _uses(shared_plans, "uq_association_group_members_group_id_user_id")
+        assert _uses(_on(detail_plans, "workout_access"), "uq_workout_access_user_id_workout_id_via_group_id")
+        assert _uses(detail_plans, "ix_association_workout_exercises_workout_id_position")
+
+    async def test_group_lists(self, session, dataset):
+        owner, member, _, _, group = dataset
+        repo = GroupRepository(session)
+
+        list_plans = await _plans(session, lambda: repo.get_groups_user(owner.id, 10, 0))
+        all_plans = await _plans(session, lambda: repo.get_all_groups(owner.id, 10, 0))
+        member_plans = await _plans(session, lambda: repo.get_users_in_group_by_id([member.id], group.id))
+        count_plans = await _plans(session, lambda: repo.get_users_count_in_group_by_id(group.id))
+
+        assert all(_uses([plan], "ix_groups_user_id_created_at") for plan in _on(list_plans + all_plans, "groups"))
+        assert _uses(member_plans, "uq_association_group_members_group_id_user_id")
+        assert _uses(count_plans, "uq_association_group_members_group_id_user_id")
+
+    async def test_remove_exercise(self, session, dataset):
+        _, _, exercises, _, _ = dataset
+        repo = ExerciseRepository(session)
+
+        plans = await _plans(session, lambda: repo.remove_exercise_id(exercises[0].id))
+
+        assert _uses(plans, "ix_association_workout_exercises_exercise_id")
+        assert _uses(plans, "ix_association_workout_exercises_workout_id_position")
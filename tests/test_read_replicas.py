@@ -0,0 +1,110 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import core.database
+import core.dependencies
+from api.v1 import exercises
+from core.database import PrimarySession, ReplicaRouter, replica_urls
+from core.dependencies import get_current_user_from_token, get_db
+from db.base import BaseModel
+from db.models import ExerciseModel, UserModel
+from db.schemas.user_schema import UserAdminGetModelSchema
+from utils.context import set_current_user
+
+NAMES = ("primary", "replica-1", "replica-2")
+
+
+@pytest.fixture()
+async def stand_ins(tmp_path):
+    """Primary and two replicas as separate SQLite files; each holds one exercise titled after itself."""
+    engines = {}
+    for name in NAMES:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(BaseModel.metadata.create_all)
+        async with async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+            user = UserModel(email="replica@example.com", password_hash="123", is_active=True, is_confirmed=True)
+            session.add(user)
+            await session.flush()
+            session.add(ExerciseModel(title=name, description="", user_id=user.id))
+            await session.commit()
+            principal = UserAdminGetModelSchema.model_validate(user)
+        engines[name] = engine
+    primary = async_sessionmaker(engines["primary"], expire_on_commit=False, sync_session_class=PrimarySession)
+    yield primary, [engines["replica-1"], engines["replica-2"]], principal
+    for engine in engines.values():
+        await engine.dispose()
+
+
+async def _served_by(router: ReplicaRouter) -> str:
+    async with router.session() as session:
+        return (await session.execute(select(ExerciseModel.title))).scalar_one()
+
+
+def _client(primary, principal) -> httpx.AsyncClient:
+    async def test_db():
+        async with primary() as session:
+            yield session
+
+    async def test_user():
+        set_current_user(principal)
+        return principal
+
+    app = FastAPI()
+    app.include_router(exercises.router, prefix="/api/v1/exercises")
+    app.dependency_overrides[get_db] = test_db
+    app.dependency_overrides[get_current_user_from_token] = test_user
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+class TestReadReplicas:
+    async def test_get_routes_rotate_over_replicas(self, stand_ins, monkeypatch):
+        primary, replicas, principal = stand_ins
+        monkeypatch.setattr(core.dependencies, "read_router", ReplicaRouter(replicas))
+
+        async with _client(primary, principal) as client:
+            titles = [(await client.get("/api/v1/exercises/")).json()["exercises"][0]["title"] for _ in range(3)]
+
+        assert titles == ["replica-1", "replica-2", "replica-1"]
+
+    async def test_writer_reads_the_primary_for_a_while(self, stand_ins, monkeypatch):
+        primary, replicas, principal = stand_ins
+        router = ReplicaRouter(replicas, sticky_sec=0.2)
+        monkeypatch.setattr(core.dependencies, "read_router", router)
+        monkeypatch.setattr(core.database, "read_router", router)
+        set_current_user(principal)
+
+        async with primary() as session:
+            await session.execute(select(ExerciseModel.id))
+            await session.commit()
+        assert not router.is_pinned(principal.id)
+
+        async with primary() as session:
+            await session.execute(update(ExerciseModel).values(title="written"))
+            await session.commit()
+        assert router.is_pinned(principal.id)
+
+        async with _client(primary, principal) as client:
+            assert (await client.get("/api/v1/exercises/")).json()["exercises"][0]["title"] == "written"
+            await asyncio.sleep(0.25)
+            assert (await client.get("/api/v1/exercises/")).json()["exercises"][0]["title"] == "replica-1"
+
+    async def test_least_connections_skips_the_busy_replica(self, stand_ins):
+        _, replicas, _ = stand_ins
+        router = ReplicaRouter(replicas, strategy="least_connections")
+
+        async with router.session() as held:
+            assert (await held.execute(select(ExerciseModel.title))).scalar_one() == "replica-1"
+            assert [await _served_by(router) for _ in range(3)] == ["replica-2"] * 3
+        assert [await _served_by(router) for _ in range(2)] == ["replica-1", "replica-2"]
+
+        assert ReplicaRouter().reads_primary(None) and not router.reads_primary(None)
+        with pytest.raises(ValueError):
+            ReplicaRouter(replicas, strategy="random")
+        assert replica_urls(" a, ,b ") == ["a", "b"]
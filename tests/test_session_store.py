@@ -0,0 +1,205 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from core.principal_cache import principal_cache
+from core.session_store import RedisSessionStore
+from db.models import UserModel
+from db.schemas.user_schema import UserAdminGetModelSchema
+
+
+class FakePubSub:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, channel: str) -> None:
+        self.redis.subscribers.setdefault(channel, []).append(self.queue)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self) -> None:
+        for queues in self.redis.subscribers.values():
+            if self.queue in queues:
+                queues.remove(self.queue)
+
+
+class FakeRedis:
+    """In-memory stand-in for the handful of redis.asyncio commands the session store uses."""
+
+    def __init__(self):
+        self.values: dict = {}
+        self.sets: dict = {}
+        self.ttl: dict = {}
+        self.subscribers: dict = {}
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise RedisConnectionError("redis is down")
+
+    async def get(self, key):
+        self._check()
+        return self.values.get(key)
+
+    async def mget(self, *keys):
+        self._check()
+        return [self.values.get(key) for key in keys]
+
+    async def incr(self, key):
+        self._check()
+        self.values[key] = str(int(self.values.get(key) or 0) + 1)
+        return int(self.values[key])
+
+    async def set(self, key, value, ex=None):
+        self._check()
+        self.values[key] = value
+        self.ttl[key] = ex
+
+    async def sadd(self, key, *members):
+        self._check()
+        self.sets.setdefault(key, set()).update(members)
+
+    async def smembers(self, key):
+        self._check()
+        return set(self.sets.get(key, set()))
+
+    async def expire(self, key, ttl, nx=False, gt=False):
+        self._check()
+        current = self.ttl.get(key)
+        if nx and current is not None:
+            return False
+        if gt and (current is None or ttl <= current):
+            return False
+        self.ttl[key] = ttl
+        return True
+
+    async def delete(self, *keys):
+        self._check()
+        for key in keys:
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+            self.ttl.pop(key, None)
+
+    async def publish(self, channel, message):
+        self._check()
+        for queue in self.subscribers.get(channel, []):
+            queue.put_nowait({"type": "message", "channel": channel, "data": message})
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def aclose(self):
+        pass
+
+
+def _token_limit(minutes: int = 30) -> int:
+    return int((datetime.now(timezone.utc) + timedelta(minutes=minutes)).timestamp())
+
+
+@pytest.fixture
+async def principal(session):
+    user = UserModel(email=f"session_{uuid.uuid4().hex}@example.com", password_hash="123",
+                     is_active=True, is_confirmed=True)
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    return UserAdminGetModelSchema.model_validate(user)
+
+
+@pytest.mark.asyncio
+class TestRedisSessionStore:
+    async def test_put_get_and_invalidate(self, principal):
+        store = RedisSessionStore(FakeRedis())
+
+        await store.put("token", principal, _token_limit())
+        found = await store.get("token", principal.id)
+        assert found.id == principal.id
+        assert found.email == principal.email
+
+        await store.invalidate_user(principal.id)
+        assert await store.get("token", principal.id) is None
+
+    async def test_snapshot_expires_with_token(self, principal):
+        redis = FakeRedis()
+        store = RedisSessionStore(redis)
+
+        await store.put("token", principal, _token_limit(10))
+        assert 590 <= redis.ttl[store._session_key("token")] <= 600
+
+        await store.put("expired", principal, _token_limit(-1))
+        assert await store.get("expired", principal.id) is None
+
+    async def test_fallback_when_redis_is_down(self, principal):
+        redis = FakeRedis()
+        store = RedisSessionStore(redis, retry_sec=60)
+        await store.put("token", principal, _token_limit())
+
+        redis.down = True
+        assert await store.get("token", principal.id) is None
+        redis.down = False
+        assert store.available is False
+        assert await store.get("token", principal.id) is None
+
+    async def test_pubsub_invalidates_other_workers(self, principal):
+        redis = FakeRedis()
+        publisher = RedisSessionStore(redis)
+        subscriber = RedisSessionStore(redis)
+        principal_cache.configure(10, 30)
+        principal_cache.put("token", principal, _token_limit())
+
+        await subscriber.start()
+        await asyncio.sleep(0)
+        await publisher.invalidate_user(principal.id)
+        await asyncio.sleep(0)
+        await subscriber.stop()
+
+        assert principal_cache.get("token") is None
+
+    async def test_invalidation_during_outage_is_retried(self, principal):
+        redis = FakeRedis()
+        worker = RedisSessionStore(redis, retry_sec=0.01)
+        other_worker = RedisSessionStore(redis, retry_sec=0.01)
+        await worker.put("token", principal, _token_limit())
+
+        redis.down = True
+        await worker.invalidate_user(principal.id)
+        redis.down = False
+        assert await worker.get("token", principal.id) is None
+        await asyncio.sleep(0.05)
+
+        assert await other_worker.get("token", principal.id) is None
+        assert not worker._pending and worker._retry is None
+
+    async def test_snapshot_from_before_an_invalidation_is_not_trusted(self, principal):
+        redis = FakeRedis()
+        store = RedisSessionStore(redis)
+        await store.put("token", principal, _token_limit())
+        # the delete missed the snapshot, the generation bump did not
+        await redis.incr(store._generation_key(principal.id))
+
+        assert await store.get("token", principal.id) is None
+        await store.put("token", principal, _token_limit())
+        assert (await store.get("token", principal.id)).id == principal.id
+        assert await store.get("token", principal.id + 1) is None
+
+    async def test_listener_survives_a_bad_message(self, principal):
+        redis = FakeRedis()
+        subscriber = RedisSessionStore(redis)
+        principal_cache.configure(10, 30)
+        principal_cache.put("token", principal, _token_limit())
+
+        await subscriber.start()
+        await asyncio.sleep(0)
+        await redis.publish(subscriber.channel, "not a user id")
+        await redis.publish(subscriber.channel, str(principal.id))
+        await asyncio.sleep(0)
+        assert not subscriber._listener.done()
+        await subscriber.stop()
+
+        assert principal_cache.get("token") is None
@@ -0,0 +1,172 @@
+import json
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, update
+
+import services.auth_service
+import services.user_versice
+from api.v1.users import me_get
+from core.config import settings
+from core.dependencies import get_current_user_from_token
+from core.principal_cache import principal_cache
+from core.token_generations import TokenGenerationMap, token_generations
+from db.models import UserModel
+from db.models.enums import TypeTokensEnum
+from db.schemas.user_schema import UserAdminGetModelSchema, UserPostModelUpdateSchema
+from services.auth_service import AuthServ
+from services.user_versice import UserServices
+from utils.context import set_current_user
+
+
+async def _create_user(session) -> UserModel:
+    user = UserModel(email=f"generation_{uuid.uuid4().hex}@example.com", password_hash="123",
+                     is_active=True, is_confirmed=True)
+    session.add(user)
+    await session.commit()
+    # SQLite timestamps have whole seconds, a change right after creation would look unchanged
+    await session.execute(update(UserModel).where(UserModel.id == user.id)
+                          .values(updated_at=datetime.now(timezone.utc) - timedelta(minutes=1)))
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
+@contextmanager
+def _statements(session):
+    statements = []
+
+    def listener(conn, cursor, statement, *_):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", listener)
+
+
+@pytest.mark.asyncio
+class TestTokenGenerations:
+    async def test_refresh_picks_up_bumped_generation(self, user_repo, session):
+        user = await _create_user(session)
+        generations = TokenGenerationMap(refresh_sec=1)
+        assert generations.get(user.id) is None
+
+        await generations.refresh(user_repo)
+        assert generations.get(user.id) == 0
+
+        assert await user_repo.bump_token_generation(user.id) == 1
+        await generations.refresh(user_repo)
+        assert generations.get(user.id) == 1
+
+    async def test_revoked_token_rejected_without_db(self, user_repo, session):
+        user = await _create_user(session)
+        await token_generations.refresh(user_repo)
+        old_token = await AuthServ.issue_email_verify_token(user.id, TypeTokensEnum.access, 0)
+        assert AuthServ.verify_stateless_token(old_token).user_id == user.id
+
+        token_generations.set(user.id, await user_repo.bump_token_generation(user.id))
+        with pytest.raises(HTTPException) as e:
+            AuthServ.verify_stateless_token(old_token)
+        assert e.value.status_code == 401
+
+        new_token = await AuthServ.issue_email_verify_token(user.id, TypeTokensEnum.access, 1)
+        assert AuthServ.verify_stateless_token(new_token).token_generation == 1
+
+    async def test_principal_comes_from_the_token(self, user_repo, session, monkeypatch):
+        monkeypatch.setattr(settings, "AUTH_STATELESS_TOKENS", True)
+        user = await _create_user(session)
+        await token_generations.refresh(user_repo)
+        token = await AuthServ.issue_email_verify_token(user.id, TypeTokensEnum.access, 0,
+                                                        UserAdminGetModelSchema.model_validate(user))
+        user_serv = UserServices(session)
+
+        with _statements(session) as statements:
+            principal = await get_current_user_from_token(token, user_serv)
+        assert statements == []
+        assert (principal.id, principal.is_admin, principal.is_active) == (user.id, False, True)
+
+        principal_cache.invalidate_user(user.id)
+        await user_serv.update_user_profile(
+            UserPostModelUpdateSchema(first_name="John", last_name=None, birth_data=None), user.id)
+        principal_cache.invalidate_user(user.id)
+        assert (await get_current_user_from_token(token, user_serv)).first_name == "John"
+
+        principal_cache.invalidate_user(user.id)
+        await user_repo.remove_user_id(user.id)
+        with pytest.raises(HTTPException) as e:
+            await get_current_user_from_token(token, user_serv)
+        assert e.value.status_code == 401
+
+    async def test_refreshed_token_carries_the_current_principal(self, user_repo, session, monkeypatch):
+        monkeypatch.setattr(settings, "AUTH_STATELESS_TOKENS", True)
+        user = await _create_user(session)
+        await token_generations.refresh(user_repo)
+        set_current_user(UserAdminGetModelSchema.model_validate(user))
+
+        user_serv = UserServices(session)
+        old_token = await user_serv.add_session(user.id, 0)
+        other_device = await user_serv.add_session(user.id, 0)
+        token = (await user_serv.refresh_token(old_token)).access_token
+        await token_generations.refresh(user_repo)
+
+        principal = AuthServ.stateless_principal(AuthServ.verify_stateless_token(token))
+        assert principal is not None and principal.id == user.id
+        assert token_generations.get(user.id) == 0
+        assert AuthServ.verify_stateless_token(other_device).user_id == user.id
+
+    async def test_deleted_user_token_is_refused(self, user_repo, session, monkeypatch):
+        monkeypatch.setattr(settings, "AUTH_STATELESS_TOKENS", True)
+        user = await _create_user(session)
+        # SQLite hands the id of a deleted last row out again, the revocation stays in this map
+        worker = TokenGenerationMap(refresh_sec=1)
+        await worker.refresh(user_repo)
+        monkeypatch.setattr(services.auth_service, "token_generations", worker)
+        monkeypatch.setattr(services.user_versice, "token_generations", worker)
+        token = await AuthServ.issue_email_verify_token(user.id, TypeTokensEnum.access, 0,
+                                                        UserAdminGetModelSchema.model_validate(user))
+        user_serv = UserServices(session)
+        assert (await get_current_user_from_token(token, user_serv)).id == user.id
+
+        await user_serv.remove_user(user.id)
+        await session.commit()
+        with pytest.raises(HTTPException) as e:
+            await get_current_user_from_token(token, user_serv)
+        assert e.value.status_code == 401
+
+    async def test_refresh_revokes_users_deleted_elsewhere(self, user_repo, session, monkeypatch):
+        monkeypatch.setattr(settings, "AUTH_STATELESS_TOKENS", True)
+        user = await _create_user(session)
+        worker = TokenGenerationMap(refresh_sec=1)
+        await worker.refresh(user_repo)
+        monkeypatch.setattr(services.auth_service, "token_generations", worker)
+        token = await AuthServ.issue_email_verify_token(user.id, TypeTokensEnum.access, 0,
+                                                        UserAdminGetModelSchema.model_validate(user))
+        user_serv = UserServices(session)
+        assert (await get_current_user_from_token(token, user_serv)).id == user.id
+
+        # deleted by another worker, this one only learns it from the database
+        await user_repo.remove_user_id(user.id)
+        await session.commit()
+        await worker.refresh(user_repo)
+        with pytest.raises(HTTPException) as e:
+            await get_current_user_from_token(token, user_serv)
+        assert e.value.status_code == 401
+
+    async def test_principal_claim_holds_only_authorization_fields(self, user_repo, session, monkeypatch):
+        monkeypatch.setattr(settings, "AUTH_STATELESS_TOKENS", True)
+        user = await _create_user(session)
+        await token_generations.refresh(user_repo)
+        token = await UserServices(session).add_session(user.id, 0, UserAdminGetModelSchema.model_validate(user))
+
+        payload = jwt.decode(token, options={"verify_signature": False})
+        assert set(json.loads(payload["principal"])) == {"id", "is_active", "is_confirmed", "is_admin", "updated_at"}
+        assert user.email not in json.dumps(payload)
+
+        set_current_user(AuthServ.stateless_principal(AuthServ.verify_stateless_token(token)))
+        assert (await me_get(UserServices(session))).email == user.email
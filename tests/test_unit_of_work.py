@@ -0,0 +1,218 @@
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+import httpx
+import jwt
+import pytest
+from fastapi import Depends, FastAPI, HTTPException, UploadFile
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import core.dependencies
+import repositories.user_repository
+import services.user_versice
+from api.v1 import auth, group
+from core.config import settings
+from core.session_store import RedisSessionStore
+from core.dependencies import get_current_user_from_token, get_db
+from db.base import BaseModel
+from db.models import ExerciseModel, GroupMemberModel, GroupModel, UserModel, WorkoutModel
+from db.models.enums import CounterKind
+from db.models.jwt_token_model import JWTTokenModel
+from db.schemas.auth_schema import PayloadToken
+from db.schemas.exercise_schema import CreateExerciseSchema
+from db.schemas.user_schema import UserAdminGetModelSchema
+from repositories.group_repositories import GroupRepository
+from repositories.unit_of_work import UnitOfWork
+from repositories.user_counter_repository import UserCounterRepository
+from repositories.user_repository import UserRepository
+from services.exercise_service import ExerciseServices
+from services.user_versice import UserServices
+from utils.context import set_current_user
+from utils.raises import _conflict
+from tests.test_session_store import FakeRedis
+
+# get_current_user_from_token is overridden, refresh_token still reads the caller's bearer token
+BEARER = {"Authorization": "Bearer current-session"}
+
+
+@pytest.fixture()
+async def uow_app(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'uow.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseModel.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(core.dependencies, "SessionLocal", session_maker)
+
+    async with session_maker() as session:
+        owner = UserModel(email="uow-owner@example.com", password_hash="123", is_active=True, is_confirmed=True)
+        member = UserModel(email="uow-member@example.com", password_hash="123", is_active=True, is_confirmed=True)
+        session.add_all([owner, member])
+        await session.flush()
+        workout = WorkoutModel(title="Shared", description="", user_id=owner.id)
+        team = GroupModel(name="Team", user_id=owner.id)
+        session.add_all([workout, team])
+        await session.flush()
+        session.add(GroupMemberModel(group_id=team.id, user_id=member.id))
+        await session.commit()
+        principal = UserAdminGetModelSchema.model_validate(owner)
+        ids = {"group": team.id, "workout": workout.id, "owner": owner.id}
+
+    async def test_user():
+        set_current_user(principal)
+        return principal
+
+    app = FastAPI()
+    app.include_router(group.router, prefix="/api/v1/groups")
+    app.include_router(auth.router, prefix="/api/v1/auth")
+    app.dependency_overrides[get_current_user_from_token] = test_user
+    counts = {"commits": 0, "statements": 0}
+
+    def count(name):
+        def listener(*_):
+            counts[name] += 1
+        return listener
+
+    event.listen(engine.sync_engine, "commit", count("commits"))
+    event.listen(engine.sync_engine, "before_cursor_execute", count("statements"))
+    yield app, session_maker, counts, ids
+    await engine.dispose()
+
+
+async def _request(app, counts, method: str, url: str, **kwargs) -> httpx.Response:
+    counts.update(commits=0, statements=0)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.request(method, url, **kwargs)
+
+
+@pytest.mark.asyncio
+class TestUnitOfWork:
+    @pytest.mark.parametrize("url, stateless, per_method_commits", [
+        ("/api/v1/groups/add_workout_in_group/{workout}/{group}", False, 1),
+        ("/api/v1/auth/refresh_token", False, 2),
+        ("/api/v1/auth/refresh_token", True, 2),
+    ])
+    async def test_write_endpoints_commit_once(self, uow_app, monkeypatch, url, stateless, per_method_commits):
+        app, session_maker, counts, ids = uow_app
+        url = url.format(**ids)
+        monkeypatch.setattr(settings, "AUTH_STATELESS_TOKENS", stateless)
+
+        async def per_method_db():
+            async with session_maker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = per_method_db
+        before = await _request(app, counts, "PUT" if "groups" in url else "POST", url, headers=BEARER)
+        assert before.status_code == 200 and counts["commits"] == per_method_commits
+        del app.dependency_overrides[get_db]
+
+        response = await _request(app, counts, "PUT" if "groups" in url else "POST", url, headers=BEARER)
+
+        assert response.status_code == 200 and counts["commits"] == 1
+
+    async def test_delete_group_is_one_transaction(self, uow_app):
+        _, session_maker, counts, ids = uow_app
+        async with session_maker() as session:
+            counts.update(commits=0)
+            await GroupRepository(session).delete_group(ids["group"], ids["owner"])
+            assert counts["commits"] == 2
+            await session.execute(insert(GroupModel).values(id=ids["group"], name="Team", user_id=ids["owner"]))
+            await session.commit()
+
+        async with session_maker() as session:
+            counts.update(commits=0)
+            async with UnitOfWork(session):
+                await GroupRepository(session).delete_group(ids["group"], ids["owner"])
+            assert counts["commits"] == 1
+            assert await session.get(GroupModel, ids["group"]) is None
+
+    async def test_http_exception_rolls_back_every_step(self, uow_app):
+        app, session_maker, counts, ids = uow_app
+        called = []
+
+        @app.put("/broken/{group_id}")
+        async def broken(group_id: int, session: AsyncSession = Depends(get_db)):
+            repo = GroupRepository(session)
+            await repo.rename_group("Half", group_id)
+            await repo.remove_all_member_group_id(group_id)
+            await repo.on_commit(lambda: called.append(group_id))
+            raise _conflict("second step failed")
+
+        response = await _request(app, counts, "PUT", f"/broken/{ids['group']}")
+
+        assert response.status_code == 409 and counts["commits"] == 0
+        assert called == []
+        async with session_maker() as session:
+            assert (await session.get(GroupModel, ids["group"])).name == "Team"
+            assert (await session.execute(select(GroupMemberModel))).first() is not None
+
+    async def test_on_commit_runs_after_the_commit(self, uow_app):
+        _, session_maker, _, ids = uow_app
+        seen = []
+
+        async def read_committed_name():
+            async with session_maker() as other:
+                seen.append((await other.get(GroupModel, ids["group"])).name)
+
+        async with session_maker() as session:
+            async with UnitOfWork(session):
+                repo = GroupRepository(session)
+                await repo.rename_group("Committed", ids["group"])
+                await repo.on_commit(read_committed_name)
+                assert seen == []
+            assert UnitOfWork.of(session) is None
+
+        assert seen == ["Committed"]
+
+    async def test_session_snapshot_is_stored_after_the_invalidation(self, uow_app, monkeypatch):
+        app, _, counts, ids = uow_app
+        store = RedisSessionStore(FakeRedis())
+        monkeypatch.setattr(repositories.user_repository, "session_store", store)
+        monkeypatch.setattr(services.user_versice, "session_store", store)
+
+        response = await _request(app, counts, "POST", "/api/v1/auth/refresh_token", headers=BEARER)
+
+        assert response.status_code == 200
+        assert (await store.get(response.json()["access_token"], ids["owner"])).id == ids["owner"]
+
+    async def test_timed_out_token_is_removed_despite_the_401(self, uow_app):
+        _, session_maker, _, ids = uow_app
+        now = datetime.now(timezone.utc)
+        token = jwt.encode(PayloadToken(token_limit_verify=int((now - timedelta(minutes=1)).timestamp()),
+                                        time_now=int(now.timestamp()), user_id=ids["owner"],
+                                        type="access").model_dump(exclude_none=True),
+                           settings.JWT_SECRET, algorithm=settings.JWT_ALG)
+        async with session_maker() as session:
+            await UserRepository(session).add_token_user(token, ids["owner"], now + timedelta(minutes=1))
+
+        async with session_maker() as session:
+            with pytest.raises(HTTPException) as timed_out:
+                async with UnitOfWork(session):
+                    await get_current_user_from_token(token, UserServices(session))
+        assert timed_out.value.detail == "Token timed out"
+
+        async with session_maker() as session:
+            assert (await session.execute(select(JWTTokenModel).where(JWTTokenModel.user_id == ids["owner"]))
+                    ).first() is None
+
+    async def test_failed_upload_takes_the_exercise_back(self, uow_app):
+        _, session_maker, _, ids = uow_app
+
+        async def failing_upload(bucket, key, file, public):
+            raise ConnectionError("S3 is down")
+
+        async with session_maker() as session:
+            async with session.begin():
+                owner = await session.get(UserModel, ids["owner"])
+            set_current_user(UserAdminGetModelSchema.model_validate(owner))
+            service = ExerciseServices(session)
+            service.s3.upload_upload_file = failing_upload
+            payload = CreateExerciseSchema(title="Squats", type="strength", description="", repetitions=10,
+                                           count_sets=3, rest_sec=30)
+            with pytest.raises(ConnectionError):
+                async with UnitOfWork(session):
+                    await service.create_exercise(payload, UploadFile(filename="squats.mp4", file=BytesIO(b"video")))
+
+        async with session_maker() as session:
+            assert (await session.execute(select(ExerciseModel))).first() is None
+            assert await UserCounterRepository(session).get_count(ids["owner"], CounterKind.exercises) == 0
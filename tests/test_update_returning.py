@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from db.models import ExerciseModel, GroupModel, UserModel
+from db.schemas.user_schema import UserAdminGetModelSchema
+from repositories.exercise_repositories import ExerciseRepository
+from repositories.user_repository import UserRepository
+from services.group_service import GroupServices
+from utils.context import set_current_user
+
+
+@contextmanager
+def _statements(session):
+    statements = []
+
+    def listener(conn, cursor, statement, *_):
+        statements.append(statement.split()[0].upper())
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+
+async def _exercise(session, email: str) -> ExerciseModel:
+    user = UserModel(email=email, password_hash="123")
+    session.add(user)
+    await session.flush()
+    exercise = ExerciseModel(title="Squats", description="", user_id=user.id)
+    session.add(exercise)
+    await session.commit()
+    return exercise
+
+
+@pytest.mark.asyncio
+class TestUpdateReturning:
+    async def test_update_reads_the_row_back_in_the_same_statement(self, session):
+        exercise = await _exercise(session, "returning@example.com")
+        repo = ExerciseRepository(session)
+
+        with _statements(session) as statements:
+            updated = await repo.update_exercise({"title": "Deep Squats"}, exercise.user_id, exercise.id)
+            linked = await repo.update_link_exercise(exercise.id, "https://cdn.local/squats.mp4")
+
+        assert statements == ["UPDATE", "UPDATE"]
+        assert updated is exercise and linked is exercise
+        assert (exercise.title, exercise.media_url) == ("Deep Squats", "https://cdn.local/squats.mp4")
+        with pytest.raises(HTTPException) as not_owner:
+            await repo.update_exercise({"title": "Stolen"}, exercise.user_id + 1, exercise.id)
+        assert not_owner.value.status_code == 404 and exercise.title == "Deep Squats"
+
+    async def test_fallback_without_update_returning(self, session, monkeypatch):
+        exercise = await _exercise(session, "no-returning@example.com")
+        monkeypatch.setattr(session.get_bind().dialect, "update_returning", False)
+        repo = UserRepository(session)
+
+        with _statements(session) as statements:
+            user = await repo.update_user({"first_name": "John"}, exercise.user_id)
+
+        assert statements == ["SELECT", "UPDATE", "SELECT"]
+        assert user.first_name == "John"
+        with pytest.raises(HTTPException):
+            await repo.update_user({"first_name": "Nobody"}, exercise.user_id + 1000)
+
+    async def test_rename_group_only_for_the_owner(self, session):
+        owner = UserModel(email="rename-owner@example.com", password_hash="123", is_active=True)
+        other = UserModel(email="rename-other@example.com", password_hash="123", is_active=True)
+        session.add_all([owner, other])
+        await session.flush()
+        group = GroupModel(name="Old", user_id=owner.id)
+        session.add(group)
+        await session.commit()
+        service = GroupServices(session)
+
+        set_current_user(UserAdminGetModelSchema.model_validate(other))
+        with pytest.raises(HTTPException) as not_owner:
+            await service.rename_group(group.id, "Taken")
+        assert not_owner.value.status_code == 404
+
+        set_current_user(UserAdminGetModelSchema.model_validate(owner))
+        with _statements(session) as statements:
+            renamed = await service.rename_group(group.id, "New")
+        assert statements == ["UPDATE"] and renamed.name == "New" and renamed.user_id == owner.id
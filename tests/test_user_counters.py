@@ -0,0 +1,90 @@
+import uuid
+
+import pytest
+
+from db.models import ExerciseModel, GroupModel, UserModel, WorkoutModel
+from db.models.enums import CounterKind
+from repositories.group_repositories import GroupRepository
+from repositories.user_counter_repository import UserCounterRepository
+from repositories.workout_repositories import WorkoutRepository
+
+
+async def _user(session) -> UserModel:
+    user = UserModel(email=f"counters-{uuid.uuid4().hex[:8]}@example.com", password_hash="123",
+                     is_active=True, is_confirmed=True)
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
+@pytest.mark.asyncio
+class TestUserCounters:
+    async def test_reserve_starts_from_existing_rows_and_stops_at_limit(self, session):
+        repo = UserCounterRepository(session)
+        user = await _user(session)
+        session.add_all([ExerciseModel(title=f"E{number}", user_id=user.id) for number in range(2)])
+        await session.commit()
+
+        assert await repo.reserve(user.id, CounterKind.exercises, limit=3) == 2
+        assert await repo.reserve(user.id, CounterKind.exercises, limit=3) == 3
+        await session.commit()
+
+        assert await repo.get_count(user.id, CounterKind.exercises) == 3
+        assert await repo.reserve(user.id, CounterKind.exercises, limit=None) == 3
+        assert await repo.get_count(user.id, CounterKind.exercises) == 4
+
+    async def test_reservation_is_undone_with_the_transaction(self, session):
+        repo = UserCounterRepository(session)
+        user_id = (await _user(session)).id
+        await repo.reserve(user_id, CounterKind.groups, limit=5)
+        await session.commit()
+
+        await repo.reserve(user_id, CounterKind.groups, limit=5)
+        await session.rollback()
+
+        assert await repo.get_count(user_id, CounterKind.groups) == 1
+
+    async def test_remove_workout_releases_counter(self, session):
+        repo = WorkoutRepository(session)
+        user = await _user(session)
+        await repo.counters.reserve(user.id, CounterKind.workouts, limit=5)
+        workout = await repo.add_workout({"title": "Counted"}, [], user.id)
+
+        await repo.remove_workout_id(workout)
+
+        assert await repo.get_workout_count(user.id) == 0
+
+    async def test_delete_group_releases_only_a_deleted_group(self, session):
+        repo = GroupRepository(session)
+        owner, other = await _user(session), await _user(session)
+        for _ in range(2):
+            await repo.counters.reserve(owner.id, CounterKind.groups, limit=5)
+        group = GroupModel(name="Counted", user_id=owner.id)
+        session.add(group)
+        await session.commit()
+
+        await repo.delete_group(group.id, other.id)
+        await repo.delete_group(group.id, owner.id)
+        await repo.delete_group(group.id, owner.id)
+
+        assert await repo.counters.get_count(owner.id, CounterKind.groups) == 1
+
+    async def test_reconcile_fixes_drift_and_missing_rows(self, session):
+        repo = UserCounterRepository(session)
+        drifted = await _user(session)
+        missing = await _user(session)
+        await repo.reserve(drifted.id, CounterKind.workouts, limit=None)
+        await session.commit()
+        session.add_all([
+            ExerciseModel(title="E", user_id=drifted.id),
+            WorkoutModel(title="W1", user_id=missing.id),
+            WorkoutModel(title="W2", user_id=missing.id),
+        ])
+        await session.commit()
+
+        assert await repo.reconcile(chunk_size=2) >= 2
+
+        assert await repo.get_count(drifted.id, CounterKind.workouts) == 0
+        assert await repo.get_count(drifted.id, CounterKind.exercises) == 1
+        assert await repo.get_count(missing.id, CounterKind.workouts) == 2
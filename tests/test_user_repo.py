@@ -1,6 +1,12 @@
+from datetime import datetime, timedelta, timezone
+
 import pytest
+from core.config import settings
+from core.dependencies import get_current_user_from_token
 from db.models.user_model import UserModel
 from repositories.user_repository import UserRepository
+from services.auth_service import AuthServ
+from services.user_versice import UserServices
 
 
 @pytest.mark.asyncio
@@ -60,8 +66,11 @@ class TestUserRepository:
         token = await user_repo.add_token_user("sometoken", user.id)
         assert token == "sometoken"
 
-        found = await user_repo.find_user_id(user.id, need_token=True)
-        assert found.token.token == "sometoken"
+        found = await user_repo.find_user_id(user.id, token="sometoken")
+        assert [t.token for t in found.tokens] == ["sometoken"]
+
+        found = await user_repo.find_user_id(user.id, token="othertoken")
+        assert found.tokens == []
 
     async def test_update_token_user(self, user_repo: UserRepository):
         """
@@ -77,6 +86,63 @@ class TestUserRepository:
 
         assert new_token == "newtoken"
 
+    async def test_sessions_per_user_cap(self, user_repo: UserRepository, monkeypatch):
+        """
+        Проверяем, что у пользователя несколько сессий, а самые старые вытесняются лимитом.
+        """
+        monkeypatch.setattr(settings, "MAX_SESSIONS_PER_USER", 2)
+        user = UserModel(email="sessions@example.com", password_hash="hash123")
+        user_repo.session.add(user)
+        await user_repo.session.commit()
+        await user_repo.session.refresh(user)
+
+        now = datetime.now(timezone.utc)
+        for number in range(3):
+            await user_repo.add_token_user(f"device{number}", user.id, now + timedelta(minutes=number + 1))
+
+        assert await user_repo.find_token("device0") is None
+        assert (await user_repo.find_token("device2")).user_id == user.id
+
+        await user_repo.remove_token_user(user.id, "device2")
+        assert await user_repo.find_token("device2") is None
+        assert await user_repo.find_token("device1") is not None
+
+    async def test_refresh_keeps_the_other_sessions(self, user_repo: UserRepository):
+        """
+        Проверяем, что обновление токена на одном устройстве не разлогинивает остальные.
+        """
+        user = UserModel(email="two-devices@example.com", password_hash=await AuthServ.hash_password("secret"),
+                         is_active=True, is_confirmed=True)
+        user_repo.session.add(user)
+        await user_repo.session.commit()
+        user_serv = UserServices(user_repo.session)
+        phone = await user_serv.login_user(user.email, "secret")
+        laptop = await user_serv.login_user(user.email, "secret")
+
+        await get_current_user_from_token(phone, user_serv)
+        refreshed = (await user_serv.refresh_token(phone)).access_token
+
+        assert (await get_current_user_from_token(laptop, user_serv)).id == user.id
+        assert (await get_current_user_from_token(refreshed, user_serv)).id == user.id
+        assert await user_repo.find_token(phone) is None
+
+    async def test_purge_expired_tokens(self, user_repo: UserRepository):
+        """
+        Проверяем удаление просроченных токенов пачками.
+        """
+        user = UserModel(email="purge@example.com", password_hash="hash123")
+        user_repo.session.add(user)
+        await user_repo.session.commit()
+        await user_repo.session.refresh(user)
+
+        now = datetime.now(timezone.utc)
+        for number in range(3):
+            await user_repo.add_token_user(f"expired{number}", user.id, now - timedelta(minutes=number + 1))
+        await user_repo.add_token_user("alive", user.id, now + timedelta(minutes=5))
+
+        assert await user_repo.purge_expired_tokens(chunk_size=2) == 3
+        assert await user_repo.find_token("alive") is not None
+
     async def test_remove_user_id(self, user_repo: UserRepository):
         """
         Проверяем удаление пользователя по ID.
@@ -0,0 +1,34 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from db.models.enums import TypeTokensEnum
+from services import auth_service
+from services.auth_service import AuthServ
+
+
+@pytest.mark.asyncio
+class TestVerifyTokenCache:
+    async def test_valid_token_is_decoded_once(self):
+        # a token issued in the same second for the same user by another test would already be cached
+        token = await AuthServ.issue_email_verify_token(uuid.uuid4().int % 10 ** 9, TypeTokensEnum.access)
+        hits = auth_service.verified_tokens.hits
+
+        first = AuthServ.verify_token(token)
+        second = AuthServ.verify_token(token)
+
+        assert second is first
+        assert auth_service.verified_tokens.hits == hits + 1
+
+    async def test_forged_token_is_rejected_from_cache(self):
+        token = await AuthServ.issue_email_verify_token(uuid.uuid4().int % 10 ** 9, TypeTokensEnum.access)
+        forged = token[:-4] + ("AAAA" if not token.endswith("AAAA") else "BBBB")
+        hits = auth_service.rejected_tokens.hits
+
+        for _ in range(2):
+            with pytest.raises(HTTPException) as e:
+                AuthServ.verify_token(forged)
+            assert e.value.status_code == 401
+            assert e.value.detail == "Invalid signature"
+        assert auth_service.rejected_tokens.hits == hits + 1
@@ -0,0 +1,134 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, event, select
+from sqlalchemy.dialects import postgresql
+
+from db.models import GroupModel, UserModel, WorkoutAccessModel, WorkoutModel
+from repositories.group_repositories import GroupRepository
+from repositories.workout_access_repository import WorkoutAccessRepository
+from repositories.workout_repositories import WorkoutRepository
+
+
+async def _user(session) -> UserModel:
+    user = UserModel(email=f"access-{uuid.uuid4().hex[:8]}@example.com", password_hash="123",
+                     is_active=True, is_confirmed=True)
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
+async def _sees(session, workout_id: int, user_id: int) -> bool:
+    try:
+        await WorkoutRepository(session).get_workout_for_user(workout_id, user_id)
+        return True
+    except HTTPException:
+        return False
+
+
+async def _access(session, group_id: int) -> set[tuple[int, int]]:
+    rows = await session.execute(select(WorkoutAccessModel.user_id, WorkoutAccessModel.workout_id)
+                                 .where(WorkoutAccessModel.via_group_id == group_id))
+    return set(rows.tuples())
+
+
+@pytest.fixture()
+async def shared_group(session):
+    owner, first, second = [await _user(session) for _ in range(3)]
+    workouts = [WorkoutModel(title=f"W{number}", user_id=owner.id) for number in range(2)]
+    session.add_all(workouts)
+    await session.flush()
+    group = GroupModel(name="Access", user_id=owner.id)
+    session.add(group)
+    await session.commit()
+    return owner, first, second, workouts, group
+
+
+@pytest.mark.asyncio
+class TestWorkoutAccess:
+    async def test_members_see_the_group_workout(self, session, shared_group):
+        owner, first, second, (workout, other), group = shared_group
+        repo = GroupRepository(session)
+
+        await repo.add_members_group([first.id], group.id, owner.id)
+        assert await _access(session, group.id) == set()
+
+        await repo.update_workout_in_group(group.id, workout.id, owner.id)
+        await repo.add_members_group([second.id], group.id, owner.id)
+
+        assert await _access(session, group.id) == {(first.id, workout.id), (second.id, workout.id)}
+        assert await _sees(session, workout.id, first.id)
+        workouts, total = await WorkoutRepository(session).get_all_workouts(second.id, 10, 0)
+        assert [item.id for item in workouts] == [workout.id] and total == 1
+
+        await repo.update_workout_in_group(group.id, other.id, owner.id)
+
+        assert await _access(session, group.id) == {(first.id, other.id), (second.id, other.id)}
+        assert not await _sees(session, workout.id, first.id)
+
+    async def test_only_the_owner_moves_access(self, session, shared_group):
+        owner, first, second, (workout, other), group = shared_group
+        repo = GroupRepository(session)
+        await repo.update_workout_in_group(group.id, workout.id, owner.id)
+        await repo.add_members_group([first.id], group.id, owner.id)
+
+        with pytest.raises(HTTPException):
+            await repo.update_workout_in_group(group.id, other.id, second.id)
+
+        assert await _access(session, group.id) == {(first.id, workout.id)}
+
+    async def test_removing_members_workout_and_group_revokes(self, session, shared_group):
+        owner, first, second, (workout, _), group = shared_group
+        repo = GroupRepository(session)
+        await repo.update_workout_in_group(group.id, workout.id, owner.id)
+        await repo.add_members_group([first.id, second.id], group.id, owner.id)
+
+        await repo.remove_member_group_id([first.id], group.id)
+        assert await _access(session, group.id) == {(second.id, workout.id)}
+        assert not await _sees(session, workout.id, first.id)
+
+        await repo.remove_workout_from_group(group.id)
+        assert await _access(session, group.id) == set()
+
+        await repo.update_workout_in_group(group.id, workout.id, owner.id)
+        await repo.delete_group(group.id, owner.id)
+        assert await _access(session, group.id) == set()
+        assert not await _sees(session, workout.id, second.id)
+
+    async def test_rebuild_restores_rows(self, session, shared_group):
+        owner, first, second, (workout, _), group = shared_group
+        repo = GroupRepository(session)
+        await repo.update_workout_in_group(group.id, workout.id, owner.id)
+        await repo.add_members_group([first.id, second.id], group.id, owner.id)
+        await session.execute(delete(WorkoutAccessModel).where(WorkoutAccessModel.via_group_id == group.id))
+        await session.commit()
+
+        assert await WorkoutAccessRepository(session).rebuild(chunk_size=2) >= 2
+
+        assert await _access(session, group.id) == {(first.id, workout.id), (second.id, workout.id)}
+
+    async def test_group_row_is_locked_before_access_changes(self, session, shared_group):
+        owner, first, _, (workout, _), group = shared_group
+        repo = GroupRepository(session)
+        statements = []
+
+        def record(conn, cursor, statement, *_):
+            statements.append(" ".join(statement.split()))
+
+        event.listen(session.bind.sync_engine, "before_cursor_execute", record)
+        try:
+            await repo.update_workout_in_group(group.id, workout.id, owner.id)
+            locked_update = list(statements)
+            statements.clear()
+            await repo.add_members_group([first.id], group.id, owner.id)
+        finally:
+            event.remove(session.bind.sync_engine, "before_cursor_execute", record)
+
+        lock = "SELECT groups.id FROM groups WHERE groups.id = ?"
+        assert locked_update[0] == lock
+        first_grant = next(index for index, statement in enumerate(statements)
+                           if statement.startswith("INSERT INTO workout_access"))
+        assert statements.index(lock) < first_grant
+        assert "FOR UPDATE" in str(repo.access.group_lock(group.id).compile(dialect=postgresql.dialect()))
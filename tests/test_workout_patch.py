@@ -0,0 +1,149 @@
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from pydantic import TypeAdapter
+from sqlalchemy import event, select
+
+from api.v1 import workout as workout_api
+from core.dependencies import get_current_user_from_token, get_db
+from db.models import ExerciseModel, UserModel, WorkoutModel
+from db.models.workout_model import WorkoutExerciseModel
+from db.schemas.user_schema import UserAdminGetModelSchema
+from db.schemas.workout_schema import WorkoutOperation
+from repositories.exercise_repositories import ExerciseRepository
+from repositories.workout_repositories import WorkoutRepository
+from utils.context import set_current_user
+
+operations = TypeAdapter(list[WorkoutOperation])
+
+
+@pytest.fixture()
+async def workout(session):
+    user = UserModel(email=f"patch-{uuid.uuid4().hex[:8]}@example.com", password_hash="123",
+                     is_active=True, is_confirmed=True)
+    session.add(user)
+    await session.flush()
+    exercises = [ExerciseModel(title=title, description="", user_id=user.id) for title in "ABCDEF"]
+    session.add_all(exercises)
+    await session.flush()
+    workout = WorkoutModel(title="Patch", description="", user_id=user.id, workout_exercises=[
+        WorkoutExerciseModel(exercise_id=exercise.id, position=position)
+        for position, exercise in enumerate(exercises[:4], start=1)
+    ])
+    session.add(workout)
+    await session.commit()
+    principal = UserAdminGetModelSchema.model_validate(user)
+    set_current_user(principal)
+    return principal, workout, {exercise.title: exercise.id for exercise in exercises}
+
+
+async def _layout(session, workout_id: int) -> list[tuple[str, int, str | None]]:
+    rows = await session.execute(
+        select(ExerciseModel.title, WorkoutExerciseModel.position, WorkoutExerciseModel.notes)
+        .join(ExerciseModel, ExerciseModel.id == WorkoutExerciseModel.exercise_id)
+        .where(WorkoutExerciseModel.workout_id == workout_id).order_by(WorkoutExerciseModel.position)
+    )
+    return [tuple(row) for row in rows]
+
+
+@pytest.mark.asyncio
+class TestWorkoutPatch:
+    async def test_operations_apply_in_order(self, session, workout):
+        user, workout, ids = workout
+        repo = WorkoutRepository(session)
+
+        version = await repo.patch_workout(await repo.get_workout_for_user(workout.id, user.id), 1,
+                                           operations.validate_python([
+                                               {"op": "insert", "position": 2, "exercise_id": ids["E"]},
+                                               {"op": "move", "from_position": 5, "to_position": 1},
+                                               {"op": "remove", "position": 4},
+                                               {"op": "update_notes", "position": 2, "notes": "slow"},
+                                               {"op": "insert", "position": 5, "exercise_id": ids["F"]},
+                                           ]))
+
+        assert version == 2
+        assert await _layout(session, workout.id) == [
+            ("D", 1, None), ("A", 2, "slow"), ("E", 3, None), ("C", 4, None), ("F", 5, None)]
+        found = await repo.get_workout_for_user(workout.id, user.id)
+        assert found.version == 2
+        assert [row.exercise.title for row in found.workout_exercises] == ["D", "A", "E", "C", "F"]
+
+    async def test_stale_version_and_bad_position_change_nothing(self, session, workout):
+        user, workout, ids = workout
+        workout_id = workout.id
+        repo = WorkoutRepository(session)
+        move = operations.validate_python([{"op": "move", "from_position": 1, "to_position": 4}])
+
+        with pytest.raises(HTTPException) as stale:
+            await repo.patch_workout(await repo.get_workout_for_user(workout_id, user.id), 7, move)
+        with pytest.raises(HTTPException) as out_of_range:
+            await repo.patch_workout(await repo.get_workout_for_user(workout_id, user.id), 1, [
+                *move, *operations.validate_python([{"op": "remove", "position": 9}])])
+
+        assert stale.value.status_code == 409
+        assert out_of_range.value.status_code == 400
+        assert await _layout(session, workout_id) == [("A", 1, None), ("B", 2, None), ("C", 3, None), ("D", 4, None)]
+        assert (await repo.get_workout_for_user(workout_id, user.id)).version == 1
+
+    async def test_removing_an_exercise_bumps_the_version(self, session, workout):
+        user, workout, ids = workout
+        workout_id = workout.id
+        repo = WorkoutRepository(session)
+        version = select(WorkoutModel.version).where(WorkoutModel.id == workout_id)
+
+        await ExerciseRepository(session).remove_exercise_id(ids["F"])
+        assert await session.scalar(version) == 1
+        await ExerciseRepository(session).remove_exercise_id(ids["B"])
+        assert await session.scalar(version) == 2
+
+        with pytest.raises(HTTPException) as stale:
+            await repo.patch_workout(await repo.get_workout_for_user(workout_id, user.id), 1,
+                                     operations.validate_python([{"op": "remove", "position": 3}]))
+        assert stale.value.status_code == 409
+        assert await _layout(session, workout_id) == [("A", 1, None), ("C", 2, None), ("D", 3, None)]
+
+    async def test_move_touches_only_the_range(self, session, workout):
+        user, workout, _ = workout
+        repo = WorkoutRepository(session)
+        loaded = await repo.get_workout_for_user(workout.id, user.id)
+        touched = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("UPDATE association_workout_exercises"):
+                touched.append(cursor.rowcount)
+
+        event.listen(session.bind.sync_engine, "after_cursor_execute", count)
+        try:
+            await repo.patch_workout(loaded, 1, operations.validate_python(
+                [{"op": "move", "from_position": 3, "to_position": 2}]))
+        finally:
+            event.remove(session.bind.sync_engine, "after_cursor_execute", count)
+
+        assert sum(touched) == 2
+        assert await _layout(session, workout.id) == [("A", 1, None), ("C", 2, None), ("B", 3, None), ("D", 4, None)]
+
+    async def test_patch_endpoint(self, session, workout):
+        user, workout, ids = workout
+
+        async def test_db():
+            yield session
+
+        async def test_user():
+            set_current_user(user)
+            return user
+
+        app = FastAPI()
+        app.include_router(workout_api.router, prefix="/api/v1/workouts")
+        app.dependency_overrides[get_db] = test_db
+        app.dependency_overrides[get_current_user_from_token] = test_user
+        body = {"version": 1, "operations": [{"op": "insert", "position": 1, "exercise_id": ids["F"]}]}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.patch(f"/api/v1/workouts/{workout.id}", json=body)
+            replay = await client.patch(f"/api/v1/workouts/{workout.id}", json=body)
+
+        assert response.status_code == 200
+        assert response.json()["version"] == 2
+        assert [row["exercise"]["title"] for row in response.json()["workout_exercises"]] == ["F", "A", "B", "C", "D"]
+        assert replay.status_code == 409
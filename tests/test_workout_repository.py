@@ -1,6 +1,12 @@
 import pytest
-from db.models import WorkoutModel, UserModel
+from sqlalchemy import select
+
+from db.models import ExerciseModel, WorkoutModel, UserModel
+from db.models.workout_model import WorkoutExerciseModel
+from db.schemas.user_schema import UserAdminGetModelSchema
+from db.schemas.workout_schema import WorkoutExerciseCreateSchema
 from repositories.workout_repositories import WorkoutRepository
+from utils.context import set_current_user
 
 
 @pytest.mark.asyncio
@@ -53,3 +59,45 @@ class TestWorkoutRepository:
 
         result = await repo.remove_workout_id(workout)
         assert result is True
+
+    async def test_update_workout_keeps_unchanged_rows(self, session):
+        repo = WorkoutRepository(session)
+
+        user = UserModel(email="diff_workout@example.com", password_hash="123", is_active=True, is_confirmed=True)
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
+        set_current_user(UserAdminGetModelSchema.model_validate(user))
+
+        a, b, c, d = [ExerciseModel(title=title, description="", user_id=user.id) for title in "ABCD"]
+        session.add_all([a, b, c, d])
+        await session.flush()
+        workout = WorkoutModel(title="Diff", description="", user_id=user.id, workout_exercises=[
+            WorkoutExerciseModel(exercise_id=exercise.id, position=position, notes=f"note {position}")
+            for position, exercise in enumerate([a, b, c, a], start=1)
+        ])
+        session.add(workout)
+        await session.commit()
+        before = {(row.exercise_id, row.position): row.id for row in workout.workout_exercises}
+
+        await repo.update_workout(workout.id, user.id, WorkoutExerciseCreateSchema.model_validate({
+            "workout": {"title": "Diff 2", "description": "moved"},
+            "exercises": [{"exercise_id": exercise.id, "position": position}
+                          for position, exercise in enumerate([b, a, c, d], start=1)],
+        }))
+
+        rows = (await session.execute(
+            select(WorkoutExerciseModel.id, WorkoutExerciseModel.exercise_id, WorkoutExerciseModel.position,
+                   WorkoutExerciseModel.notes)
+            .where(WorkoutExerciseModel.workout_id == workout.id).order_by(WorkoutExerciseModel.position)
+        )).tuples().all()
+        assert [(exercise_id, position) for _, exercise_id, position, _ in rows] == [
+            (b.id, 1), (a.id, 2), (c.id, 3), (d.id, 4)]
+        assert rows[0][0] == before[(b.id, 2)] and rows[0][3] == "note 2"
+        assert rows[1][0] == before[(a.id, 1)]
+        assert rows[2][0] == before[(c.id, 3)]
+        assert rows[3][3] is None
+
+        found = await repo.get_workout_for_user(workout.id, user.id)
+        assert found.title == "Diff 2"
+        assert [row.exercise.title for row in found.workout_exercises] == ["B", "A", "C", "D"]